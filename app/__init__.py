@@ -1,39 +1,87 @@
 # app/__init__.py
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_cors import CORS
+from app.replicas import RoutingSession
 import os
 
-db = SQLAlchemy()
-migrate = Migrate()
+# Сессия сама выбирает шард пользователя и реплику для чтений GET-запросов
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
-def create_app(test_config=None):
+def init_migrate(app):
+    """Flask-Migrate (alembic) нужен только командам flask db"""
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+def create_app(test_config=None, serving=False):
+    """Создание приложения.
+
+    serving=True - режим веб-сервера (wsgi.py): без Flask-Migrate и CLI-команд.
+    """
     app = Flask(__name__)
     
     # Если передан тестовый конфиг, используем его
     if test_config is None:
-        # Конфигурация для разработки/продакшена
-        app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
-        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
-        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-        app.config['TESTING'] = False
+        # Конфигурация для разработки/продакшена: класс из app/config.py по FLASK_CONFIG
+        from app.config import config
+        config_class = config[os.environ.get('FLASK_CONFIG', 'default')]
+        app.config.from_object(config_class)
+        config_class.init_app(app)
     else:
         # Конфигурация для тестов
         app.config.update(test_config)
     
     # Инициализация расширений
     db.init_app(app)
-    migrate.init_app(app, db)
     CORS(app)
     
+    # Шарды данных пользователей (SQLALCHEMY_BINDS shard_N) и реплики для чтения (replica_N)
+    from app.sharding import init_sharding
+    init_sharding(app)
+    from app.replicas import replica_router
+    replica_router.init_app(app)
+    
+    # Кэш пользователей для token_required
+    from app.auth import init_principal_cache
+    init_principal_cache(app)
+    
+    # Кэш ответов для условных GET
+    from app.http_cache import init_response_cache
+    init_response_cache(app)
+    
+    # Буфер записей аудита
+    from app.audit import audit_sink
+    audit_sink.init_app(app)
+    
+    # Сохраненные ответы по Idempotency-Key
+    from app.idempotency import init_idempotency
+    init_idempotency(app)
+    
+    # Курсы валют в памяти процесса
+    from app.fx import init_fx
+    init_fx(app)
+    
+    # Ограничение частоты запросов
+    from app.ratelimit import limiter
+    limiter.init_app(app)
+    
+    # SQL-метрики запросов и заголовок Server-Timing
+    from app.instrumentation import init_instrumentation
+    init_instrumentation(app)
+    
     # Регистрация маршрутов
     from app.routes import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
     
-    # Создание таблиц при запуске (только если не в тестовом режиме)
+    # Миграции и CLI-команды не нужны процессам, обслуживающим запросы
+    if not serving:
+        init_migrate(app)
+        from app.cli import register_commands
+        register_commands(app)
+    
+    # Проверка схемы при запуске (только если не в тестовом режиме)
     if not app.config.get('TESTING'):
-        with app.app_context():
-            db.create_all()
+        from app.startup import prepare_schema
+        prepare_schema(app)
     
     return app
\ No newline at end of file
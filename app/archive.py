@@ -0,0 +1,124 @@
+"""Холодный архив удаленных подписок.
+
+Удаление подписки только снимает is_active. Задача archive_subscriptions
+переносит подписки, удаленные больше SUBSCRIPTION_ARCHIVE_AFTER_DAYS дней
+назад (по updated_at), в subscriptions_archive с теми же id, чтобы горячая
+таблица и ее индексы содержали в основном активные строки. Кандидаты
+выбираются по частичному индексу ix_subscriptions_inactive_updated.
+restore_subscription возвращает подписку (из архива или еще не перенесенную)
+в активные.
+"""
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, literal
+from app import db
+from app.models import Subscription, ArchivedSubscription
+from app.database import create_audit_log, bump_data_version
+from app.rollup import apply_rollup_deltas, subscription_delta
+
+# Колонки, общие для subscriptions и subscriptions_archive
+ARCHIVED_COLUMNS = [
+    column.key for column in ArchivedSubscription.__table__.columns if column.key != 'archived_at'
+]
+
+def _archive_candidates(cutoff, chunk_size):
+    # Строки блокируются до коммита: параллельное восстановление ждет переноса
+    return db.session.execute(
+        select(Subscription.id).where(
+            Subscription.is_active == False,
+            Subscription.updated_at < cutoff
+        ).order_by(Subscription.updated_at, Subscription.id).limit(chunk_size).with_for_update()
+    ).scalars().all()
+
+def archive_subscriptions(older_than_days=90, chunk_size=500, max_chunks=None, now=None):
+    """Перенос подписок, удаленных больше older_than_days дней назад, в архив.
+
+    Каждая пачка - отдельная транзакция: INSERT ... SELECT в архив и DELETE
+    тех же строк. Возвращает статистику по пачкам.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    table = Subscription.__table__
+
+    stats = []
+    while max_chunks is None or len(stats) < max_chunks:
+        started = time.perf_counter()
+        try:
+            ids = _archive_candidates(cutoff, chunk_size)
+            if not ids:
+                db.session.rollback()
+                break
+
+            moved = table.c.id.in_(ids) & (table.c.is_active == False)
+            db.session.execute(
+                insert(ArchivedSubscription).from_select(
+                    ARCHIVED_COLUMNS + ['archived_at'],
+                    select(*[table.c[name] for name in ARCHIVED_COLUMNS], literal(now)).where(moved)
+                )
+            )
+            rows = db.session.execute(delete(table).where(moved)).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        seconds = time.perf_counter() - started
+        stats.append({
+            'chunk': len(stats) + 1,
+            'rows': rows,
+            'seconds': round(seconds, 3)
+        })
+    return stats
+
+def restore_subscription(user_id, subscription_id):
+    """Возврат удаленной подписки пользователя в активные (с аудитом и агрегатами).
+
+    Возвращает (подписка, ошибка); уже активная подписка возвращается без изменений.
+    """
+    try:
+        subscription = Subscription.query.filter_by(
+            id=subscription_id,
+            user_id=user_id
+        ).with_for_update().first()
+
+        if subscription is not None and subscription.is_active:
+            db.session.rollback()
+            return subscription, None
+
+        if subscription is None:
+            archived = ArchivedSubscription.query.filter_by(
+                id=subscription_id,
+                user_id=user_id
+            ).with_for_update().first()
+            if archived is None:
+                db.session.rollback()
+                return None, 'Subscription not found'
+
+            subscription = Subscription(**{name: getattr(archived, name) for name in ARCHIVED_COLUMNS})
+            db.session.delete(archived)
+            db.session.add(subscription)
+
+        subscription.is_active = True
+        subscription.updated_at = datetime.utcnow()
+
+        create_audit_log(
+            user_id=user_id,
+            action='RESTORE',
+            table_name='subscriptions',
+            record_id=subscription.id,
+            new_values={
+                'name': subscription.name,
+                'amount': str(subscription.amount),
+                'currency': subscription.currency,
+                'periodicity': subscription.periodicity.value
+            }
+        )
+
+        apply_rollup_deltas([subscription_delta(subscription)])
+        bump_data_version(user_id)
+
+        db.session.commit()
+        return subscription, None
+    except Exception as e:
+        db.session.rollback()
+        return None, str(e)
@@ -0,0 +1,255 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from app import db
+from app.models import AuditLog
+from app.sharding import shard_map, shard_engine, assign_ids
+
+logger = logging.getLogger(__name__)
+
+MODE_ASYNC = 'async'
+MODE_TRANSACTION = 'transaction'
+
+def build_audit_row(user_id, action, table_name, record_id, old_values=None, new_values=None):
+    """Подготовка строки аудита для вставки"""
+    return {
+        'user_id': user_id,
+        'action': action,
+        'table_name': table_name,
+        'record_id': record_id,
+        'old_values': json.dumps(old_values) if old_values else None,
+        'new_values': json.dumps(new_values) if new_values else None,
+        'created_at': datetime.utcnow()
+    }
+
+class AuditSink:
+    """Буфер записей аудита.
+
+    В режиме transaction записи пишутся в транзакцию вызывающего кода.
+    В режиме async они копятся в памяти после коммита транзакции и
+    записываются фоновым потоком пачками (executemany). Пачка, которую
+    не удалось записать max_attempts раз подряд, выводится в лог и
+    отбрасывается, чтобы не блокировать очередь.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.mode = MODE_TRANSACTION
+        self.flush_size = 500
+        self.flush_interval = 1.0
+        self.max_queue = 100000
+        self.max_attempts = 5
+        self._queue = deque()
+        self._retry = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flush_lock = threading.Lock()
+        self.flushed_total = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.dropped_total = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._flush_ms_total = 0.0
+
+    def init_app(self, app):
+        default_mode = MODE_TRANSACTION if app.config.get('TESTING') else MODE_ASYNC
+        self.app = app
+        self.mode = app.config.get('AUDIT_WRITE_MODE', default_mode)
+        self.flush_size = app.config.get('AUDIT_FLUSH_SIZE', 500)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', 1.0)
+        self.max_queue = app.config.get('AUDIT_QUEUE_MAX', 100000)
+        self.max_attempts = app.config.get('AUDIT_MAX_ATTEMPTS', 5)
+        app.extensions['audit_sink'] = self
+
+    def record_many(self, rows):
+        """Добавление записей аудита в текущую транзакцию или в очередь"""
+        if not rows:
+            return 0
+
+        if self.mode == MODE_TRANSACTION:
+            if shard_map.enabled:
+                rows = assign_ids(db.session.connection(), AuditLog.__table__, rows)
+            db.session.execute(insert(AuditLog), rows)
+        else:
+            # В очередь попадут только записи закоммиченных транзакций
+            db.session.info.setdefault('pending_audit', []).extend(rows)
+        return len(rows)
+
+    def enqueue(self, rows):
+        """Постановка записей в очередь фоновой записи"""
+        with self._cond:
+            self._queue.extend(rows)
+            depth = len(self._queue)
+            self._ensure_thread()
+            if depth >= self.flush_size:
+                self._cond.notify()
+
+        # Обратное давление: не даем очереди расти бесконечно
+        if depth >= self.max_queue:
+            self.flush()
+
+    def flush(self):
+        """Синхронная запись всего содержимого очереди"""
+        written = 0
+        while True:
+            batch, attempts = self._take_batch()
+            if not batch:
+                return written
+            if not self._write(batch, attempts):
+                return written
+            written += len(batch)
+
+    def shutdown(self, timeout=5.0):
+        """Остановка фонового потока с дозаписью очереди"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        # Незаписанная пачка повторяется до max_attempts; если база так и не
+        # приняла ее, остаток очереди выводится в лог, а не теряется при выходе
+        while self.queue_depth():
+            dropped = self.dropped_total
+            self.flush()
+            if self.dropped_total > dropped:
+                self._drop(self._take_all(), 'at shutdown')
+        with self._cond:
+            self._thread = None
+            self._stopping = False
+
+    def reset_after_fork(self):
+        """Сброс состояния потока в дочернем процессе после fork"""
+        # Очередь родителя запишет сам родитель; в воркере она дала бы дубли
+        self._queue = deque()
+        self._retry = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+    def queue_depth(self):
+        retry = self._retry
+        return len(self._queue) + (len(retry[0]) if retry else 0)
+
+    def stats(self):
+        """Глубина очереди и задержка записи"""
+        return {
+            'mode': self.mode,
+            'queue_depth': self.queue_depth(),
+            'flushed_total': self.flushed_total,
+            'flush_count': self.flush_count,
+            'flush_errors': self.flush_errors,
+            'dropped_total': self.dropped_total,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'max_flush_ms': round(self.max_flush_ms, 3),
+            'avg_flush_ms': round(self._flush_ms_total / self.flush_count, 3) if self.flush_count else 0.0
+        }
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        """Следующая пачка и число прежних неудачных попыток ее записи"""
+        with self._cond:
+            # Сначала повторяется незаписанная пачка, чтобы сохранить порядок
+            if self._retry is not None:
+                batch, self._retry = self._retry, None
+                return batch
+            batch = []
+            while self._queue and len(batch) < self.flush_size:
+                batch.append(self._queue.popleft())
+            return batch, 0
+
+    def _take_all(self):
+        with self._cond:
+            rows = list(self._retry[0]) if self._retry else []
+            rows.extend(self._queue)
+            self._retry = None
+            self._queue.clear()
+            return rows
+
+    def _drop(self, rows, reason):
+        if not rows:
+            return
+        # Записи остаются только в логе, откуда их можно загрузить вручную
+        self.dropped_total += len(rows)
+        logger.error('Dropping %d audit records %s: %s', len(rows), reason, json.dumps(rows, default=str))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._queue) < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            batch, attempts = self._take_batch()
+            if batch and not self._write(batch, attempts):
+                # База недоступна: ждем перед повторной попыткой
+                time.sleep(self.flush_interval)
+
+    def _write(self, batch, attempts=0):
+        started = time.perf_counter()
+        # При шардировании записи пишутся на шард своего пользователя
+        pending = _split_by_shard(batch)
+        try:
+            with self._flush_lock, self.app.app_context():
+                while pending:
+                    shard, rows = pending[0]
+                    with shard_engine(shard).begin() as connection:
+                        table = AuditLog.__table__
+                        connection.execute(insert(table), assign_ids(connection, table, rows))
+                    pending.pop(0)
+                    self.flushed_total += len(rows)
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error('Error flushing %d audit records: %s', len(batch), e)
+            failed = [row for _, rows in pending for row in rows]
+            attempts += 1
+            if attempts >= self.max_attempts:
+                self._drop(failed, f'after {attempts} attempts')
+            else:
+                # Незаписанные строки повторяются следующей пачкой
+                with self._cond:
+                    self._retry = (failed, attempts)
+            return False
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._flush_ms_total += elapsed_ms
+        return True
+
+def _split_by_shard(batch):
+    if not shard_map.enabled:
+        return [(0, batch)]
+    shard_map.refresh()
+    groups = {}
+    for row in batch:
+        groups.setdefault(shard_map.shard_of(row['user_id']), []).append(row)
+    return list(groups.items())
+
+audit_sink = AuditSink()
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_committed(session):
+    rows = session.info.pop('pending_audit', None)
+    if rows:
+        audit_sink.enqueue(rows)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('pending_audit', None)
+
+atexit.register(audit_sink.shutdown)
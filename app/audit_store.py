@@ -0,0 +1,251 @@
+import json
+import logging
+import zlib
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, insert, delete, func, text, tuple_
+from app import db
+from app.models import AuditLog, AuditSegment
+from app.export import AUDIT_EXPORT
+from app.pagination import decode_cursor, encode_cursor
+from app.schedule import add_period
+
+logger = logging.getLogger(__name__)
+
+AUDIT_ORDER = (AuditLog.created_at, AuditLog.id)
+
+def month_key(value):
+    """Ключ месяца YYYYMM"""
+    return value.year * 100 + value.month
+
+def month_start(key):
+    return date(key // 100, key % 100, 1)
+
+def month_end(key):
+    """Первый день следующего месяца"""
+    return add_period(month_start(key), 'monthly')
+
+def partition_name(key):
+    return f'audit_logs_y{key // 100}m{key % 100:02d}'
+
+# --- Архивные сегменты ---
+
+def encode_segment(rows):
+    """Сжатие строк аудита (словарей AUDIT_EXPORT) в сегмент"""
+    payload = '\n'.join(json.dumps(row, ensure_ascii=False, separators=(',', ':')) for row in rows)
+    return zlib.compress(payload.encode('utf-8'), 6)
+
+def decode_segment(data):
+    """Распаковка сегмента в список словарей"""
+    payload = zlib.decompress(data).decode('utf-8')
+    rows = []
+    for line in payload.splitlines():
+        row = json.loads(line)
+        row['created_at'] = datetime.fromisoformat(row['created_at'])
+        rows.append(row)
+    return rows
+
+def iter_segment_rows(user_id=None, date_from=None, date_to=None):
+    """Строки архивных сегментов в порядке id (для выгрузки)"""
+    query = select(AuditSegment.data)
+    if user_id is not None:
+        query = query.where(AuditSegment.user_id == user_id)
+    if date_from is not None:
+        query = query.where(AuditSegment.month >= month_key(date_from))
+    if date_to is not None:
+        query = query.where(AuditSegment.month <= month_key(date_to))
+
+    for (data,) in db.session.execute(query.order_by(AuditSegment.min_id).execution_options(yield_per=10)):
+        for row in decode_segment(data):
+            created = row['created_at'].date()
+            if date_from is not None and created < date_from:
+                continue
+            if date_to is not None and created > date_to:
+                continue
+            yield row
+
+# --- Запросы ---
+
+def _matches(row, filters):
+    for name in ('action', 'table_name', 'record_id'):
+        if filters.get(name) is not None and row[name] != filters[name]:
+            return False
+    if filters.get('date_from') is not None and row['created_at'].date() < filters['date_from']:
+        return False
+    if filters.get('date_to') is not None and row['created_at'].date() > filters['date_to']:
+        return False
+    return True
+
+def query_audit(user_id, limit, cursor=None, **filters):
+    """История аудита пользователя, от новых к старым, постранично по (created_at, id).
+
+    Сначала читается горячая таблица; если страница не заполнена, она
+    дополняется строками из архивных сегментов (они всегда старше).
+    filters: action, table_name, record_id, date_from, date_to.
+    """
+    after = tuple(decode_cursor(cursor, AUDIT_ORDER)) if cursor else None
+
+    query = AUDIT_EXPORT.select().where(AuditLog.user_id == user_id)
+    for name in ('action', 'table_name', 'record_id'):
+        if filters.get(name) is not None:
+            query = query.where(getattr(AuditLog, name) == filters[name])
+    if filters.get('date_from') is not None:
+        query = query.where(AuditLog.created_at >= filters['date_from'])
+    if filters.get('date_to') is not None:
+        query = query.where(AuditLog.created_at < filters['date_to'] + timedelta(days=1))
+    if after:
+        query = query.where(tuple_(*AUDIT_ORDER) < tuple_(*after))
+
+    rows = db.session.execute(
+        query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit + 1)
+    ).all()
+    items = AUDIT_EXPORT.rows(rows)
+    for item, row in zip(items, rows):
+        item['created_at'] = row.created_at
+
+    if len(items) <= limit:
+        items.extend(_archived_page(user_id, limit + 1 - len(items), after, filters))
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([items[-1]['created_at'], items[-1]['id']])
+
+    for item in items:
+        item['created_at'] = item['created_at'].isoformat()
+    return items, next_cursor
+
+def _archived_page(user_id, needed, after, filters):
+    """Строки из архивных сегментов (от новых месяцев к старым)"""
+    query = select(AuditSegment.month, AuditSegment.data).where(AuditSegment.user_id == user_id)
+    if filters.get('date_from') is not None:
+        query = query.where(AuditSegment.month >= month_key(filters['date_from']))
+    if filters.get('date_to') is not None:
+        query = query.where(AuditSegment.month <= month_key(filters['date_to']))
+    if after:
+        query = query.where(AuditSegment.month <= month_key(after[0]))
+
+    result = []
+    current_month = None
+    month_rows = []
+    for month, data in db.session.execute(query.order_by(AuditSegment.month.desc())):
+        if month != current_month:
+            # Месяц полностью прочитан: сортируем его строки и забираем нужное количество
+            result.extend(_select_rows(month_rows, after, filters))
+            if len(result) >= needed:
+                return result[:needed]
+            current_month = month
+            month_rows = []
+        month_rows.extend(decode_segment(data))
+
+    result.extend(_select_rows(month_rows, after, filters))
+    return result[:needed]
+
+def _select_rows(rows, after, filters):
+    selected = [
+        row for row in rows
+        if _matches(row, filters) and (after is None or (row['created_at'], row['id']) < after)
+    ]
+    selected.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+    return selected
+
+# --- Партиционирование и компактификация ---
+
+def is_partitioned():
+    """audit_logs секционирована по месяцам (PostgreSQL)"""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'audit_logs'"
+    )).scalar())
+
+def ensure_audit_partitions(months_ahead=3, today=None):
+    """Создание месячных секций audit_logs на months_ahead месяцев вперед (PostgreSQL)"""
+    if not is_partitioned():
+        return []
+
+    first = (today or date.today()).replace(day=1)
+    created = []
+    for i in range(months_ahead + 1):
+        key = month_key(add_period(first, 'monthly', count=i))
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(key)} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month_start(key).isoformat()}') TO ('{month_end(key).isoformat()}')"
+        ))
+        created.append(partition_name(key))
+    db.session.commit()
+    return created
+
+def compact_audit_log(keep_months=3, today=None):
+    """Перенос месяцев старше keep_months в сжатые сегменты.
+
+    Каждый месяц переносится отдельной транзакцией: сегменты по пользователям
+    записываются, строки удаляются из горячей таблицы (на PostgreSQL с
+    секционированием удаляется вся секция месяца). Возвращает статистику.
+    """
+    cutoff = add_period((today or date.today()).replace(day=1), 'monthly', count=-keep_months)
+
+    oldest = db.session.execute(
+        select(func.min(AuditLog.created_at)).where(AuditLog.created_at < cutoff)
+    ).scalar()
+    if oldest is None:
+        return []
+
+    key = month_key(oldest)
+    stats = []
+    while month_start(key) < cutoff:
+        stats.append(_compact_month(key))
+        key = month_key(month_end(key))
+    return [item for item in stats if item['rows']]
+
+def _compact_month(key):
+    start, end = month_start(key), month_end(key)
+    statement = AUDIT_EXPORT.select().where(
+        AuditLog.created_at >= start,
+        AuditLog.created_at < end
+    ).order_by(AuditLog.user_id, AuditLog.id)
+
+    segments = 0
+    rows_total = 0
+    compressed = 0
+    current_user = None
+    buffer = []
+
+    def flush():
+        nonlocal segments, compressed
+        if not buffer:
+            return
+        data = encode_segment(buffer)
+        db.session.execute(insert(AuditSegment).values(
+            user_id=current_user,
+            month=key,
+            row_count=len(buffer),
+            min_id=buffer[0]['id'],
+            max_id=buffer[-1]['id'],
+            data=data,
+            created_at=datetime.utcnow()
+        ))
+        segments += 1
+        compressed += len(data)
+
+    try:
+        for partition in db.session.execute(statement.execution_options(yield_per=5000)).partitions():
+            for row in AUDIT_EXPORT.rows(partition):
+                if row['user_id'] != current_user:
+                    flush()
+                    current_user = row['user_id']
+                    buffer = []
+                buffer.append(row)
+                rows_total += 1
+        flush()
+
+        if is_partitioned():
+            db.session.execute(text(f'DROP TABLE IF EXISTS {partition_name(key)}'))
+        db.session.execute(delete(AuditLog).where(AuditLog.created_at >= start, AuditLog.created_at < end))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info('audit month %s: %d rows -> %d segments (%d bytes)', key, rows_total, segments, compressed)
+    return {'month': key, 'rows': rows_total, 'segments': segments, 'compressed_bytes': compressed}
@@ -1,9 +1,90 @@
 from functools import wraps
-from flask import request, jsonify, g
+from flask import request, jsonify, g, current_app
+from sqlalchemy import event
 import jwt
 import datetime
+import time
+import hmac
 from app import db
 from app.models import User
+from app.cache import TTLCache
+from app.replicas import SAFE_METHODS, read_primary
+from app.sharding import shard_map, using_shard, allocate_user_id
+
+# Кэш пользователей (user_id -> Principal) и уже проверенных токенов (token -> (user_id, exp))
+principal_cache = TTLCache()
+token_cache = TTLCache()
+
+class Principal:
+    """Снимок пользователя, который безопасно хранить между запросами"""
+    __slots__ = ('id', 'username', 'email')
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email)
+
+def init_principal_cache(app):
+    """Настройка кэша пользователей из конфигурации приложения"""
+    maxsize = app.config.get('PRINCIPAL_CACHE_SIZE', 10000)
+    ttl = app.config.get('PRINCIPAL_CACHE_TTL', 60)
+    principal_cache.configure(maxsize=maxsize, ttl=ttl)
+    token_cache.configure(maxsize=maxsize, ttl=ttl)
+    principal_cache.clear()
+    token_cache.clear()
+
+def invalidate_principal(user_id):
+    """Сброс кэша для пользователя (вызывать при изменении или удалении пользователя)"""
+    principal_cache.pop(user_id)
+    token_cache.discard_where(lambda token, value: value[0] == user_id)
+
+def principal_cache_stats():
+    """Счетчики попаданий/промахов кэша пользователей и токенов"""
+    return {
+        'principals': principal_cache.stats(),
+        'tokens': token_cache.stats()
+    }
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    invalidate_principal(target.id)
+
+def _decode_token(token):
+    """Декодирование токена с повторным использованием ранее проверенных"""
+    cached = token_cache.get(token)
+    if cached is not None:
+        user_id, exp = cached
+        if exp > time.time():
+            return user_id
+        token_cache.pop(token)
+        raise jwt.ExpiredSignatureError('Signature has expired')
+    
+    data = jwt.decode(token, 'your-secret-key', algorithms=['HS256'])
+    exp = data.get('exp')
+    if exp is not None:
+        # Не держим токен в кэше дольше, чем он действителен
+        token_cache.set(token, (data['user_id'], exp),
+                        ttl=min(token_cache.ttl, max(exp - time.time(), 0)))
+    return data['user_id']
+
+def load_principal(user_id):
+    """Получение пользователя из кэша или из базы данных"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    
+    user = db.session.get(User, user_id)
+    if not user:
+        return None
+    
+    principal = Principal.from_user(user)
+    principal_cache.set(user_id, principal)
+    return principal
 
 def create_token(user_id):
     """Создание JWT токена"""
@@ -28,9 +109,20 @@ def token_required(f):
             return jsonify({'error': 'Token is missing'}), 401
         
         try:
-            # Декодируем токен
-            data = jwt.decode(token, 'your-secret-key', algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+            if current_app.config.get('PRINCIPAL_CACHE_ENABLED', True):
+                # Шард выбирается по id из токена еще до загрузки пользователя
+                g.shard_user_id = _decode_token(token)
+                find_principal = load_principal
+            else:
+                # Декодируем токен
+                data = jwt.decode(token, 'your-secret-key', algorithms=['HS256'])
+                g.shard_user_id = data['user_id']
+                find_principal = lambda user_id: db.session.get(User, user_id)
+            
+            current_user = find_principal(g.shard_user_id)
+            # Только что зарегистрированного пользователя может еще не быть на реплике
+            if not current_user and read_primary():
+                current_user = find_principal(g.shard_user_id)
             
             if not current_user:
                 return jsonify({'error': 'User not found'}), 401
@@ -43,16 +135,44 @@ def token_required(f):
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Invalid token'}), 401
         
+        # Данные пользователя переносятся на другой шард
+        if request.method not in SAFE_METHODS and shard_map.is_readonly(current_user.id):
+            response = jsonify({'error': 'User data is being moved, try again later'})
+            return response, 503, {'Retry-After': str(int(shard_map.reload_interval) + 1)}
+        
         return f(*args, **kwargs)
     
     return decorated
 
+def find_user(*criteria, prefer=None):
+    """Первый пользователь по условию; при шардировании опрашиваются все шарды (prefer - первым)"""
+    if not shard_map.enabled:
+        return User.query.filter(*criteria).first()
+    
+    for shard in sorted(range(shard_map.count), key=lambda shard: shard != prefer):
+        with using_shard(shard):
+            user = User.query.filter(*criteria).first()
+        if user:
+            return user
+    return None
+
 def register_user(username, email, password):
     """Регистрация нового пользователя"""
+    # Шард нового пользователя определяется по email
+    bucket = shard = None
+    if shard_map.enabled:
+        bucket = shard_map.bucket_for_email(email)
+        if bucket in shard_map.readonly:
+            return None, 'Registration is temporarily unavailable, try again later'
+        shard = shard_map.assignment[bucket]
+    
     # Проверяем, существует ли пользователь
-    existing_user = User.query.filter_by(email=email).first()
+    existing_user = find_user(User.email == email, prefer=shard)
     if existing_user:
         return None, 'User already exists'
+    # Уникальность username между шардами не обеспечивается индексом
+    if shard is not None and find_user(User.username == username):
+        return None, 'Username already exists'
     
     # Создаем нового пользователя
     user = User(
@@ -62,8 +182,14 @@ def register_user(username, email, password):
     )
     
     try:
-        db.session.add(user)
-        db.session.commit()
+        with using_shard(shard):
+            if shard is not None:
+                user.id = user_id = allocate_user_id(db.session.connection(), bucket)
+            db.session.add(user)
+            db.session.commit()
+        if shard is not None:
+            # Дальнейшие запросы этого контекста идут на шард нового пользователя
+            g.shard_user_id = user_id
         return user, None
     except Exception as e:
         db.session.rollback()
@@ -71,7 +197,8 @@ def register_user(username, email, password):
 
 def login_user(email, password):
     """Аутентификация пользователя"""
-    user = User.query.filter_by(email=email).first()
+    prefer = shard_map.assignment[shard_map.bucket_for_email(email)] if shard_map.enabled else None
+    user = find_user(User.email == email, prefer=prefer)
     
     if not user:
         return None, 'User not found'
@@ -82,4 +209,20 @@ def login_user(email, password):
     
     # Создаем токен
     token = create_token(user.id)
-    return token, None
\ No newline at end of file
+    return token, None
+
+def admin_required(f):
+    """Декоратор для служебных эндпоинтов: заголовок X-Admin-Token должен совпадать с ADMIN_TOKEN"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        expected = current_app.config.get('ADMIN_TOKEN')
+        if not expected:
+            return jsonify({'error': 'Admin access is not configured'}), 403
+        
+        provided = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(provided.encode(), expected.encode()):
+            return jsonify({'error': 'Invalid admin token'}), 403
+        
+        return f(*args, **kwargs)
+    
+    return decorated
@@ -0,0 +1,167 @@
+import logging
+import os
+import socket
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import select, insert, update, delete, bindparam, exists
+from app import db
+from app.models import Subscription, BillingClaim
+from app.audit import audit_sink, build_audit_row
+from app.database import bump_data_version
+from app.schedule import schedule_for_rows
+
+logger = logging.getLogger(__name__)
+
+# СУБД с поддержкой SELECT ... FOR UPDATE SKIP LOCKED
+SKIP_LOCKED_DIALECTS = ('postgresql', 'mysql', 'oracle')
+
+# Самый длинный период (год) плюс запас на високосный день
+MAX_PERIOD_DAYS = 367
+
+def default_worker_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+def _due_rows_query(as_of):
+    return select(
+        Subscription.id,
+        Subscription.user_id,
+        Subscription.periodicity,
+        Subscription.start_date,
+        Subscription.next_payment_date
+    ).where(
+        Subscription.is_active == True,
+        Subscription.next_payment_date <= as_of
+    )
+
+def _claim_skip_locked(as_of, chunk_size):
+    """Захват пачки строк блокировкой (строки, занятые другими воркерами, пропускаются)"""
+    return db.session.execute(
+        _due_rows_query(as_of)
+        .order_by(Subscription.id)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+def _claim_with_table(as_of, chunk_size, worker_id, claim_timeout):
+    """Захват пачки через таблицу billing_claims (для SQLite и других СУБД без SKIP LOCKED)"""
+    now = datetime.utcnow()
+    claimed = BillingClaim.__table__
+    
+    # Освобождаем захваты упавших воркеров
+    db.session.execute(delete(claimed).where(claimed.c.claimed_at < now - claim_timeout))
+    
+    candidates = select(
+        Subscription.id,
+        Subscription.next_payment_date,
+        db.literal(worker_id),
+        db.literal(now)
+    ).where(
+        Subscription.is_active == True,
+        Subscription.next_payment_date <= as_of,
+        ~exists().where(claimed.c.subscription_id == Subscription.id)
+    ).order_by(Subscription.id).limit(chunk_size)
+    
+    db.session.execute(
+        insert(claimed).from_select(
+            ['subscription_id', 'due_date', 'worker_id', 'claimed_at'], candidates
+        )
+    )
+    # Захват фиксируется отдельной короткой транзакцией
+    db.session.commit()
+    
+    return db.session.execute(
+        _due_rows_query(as_of).join(
+            claimed,
+            (claimed.c.subscription_id == Subscription.id) &
+            (claimed.c.due_date == Subscription.next_payment_date)
+        ).where(claimed.c.worker_id == worker_id).order_by(Subscription.id)
+    ).all()
+
+def next_dates_after(rows, as_of):
+    """Первая дата платежа после as_of для каждой строки (векторно)"""
+    schedule = schedule_for_rows(rows, as_of + timedelta(days=1), as_of + timedelta(days=MAX_PERIOD_DAYS))
+    _, first = np.unique(schedule.index, return_index=True)
+    return [d.item() for d in schedule.dates[first]]
+
+def advance_chunk(rows, as_of, worker_id=None):
+    """Перевод пачки подписок на следующий платеж одним UPDATE (executemany)"""
+    now = datetime.utcnow()
+    new_dates = next_dates_after(rows, as_of)
+    
+    params = [{
+        'b_id': row.id,
+        'b_old': row.next_payment_date,
+        'b_new': new_date,
+        'b_now': now
+    } for row, new_date in zip(rows, new_dates)]
+    
+    table = Subscription.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam('b_id'), table.c.next_payment_date == bindparam('b_old'))
+        .values(next_payment_date=bindparam('b_new'), updated_at=bindparam('b_now')),
+        params
+    )
+    
+    audit_sink.record_many([build_audit_row(
+        user_id=row.user_id,
+        action='UPDATE_NEXT_PAYMENT',
+        table_name='subscriptions',
+        record_id=row.id,
+        old_values={'next_payment_date': row.next_payment_date.isoformat()},
+        new_values={'next_payment_date': new_date.isoformat()}
+    ) for row, new_date in zip(rows, new_dates)])
+    
+    bump_data_version(*{row.user_id for row in rows})
+    
+    if worker_id is not None:
+        claimed = BillingClaim.__table__
+        db.session.execute(
+            delete(claimed).where(
+                claimed.c.worker_id == worker_id,
+                claimed.c.subscription_id.in_([row.id for row in rows])
+            )
+        )
+
+def advance_due_subscriptions(as_of=None, chunk_size=500, worker_id=None,
+                              max_chunks=None, claim_timeout=timedelta(minutes=10)):
+    """Перевод всех подписок с наступившим платежом на следующий период.
+
+    Повторный запуск безопасен: обработанные подписки больше не попадают в выборку.
+    Несколько воркеров могут работать одновременно. Возвращает статистику по пачкам.
+    """
+    as_of = as_of or date.today()
+    worker_id = worker_id or default_worker_id()
+    use_skip_locked = db.engine.dialect.name in SKIP_LOCKED_DIALECTS
+    
+    stats = []
+    while max_chunks is None or len(stats) < max_chunks:
+        started = time.perf_counter()
+        try:
+            if use_skip_locked:
+                rows = _claim_skip_locked(as_of, chunk_size)
+            else:
+                rows = _claim_with_table(as_of, chunk_size, worker_id, claim_timeout)
+            
+            if not rows:
+                db.session.commit()
+                break
+            
+            advance_chunk(rows, as_of, None if use_skip_locked else worker_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        elapsed = time.perf_counter() - started
+        chunk = {
+            'chunk': len(stats) + 1,
+            'rows': len(rows),
+            'seconds': round(elapsed, 4),
+            'rows_per_second': round(len(rows) / elapsed, 1) if elapsed else None
+        }
+        logger.info('billing chunk %(chunk)d: %(rows)d rows in %(seconds)ss (%(rows_per_second)s rows/s)', chunk)
+        stats.append(chunk)
+    
+    return stats
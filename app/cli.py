@@ -0,0 +1,339 @@
+import sys
+import click
+from flask.cli import with_appcontext
+from app.sharding import each_shard
+
+def shard_label(shard):
+    """Префикс строк вывода пакетных задач при шардировании"""
+    return '' if shard is None else f'shard {shard}: '
+
+@click.command('explain-plans')
+@click.option('--output', type=click.Path(dir_okay=False), help='Файл для сохранения планов в JSON')
+@with_appcontext
+def explain_plans_command(output):
+    """Проверка планов горячих запросов (ошибка при seq scan)"""
+    from app.explain import collect_plans, write_plans
+    
+    plans = collect_plans()
+    if output:
+        write_plans(plans, output)
+    
+    failed = False
+    for name, info in plans.items():
+        status = 'SEQ SCAN' if info['sequential_scans'] else 'ok'
+        failed = failed or bool(info['sequential_scans'])
+        click.echo(f'{name}: {status}')
+        for line in info['plan']:
+            click.echo(f'    {line}')
+    
+    if failed:
+        sys.exit(1)
+
+@click.command('advance-billing')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), help='Дата, на которую продвигаются платежи (по умолчанию сегодня)')
+@click.option('--chunk-size', default=500, show_default=True, help='Размер пачки')
+@click.option('--max-chunks', type=int, help='Ограничение числа пачек за запуск')
+@click.option('--worker-id', help='Идентификатор воркера (по умолчанию host-pid)')
+@with_appcontext
+def advance_billing_command(as_of, chunk_size, max_chunks, worker_id):
+    """Перевод подписок с наступившим платежом на следующий период"""
+    from app.billing import advance_due_subscriptions
+    
+    advanced = 0
+    for shard in each_shard():
+        stats = advance_due_subscriptions(
+            as_of=as_of.date() if as_of else None,
+            chunk_size=chunk_size,
+            worker_id=worker_id,
+            max_chunks=max_chunks
+        )
+        
+        for chunk in stats:
+            click.echo(f"{shard_label(shard)}chunk {chunk['chunk']}: {chunk['rows']} rows in {chunk['seconds']}s "
+                       f"({chunk['rows_per_second']} rows/s)")
+        advanced += sum(chunk['rows'] for chunk in stats)
+    click.echo(f"advanced {advanced} subscriptions")
+
+@click.group('subscriptions')
+def subscriptions_group():
+    """Хранение подписок"""
+
+@subscriptions_group.command('archive')
+@click.option('--older-than-days', type=int, help='Сколько дней после удаления подписка остается в горячей таблице (по умолчанию SUBSCRIPTION_ARCHIVE_AFTER_DAYS)')
+@click.option('--chunk-size', default=500, show_default=True, help='Размер пачки')
+@click.option('--max-chunks', type=int, help='Ограничение числа пачек за запуск')
+@with_appcontext
+def subscriptions_archive_command(older_than_days, chunk_size, max_chunks):
+    """Перенос давно удаленных подписок в subscriptions_archive"""
+    from flask import current_app
+    from app.archive import archive_subscriptions
+    
+    if older_than_days is None:
+        older_than_days = current_app.config.get('SUBSCRIPTION_ARCHIVE_AFTER_DAYS', 90)
+    archived = 0
+    for shard in each_shard():
+        stats = archive_subscriptions(older_than_days, chunk_size=chunk_size, max_chunks=max_chunks)
+        for chunk in stats:
+            click.echo(f"{shard_label(shard)}chunk {chunk['chunk']}: {chunk['rows']} rows in {chunk['seconds']}s")
+        archived += sum(chunk['rows'] for chunk in stats)
+    click.echo(f'archived {archived} subscriptions')
+
+@click.group('rollup')
+def rollup_group():
+    """Агрегаты для месячной сводки"""
+
+@rollup_group.command('rebuild')
+@click.option('--user-id', type=int, help='Пересчитать только одного пользователя')
+@with_appcontext
+def rollup_rebuild_command(user_id):
+    """Полный пересчет агрегатов по таблице подписок"""
+    from app.rollup import rebuild_rollups
+    
+    click.echo(f'rebuilt {sum(rebuild_rollups(user_id) for _ in each_shard(user_id))} rollup rows')
+
+@rollup_group.command('check')
+@click.option('--user-id', type=int, help='Проверить только одного пользователя')
+@with_appcontext
+def rollup_check_command(user_id):
+    """Проверка агрегатов на расхождения с таблицей подписок"""
+    from app.rollup import check_rollups
+    
+    mismatches = [item for _ in each_shard(user_id) for item in check_rollups(user_id)]
+    for item in mismatches:
+        click.echo(f"user {item['user_id']} {item['period']} {item['periodicity']} {item['currency']}: "
+                   f"expected {item['expected']}, actual {item['actual']}")
+    
+    if mismatches:
+        sys.exit(1)
+    click.echo('rollups are consistent')
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(['subscriptions', 'audit']))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson', show_default=True)
+@click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']), help='Начало периода (created_at)')
+@click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']), help='Конец периода включительно')
+@click.option('--user-id', type=int, help='Только один пользователь')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Файл (по умолчанию stdout)')
+@with_appcontext
+def export_command(kind, fmt, date_from, date_to, user_id, output):
+    """Потоковая выгрузка подписок или истории аудита"""
+    from app.export import stream_export
+    
+    for chunk in stream_export(
+        kind, fmt,
+        user_id=user_id,
+        date_from=date_from.date() if date_from else None,
+        date_to=date_to.date() if date_to else None
+    ):
+        output.write(chunk)
+
+@click.group('audit')
+def audit_group():
+    """Хранение журнала аудита"""
+
+@audit_group.command('compact')
+@click.option('--keep-months', default=3, show_default=True, help='Сколько последних месяцев оставить в горячей таблице')
+@with_appcontext
+def audit_compact_command(keep_months):
+    """Перенос старых месяцев аудита в сжатые архивные сегменты"""
+    from app.audit_store import compact_audit_log
+    
+    for shard in each_shard():
+        for item in compact_audit_log(keep_months):
+            click.echo(f"{shard_label(shard)}{item['month']}: {item['rows']} rows -> {item['segments']} segments "
+                       f"({item['compressed_bytes']} bytes)")
+
+@audit_group.command('partitions')
+@click.option('--months-ahead', default=3, show_default=True)
+@with_appcontext
+def audit_partitions_command(months_ahead):
+    """Создание месячных секций audit_logs заранее (PostgreSQL)"""
+    from app.audit_store import ensure_audit_partitions
+    
+    created = [name for _ in each_shard() for name in ensure_audit_partitions(months_ahead)]
+    click.echo('\n'.join(created) if created else 'audit_logs is not partitioned')
+
+@click.group('schema')
+def schema_group():
+    """Отпечаток схемы, проверяемый при старте приложения"""
+
+@schema_group.command('stamp')
+@with_appcontext
+def schema_stamp_command():
+    """Запись отпечатка текущих моделей (после flask db upgrade)"""
+    from app.startup import stamp_fingerprint
+    
+    click.echo(stamp_fingerprint())
+
+@schema_group.command('check')
+@with_appcontext
+def schema_check_command():
+    """Сравнение отпечатка в базе с моделями (код 1 при расхождении)"""
+    from app.startup import schema_fingerprint, stored_fingerprint
+    
+    current, stored = schema_fingerprint(), stored_fingerprint()
+    click.echo(f'models: {current}')
+    click.echo(f'stored: {stored}')
+    if current != stored:
+        sys.exit(1)
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command():
+    """Удаление просроченных ключей идемпотентности"""
+    from app.idempotency import purge_expired
+    
+    click.echo(f'Deleted {sum(purge_expired() for _ in each_shard())} keys')
+
+@click.group('reminders')
+def reminders_group():
+    """Напоминания о предстоящих платежах"""
+
+@reminders_group.command('schedule')
+@click.option('--days-ahead', type=int, help='Горизонт в днях (по умолчанию REMINDER_DAYS_AHEAD)')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), help='Дата отсчета (по умолчанию сегодня)')
+@click.option('--batch-size', default=1000, show_default=True)
+@with_appcontext
+def reminders_schedule_command(days_ahead, as_of, batch_size):
+    """Постановка напоминаний в outbox одним проходом по датам платежей"""
+    from flask import current_app
+    from app.reminders import schedule_reminders
+    
+    for shard in each_shard():
+        stats = schedule_reminders(
+            days_ahead=days_ahead if days_ahead is not None else current_app.config.get('REMINDER_DAYS_AHEAD', 3),
+            as_of=as_of.date() if as_of else None,
+            batch_size=batch_size
+        )
+        click.echo(f"{shard_label(shard)}scanned {stats['scanned']} subscriptions, queued {stats['created']} reminders "
+                   f"in {stats['seconds']}s ({stats['rows_per_second']} rows/s)")
+
+@reminders_group.command('dispatch')
+@click.option('--workers', type=int, help='Число потоков (по умолчанию REMINDER_WORKERS)')
+@click.option('--batch-size', type=int, help='Размер пачки (по умолчанию REMINDER_BATCH_SIZE)')
+@click.option('--sender', help="Отправитель: log, file или 'модуль:Класс' (по умолчанию REMINDER_SENDER)")
+@click.option('--max-batches', type=int, help='Ограничение числа пачек на воркер за запуск')
+@with_appcontext
+def reminders_dispatch_command(workers, batch_size, sender, max_batches):
+    """Доставка напоминаний из outbox пулом воркеров"""
+    from flask import current_app
+    from app.reminders import dispatch_reminders, load_sender
+    
+    if sender:
+        sender = load_sender(sender, path=current_app.config.get('REMINDER_FILE'))
+    for shard in each_shard():
+        stats = dispatch_reminders(workers=workers, batch_size=batch_size, sender=sender,
+                                   max_batches=max_batches, shard=shard)
+        for item in stats['workers']:
+            click.echo(f"{shard_label(shard)}{item['worker']}: {item['batches']} batches, {item['sent']} sent, "
+                       f"{item['retried']} retried, {item['failed']} failed")
+        click.echo(f"{shard_label(shard)}sent {stats['sent']} in {stats['seconds']}s ({stats['sent_per_second']}/s), "
+                   f"retried {stats['retried']}, failed {stats['failed']}")
+
+@reminders_group.command('purge')
+@click.option('--older-than-days', default=30, show_default=True)
+@with_appcontext
+def reminders_purge_command(older_than_days):
+    """Удаление доставленных напоминаний"""
+    from app.reminders import purge_sent
+    
+    click.echo(f'Deleted {sum(purge_sent(older_than_days) for _ in each_shard())} reminders')
+
+@click.group('fx')
+def fx_group():
+    """Курсы валют для пересчета итогов"""
+
+@fx_group.command('load')
+@click.argument('path', type=click.File('r', encoding='utf-8'))
+@with_appcontext
+def fx_load_command(path):
+    """Загрузка курсов из JSON-файла {"base": "RUB", "rates": {"USD": "92.5"}}"""
+    import json
+    from app.fx import parse_rates, store_rates
+    
+    rates, error = parse_rates(json.load(path))
+    if error:
+        raise click.ClickException(error)
+    click.echo(f'loaded {len(rates)} rates, version {store_rates(rates)}')
+
+@fx_group.command('show')
+@with_appcontext
+def fx_show_command():
+    """Текущие курсы и их версия"""
+    from app.fx import list_rates
+    
+    rates = list_rates()
+    click.echo(f"base {rates['base']}, version {rates['version']}")
+    for currency, rate in rates['rates'].items():
+        click.echo(f'{currency} {rate}')
+
+@click.group('shards')
+def shards_group():
+    """Шарды данных пользователей"""
+
+@shards_group.command('init')
+@with_appcontext
+def shards_init_command():
+    """Настройка выдачи id на шардах (после flask db upgrade на каждом шарде и при добавлении шарда)"""
+    from app.sharding import init_id_sequences
+    
+    for shard, starts in init_id_sequences().items():
+        click.echo(f"{shard_label(shard)}" + ', '.join(f'{name} from {start}' for name, start in starts.items()))
+
+@shards_group.command('status')
+@with_appcontext
+def shards_status_command():
+    """Число бакетов и пользователей на шардах"""
+    from app.sharding import shard_map, shard_status
+    
+    for item in shard_status():
+        click.echo(f"{shard_label(item['shard'])}{item['buckets']} buckets, {item['users']} users")
+    if shard_map.readonly:
+        click.echo(f"read-only buckets: {', '.join(map(str, sorted(shard_map.readonly)))}")
+
+def _run_moves(moves, wait, chunk_size):
+    from app.sharding import move_buckets
+    
+    for item in move_buckets(moves, wait=wait, chunk_size=chunk_size):
+        rows = ', '.join(f'{count} {name}' for name, count in item['rows'].items() if count)
+        click.echo(f"bucket {item['bucket']}: shard {item['from']} -> {item['to']} ({rows or 'empty'})")
+
+@shards_group.command('move')
+@click.argument('bucket', type=int)
+@click.argument('shard', type=int)
+@click.option('--wait', type=float, help='Пауза, пока процессы перечитают карту (по умолчанию SHARD_MAP_RELOAD + 1)')
+@click.option('--chunk-size', default=500, show_default=True, help='Пользователей в одной транзакции копирования')
+@with_appcontext
+def shards_move_command(bucket, shard, wait, chunk_size):
+    """Перенос бакета пользователей на другой шард"""
+    _run_moves({bucket: shard}, wait, chunk_size)
+
+@shards_group.command('rebalance')
+@click.option('--dry-run', is_flag=True, help='Только показать план')
+@click.option('--wait', type=float, help='Пауза, пока процессы перечитают карту (по умолчанию SHARD_MAP_RELOAD + 1)')
+@click.option('--chunk-size', default=500, show_default=True, help='Пользователей в одной транзакции копирования')
+@with_appcontext
+def shards_rebalance_command(dry_run, wait, chunk_size):
+    """Выравнивание числа бакетов на шардах"""
+    from app.sharding import shard_map, plan_rebalance
+    
+    moves = plan_rebalance()
+    if dry_run:
+        for bucket, shard in sorted(moves.items()):
+            click.echo(f'bucket {bucket}: shard {shard_map.assignment[bucket]} -> {shard}')
+        return
+    _run_moves(moves, wait, chunk_size)
+
+def register_commands(app):
+    """Регистрация CLI-команд приложения"""
+    app.cli.add_command(explain_plans_command)
+    app.cli.add_command(advance_billing_command)
+    app.cli.add_command(subscriptions_group)
+    app.cli.add_command(rollup_group)
+    app.cli.add_command(export_command)
+    app.cli.add_command(audit_group)
+    app.cli.add_command(schema_group)
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(fx_group)
+    app.cli.add_command(reminders_group)
+    app.cli.add_command(shards_group)
@@ -1,36 +1,80 @@
 from app import db
-from app.models import AuditLog, Subscription
-from datetime import datetime
-import json
+from app.models import AuditLog, FxRate, Subscription, ArchivedSubscription, User
+from app.audit import audit_sink, build_audit_row
+from app.replicas import read_primary
+from app.rollup import rollup_summary
+from app.money import DEFAULT_CURRENCY, from_minor, currency_totals, single_total
+from app.schedule import add_period, schedule_for_rows, monthly_totals
+from datetime import datetime, date, timedelta
+from sqlalchemy import select, update, func
+import calendar
+import heapq
 
 def create_audit_log(user_id, action, table_name, record_id, old_values=None, new_values=None):
-    """Создание записи в логе аудита"""
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        table_name=table_name,
-        record_id=record_id,
-        old_values=json.dumps(old_values) if old_values else None,
-        new_values=json.dumps(new_values) if new_values else None
-    )
+    """Создание записи в логе аудита (в транзакции вызывающего кода, без коммита)"""
+    row = build_audit_row(user_id, action, table_name, record_id, old_values, new_values)
+    audit_sink.record_many([row])
+    return AuditLog(**row)
+
+def create_audit_logs_bulk(entries):
+    """Пакетное создание записей аудита в текущей транзакции (без коммита)"""
+    rows = [build_audit_row(
+        entry['user_id'],
+        entry['action'],
+        entry['table_name'],
+        entry['record_id'],
+        entry.get('old_values'),
+        entry.get('new_values')
+    ) for entry in entries]
     
-    try:
-        db.session.add(audit_log)
-        db.session.commit()
-        return audit_log
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error creating audit log: {e}")
-        return None
+    return audit_sink.record_many(rows)
+
+def bump_data_version(*user_ids):
+    """Увеличение версии данных пользователей в текущей транзакции (без коммита)"""
+    if not user_ids:
+        return
+    
+    db.session.execute(
+        update(User.__table__)
+        .where(User.__table__.c.id.in_(set(user_ids)))
+        .values(data_version=User.__table__.c.data_version + 1)
+    )
+
+def get_data_version(user_id):
+    """Текущая версия данных пользователя"""
+    return db.session.execute(
+        select(User.data_version).where(User.id == user_id)
+    ).scalar() or 0
+
+def rates_version():
+    """Запрос текущей версии курсов валют"""
+    return select(func.coalesce(func.max(FxRate.version), 0))
+
+def get_cache_state(user_id):
+    """Версия данных пользователя, валюта отчетов и версия курсов одним запросом"""
+    query = select(
+        User.data_version, User.reporting_currency, rates_version().scalar_subquery()
+    ).where(User.id == user_id)
+    row = db.session.execute(query).first()
+    # Реплика еще не получила пользователя: версии читаются из основной базы
+    if row is None and read_primary():
+        row = db.session.execute(query).first()
+    return tuple(row) if row else (0, DEFAULT_CURRENCY, 0)
 
 def get_user_subscriptions(user_id, active_only=True):
-    """Получение подписок пользователя"""
+    """Получение подписок пользователя (active_only=False - вместе с архивными)"""
     query = Subscription.query.filter_by(user_id=user_id)
     
     if active_only:
-        query = query.filter_by(is_active=True)
+        return query.filter_by(is_active=True).order_by(Subscription.next_payment_date).all()
     
-    return query.order_by(Subscription.next_payment_date).all()
+    # Обе выборки уже отсортированы в базе - остается слить их
+    archived = ArchivedSubscription.query.filter_by(user_id=user_id).order_by(ArchivedSubscription.next_payment_date)
+    return list(heapq.merge(
+        query.order_by(Subscription.next_payment_date).all(),
+        archived.all(),
+        key=lambda subscription: subscription.next_payment_date
+    ))
 
 def update_subscription_next_payment(subscription_id):
     """Обновление даты следующего платежа"""
@@ -44,9 +88,7 @@ def update_subscription_next_payment(subscription_id):
         subscription.next_payment_date = subscription.calculate_next_payment()
         subscription.updated_at = datetime.utcnow()
         
-        db.session.commit()
-        
-        # Логируем изменение
+        # Логируем изменение в той же транзакции
         create_audit_log(
             user_id=subscription.user_id,
             action='UPDATE_NEXT_PAYMENT',
@@ -55,57 +97,152 @@ def update_subscription_next_payment(subscription_id):
             old_values={'next_payment_date': old_date.isoformat()},
             new_values={'next_payment_date': subscription.next_payment_date.isoformat()}
         )
+        bump_data_version(subscription.user_id)
+        
+        db.session.commit()
         
         return subscription, None
     except Exception as e:
         db.session.rollback()
         return None, str(e)
 
-def get_upcoming_payments(user_id, days_ahead=30):
-    """Получение предстоящих платежей"""
-    from datetime import date, timedelta
-    
+def upcoming_payments_criteria(user_id, days_ahead=30):
+    """Условия выборки предстоящих платежей"""
     end_date = date.today() + timedelta(days=days_ahead)
     
-    subscriptions = Subscription.query.filter(
+    return (
         Subscription.user_id == user_id,
         Subscription.is_active == True,
         Subscription.next_payment_date <= end_date,
         Subscription.next_payment_date >= date.today()
-    ).order_by(Subscription.next_payment_date).all()
-    
-    return subscriptions
+    )
 
-def get_monthly_summary(user_id, year, month):
-    """Получение месячной статистики по подпискам"""
-    from datetime import date
-    from sqlalchemy import extract
+def upcoming_payments_query(user_id, days_ahead=30):
+    """Запрос предстоящих платежей (без сортировки)"""
+    return Subscription.query.filter(*upcoming_payments_criteria(user_id, days_ahead))
+
+def _schedule_rows(*criteria):
+    """Активные подписки в виде легких строк для расчета графика платежей"""
+    return db.session.execute(
+        select(
+            Subscription.id,
+            Subscription.name,
+            Subscription.amount_minor,
+            Subscription.currency,
+            Subscription.periodicity,
+            Subscription.start_date,
+            Subscription.next_payment_date
+        ).where(Subscription.is_active == True, *criteria)
+    ).all()
+
+def get_upcoming_payments(user_id, days_ahead=30):
+    """Получение всех предстоящих платежей (с повторами периодических подписок)"""
+    start = date.today()
+    end = start + timedelta(days=days_ahead)
     
-    # Подписки, активные в указанном месяце
-    subscriptions = Subscription.query.filter(
+    rows = _schedule_rows(
         Subscription.user_id == user_id,
-        Subscription.is_active == True,
-        extract('year', Subscription.start_date) <= year,
-        extract('month', Subscription.start_date) <= month
+        Subscription.next_payment_date <= end
+    )
+    schedule = schedule_for_rows(rows, start, end)
+    
+    return [{
+        'id': rows[i].id,
+        'name': rows[i].name,
+        'amount': from_minor(rows[i].amount_minor, rows[i].currency),
+        'amount_minor': rows[i].amount_minor,
+        'currency': rows[i].currency,
+        'next_payment_date': payment_date.item()
+    } for i, payment_date in zip(schedule.index.tolist(), schedule.dates)]
+
+def subscription_totals(*criteria):
+    """Количество и суммы по валютам для подписок по условиям - один GROUP BY в базе"""
+    rows = db.session.execute(
+        select(
+            Subscription.currency,
+            func.count(Subscription.id),
+            func.sum(Subscription.amount_minor)
+        ).where(*criteria).group_by(Subscription.currency)
     ).all()
+    return sum(count for _, count, _ in rows), currency_totals((currency, minor) for currency, _, minor in rows)
+
+def get_payment_forecast(user_id, months=12):
+    """Прогноз платежей по месяцам на months месяцев вперед"""
+    start = date.today()
+    end = add_period(start.replace(day=1), 'monthly', count=months) - timedelta(days=1)
+    
+    rows = _schedule_rows(
+        Subscription.user_id == user_id,
+        Subscription.next_payment_date <= end
+    )
+    schedule = schedule_for_rows(rows, start, end, ordered=False)
     
-    total_amount = sum(sub.amount for sub in subscriptions)
+    currencies = sorted({row.currency for row in rows})
+    codes = {currency: i for i, currency in enumerate(currencies)}
+    totals, counts = monthly_totals(
+        schedule, [row.amount_minor for row in rows], start, months,
+        groups=[codes[row.currency] for row in rows], group_count=max(len(currencies), 1)
+    )
+    
+    first_month = date(start.year, start.month, 1)
+    forecast = []
+    for i in range(months):
+        month_totals = {
+            currency: from_minor(totals[codes[currency], i], currency)
+            for currency in currencies
+            if totals[codes[currency], i]
+        }
+        forecast.append({
+            'month': add_period(first_month, 'monthly', count=i).strftime('%Y-%m'),
+            'payments_count': int(counts[i]),
+            'total_amount': single_total(month_totals),
+            'totals': month_totals
+        })
+    return forecast
+
+def get_monthly_summary(user_id, year, month, include_payments=True):
+    """Получение месячной статистики по подпискам"""
+    # Число и сумма подписок, начавшихся не позже месяца, - из агрегатов
+    by_periodicity = rollup_summary(user_id, year, month)
+    
+    all_totals = currency_totals(
+        (currency, minor) for item in by_periodicity.values() for currency, minor in item['totals'].items()
+    )
+    summary = {
+        'total_subscriptions': sum(item['subscriptions'] for item in by_periodicity.values()),
+        'total_monthly_amount': single_total(all_totals),
+        'totals': all_totals,
+        'by_periodicity': {}
+    }
+    for key, item in by_periodicity.items():
+        totals = currency_totals(item['totals'].items())
+        summary['by_periodicity'][key] = {
+            'subscriptions': item['subscriptions'],
+            'amount': single_total(totals),
+            'totals': totals
+        }
     
-    # Платежи в указанном месяце
+    if not include_payments:
+        return summary
+    
+    first_day = date(year, month, 1)
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    subscriptions = _schedule_rows(
+        Subscription.user_id == user_id,
+        Subscription.start_date <= last_day,
+        Subscription.next_payment_date <= last_day
+    )
+    
+    # Все платежи в указанном месяце по графику
+    schedule = schedule_for_rows(subscriptions, first_day, last_day)
     payments = []
-    for sub in subscriptions:
-        # Здесь должна быть логика расчета всех платежей в месяце
-        # Для простоты считаем только если next_payment_date в этом месяце
-        if (sub.next_payment_date.year == year and 
-            sub.next_payment_date.month == month):
-            payments.append({
-                'subscription': sub.name,
-                'amount': sub.amount,
-                'date': sub.next_payment_date
-            })
-    
-    return {
-        'total_subscriptions': len(subscriptions),
-        'total_monthly_amount': total_amount,
-        'upcoming_payments': payments
-    }
\ No newline at end of file
+    for i, payment_date in zip(schedule.index.tolist(), schedule.dates):
+        payments.append({
+            'subscription': subscriptions[i].name,
+            'amount': from_minor(subscriptions[i].amount_minor, subscriptions[i].currency),
+            'currency': subscriptions[i].currency,
+            'date': payment_date.item()
+        })
+    
+    summary['upcoming_payments'] = payments
+    return summary
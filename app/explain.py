@@ -0,0 +1,94 @@
+import json
+from datetime import date, datetime, timedelta
+from sqlalchemy import text, tuple_
+from app import db
+from app.models import Subscription, ArchivedSubscription, AuditLog, ReminderOutbox
+
+def hot_queries(user_id=1):
+    """Горячие запросы приложения, планы которых должны использовать индексы"""
+    today = date.today()
+    active = Subscription.query.filter_by(user_id=user_id, is_active=True)
+    
+    return {
+        'get_user_subscriptions': active.order_by(Subscription.next_payment_date),
+        'get_subscriptions_page': active.filter(
+            tuple_(Subscription.next_payment_date, Subscription.id) > tuple_(today, 0)
+        ).order_by(Subscription.next_payment_date, Subscription.id).limit(51),
+        'get_upcoming_payments': active.filter(
+            Subscription.next_payment_date >= today,
+            Subscription.next_payment_date <= today + timedelta(days=30)
+        ).order_by(Subscription.next_payment_date, Subscription.id),
+        'get_monthly_summary': active.filter(Subscription.start_date <= today),
+        'audit_by_user': AuditLog.query.filter_by(user_id=user_id).order_by(AuditLog.created_at),
+        'audit_by_record': AuditLog.query.filter_by(table_name='subscriptions', record_id=1),
+        'schedule_reminders': Subscription.query.filter(
+            Subscription.is_active == True,
+            Subscription.next_payment_date >= today,
+            Subscription.next_payment_date <= today + timedelta(days=3)
+        ).order_by(Subscription.next_payment_date, Subscription.id).limit(1000),
+        'archive_candidates': Subscription.query.filter(
+            Subscription.is_active == False,
+            Subscription.updated_at < datetime.utcnow() - timedelta(days=90)
+        ).order_by(Subscription.updated_at, Subscription.id).limit(500),
+        'get_archived_subscriptions': ArchivedSubscription.query.filter_by(
+            user_id=user_id
+        ).order_by(ArchivedSubscription.next_payment_date),
+        'claim_reminders': ReminderOutbox.query.filter(
+            ReminderOutbox.status == 'pending',
+            ReminderOutbox.next_attempt_at <= datetime.utcnow()
+        ).order_by(ReminderOutbox.next_attempt_at, ReminderOutbox.id).limit(100),
+    }
+
+def explain(query):
+    """План выполнения запроса для текущей СУБД (список строк)"""
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    dialect = db.engine.dialect.name
+    
+    if dialect == 'sqlite':
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).all()
+        return [row[-1] for row in rows]
+    
+    if dialect == 'postgresql':
+        # На маленьких таблицах планировщик предпочтет seq scan, поэтому
+        # проверяем, что индексный путь вообще существует
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+        rows = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {statement}')).all()
+        db.session.rollback()
+        return _flatten_pg_plan(rows[0][0][0]['Plan'])
+    
+    raise NotImplementedError(f'EXPLAIN is not supported for {dialect}')
+
+def _flatten_pg_plan(node, depth=0):
+    line = '  ' * depth + node['Node Type']
+    if 'Relation Name' in node:
+        line += f" on {node['Relation Name']}"
+    if 'Index Name' in node:
+        line += f" using {node['Index Name']}"
+    lines = [line]
+    for child in node.get('Plans', []):
+        lines.extend(_flatten_pg_plan(child, depth + 1))
+    return lines
+
+def sequential_scans(plan):
+    """Строки плана, означающие полный просмотр таблицы"""
+    return [
+        line for line in plan
+        if 'Seq Scan' in line or (line.startswith('SCAN ') and 'USING' not in line)
+    ]
+
+def collect_plans(user_id=1):
+    """Планы всех горячих запросов и найденные в них seq scan"""
+    plans = {}
+    for name, query in hot_queries(user_id).items():
+        plan = explain(query)
+        plans[name] = {
+            'dialect': db.engine.dialect.name,
+            'plan': plan,
+            'sequential_scans': sequential_scans(plan)
+        }
+    return plans
+
+def write_plans(plans, path):
+    """Сохранение планов в JSON для сравнения между релизами"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(plans, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from sqlalchemy import select, false
+from app import db
+from app.models import Subscription, ArchivedSubscription, AuditLog
+from app.money import from_minor
+from app.serializers import RowSerializer, field, isoformat, enum_value, SUBSCRIPTION_AMOUNT
+from app.sharding import each_shard
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+EXPORT_BATCH_SIZE = 1000
+
+SUBSCRIPTION_EXPORT = RowSerializer(
+    field('id', Subscription.id),
+    field('user_id', Subscription.user_id),
+    field('name', Subscription.name),
+    field('amount', SUBSCRIPTION_AMOUNT, from_minor),
+    field('currency', Subscription.currency),
+    field('periodicity', Subscription.periodicity, enum_value),
+    field('start_date', Subscription.start_date, isoformat),
+    field('next_payment_date', Subscription.next_payment_date, isoformat),
+    field('is_active', Subscription.is_active),
+    field('created_at', Subscription.created_at, isoformat),
+    field('updated_at', Subscription.updated_at, isoformat),
+)
+
+# Архивные подписки выгружаются в том же формате после основной таблицы
+ARCHIVED_SUBSCRIPTION_EXPORT = RowSerializer(
+    field('id', ArchivedSubscription.id),
+    field('user_id', ArchivedSubscription.user_id),
+    field('name', ArchivedSubscription.name),
+    field('amount', (ArchivedSubscription.amount_minor, ArchivedSubscription.currency), from_minor),
+    field('currency', ArchivedSubscription.currency),
+    field('periodicity', ArchivedSubscription.periodicity, enum_value),
+    field('start_date', ArchivedSubscription.start_date, isoformat),
+    field('next_payment_date', ArchivedSubscription.next_payment_date, isoformat),
+    field('is_active', false().label('is_active')),
+    field('created_at', ArchivedSubscription.created_at, isoformat),
+    field('updated_at', ArchivedSubscription.updated_at, isoformat),
+)
+
+AUDIT_EXPORT = RowSerializer(
+    field('id', AuditLog.id),
+    field('user_id', AuditLog.user_id),
+    field('action', AuditLog.action),
+    field('table_name', AuditLog.table_name),
+    field('record_id', AuditLog.record_id),
+    field('old_values', AuditLog.old_values),
+    field('new_values', AuditLog.new_values),
+    field('created_at', AuditLog.created_at, isoformat),
+)
+
+EXPORTS = {
+    'subscriptions': (SUBSCRIPTION_EXPORT, Subscription),
+    'audit': (AUDIT_EXPORT, AuditLog),
+}
+
+# Архивные таблицы, строки которых идут в выгрузку после основной
+ARCHIVE_EXPORTS = {
+    'subscriptions': (ARCHIVED_SUBSCRIPTION_EXPORT, ArchivedSubscription),
+}
+
+def export_query(kind, user_id=None, date_from=None, date_to=None, exports=EXPORTS):
+    """Запрос выгрузки: фильтр по пользователю и дате создания (включительно)"""
+    serializer, model = exports[kind]
+    query = serializer.select()
+    
+    if user_id is not None:
+        query = query.where(model.user_id == user_id)
+    if date_from is not None:
+        query = query.where(model.created_at >= date_from)
+    if date_to is not None:
+        query = query.where(model.created_at < date_to + timedelta(days=1))
+    
+    return query.order_by(model.id)
+
+def iter_rows(statement, batch_size=EXPORT_BATCH_SIZE):
+    """Потоковое чтение пачками через серверный курсор (yield_per)"""
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+def iter_export_batches(kind, user_id=None, date_from=None, date_to=None, batch_size=EXPORT_BATCH_SIZE):
+    """Пачки словарей для выгрузки (при шардировании - шард за шардом)"""
+    for _ in each_shard(user_id):
+        yield from _shard_export_batches(kind, user_id, date_from, date_to, batch_size)
+
+def _shard_export_batches(kind, user_id, date_from, date_to, batch_size):
+    # Для аудита сначала идут архивные сегменты
+    serializer, _ = EXPORTS[kind]
+    
+    if kind == 'audit':
+        from app.audit_store import iter_segment_rows
+        batch = []
+        for row in iter_segment_rows(user_id, date_from, date_to):
+            row['created_at'] = row['created_at'].isoformat()
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    statement = export_query(kind, user_id, date_from, date_to)
+    for partition in iter_rows(statement, batch_size):
+        yield serializer.rows(partition)
+    
+    if kind in ARCHIVE_EXPORTS:
+        archive_serializer, _ = ARCHIVE_EXPORTS[kind]
+        statement = export_query(kind, user_id, date_from, date_to, exports=ARCHIVE_EXPORTS)
+        for partition in iter_rows(statement, batch_size):
+            yield archive_serializer.rows(partition)
+
+def _json_default(value):
+    # Денежные суммы выгружаются строкой, без потери точности
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def stream_export(kind, fmt, user_id=None, date_from=None, date_to=None, batch_size=EXPORT_BATCH_SIZE):
+    """Генератор выгрузки в NDJSON или CSV; в памяти держится только одна пачка"""
+    serializer, _ = EXPORTS[kind]
+    batches = iter_export_batches(kind, user_id, date_from, date_to, batch_size)
+    
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=[f.name for f in serializer.fields])
+        writer.writeheader()
+        yield buffer.getvalue()
+        
+        for batch in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(batch)
+            yield buffer.getvalue()
+        return
+    
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_json_default).encode
+    for batch in batches:
+        yield ''.join(dumps(item) + '\n' for item in batch)
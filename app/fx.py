@@ -0,0 +1,200 @@
+import threading
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from flask import current_app, g
+from sqlalchemy import select, update, insert
+from app import db
+from app.models import FxRate
+from app.money import DEFAULT_CURRENCY, CURRENCY_EXPONENTS, from_minor, to_minor, minor_exponent
+from app.database import get_cache_state, rates_version
+from app.sharding import each_shard
+
+class FxTable:
+    """Снимок курсов валют одной версии: rate - единиц базовой валюты за единицу валюты"""
+
+    def __init__(self, version, rates, base=DEFAULT_CURRENCY):
+        self.version = version
+        self.base = base
+        self.rates = {base: Decimal(1), **rates}
+
+    def factor(self, currency, target):
+        """Множитель перевода минимальных единиц currency в минимальные единицы target (None без курса)"""
+        if currency not in self.rates or target not in self.rates:
+            return None
+        return float(
+            self.rates[currency] / self.rates[target]
+            * Decimal(10) ** (minor_exponent(target) - minor_exponent(currency))
+        )
+
+    def convert(self, currencies, minors, target):
+        """Перевод набора сумм в target одним векторным проходом.
+
+        Курс ищется один раз на валюту, а не на строку. Возвращает
+        (массив int64 минимальных единиц target, маска строк без курса).
+        """
+        import numpy as np
+        if not len(currencies):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+
+        unique, inverse = np.unique(np.asarray(currencies), return_inverse=True)
+        factors = np.array([self.factor(str(currency), target) for currency in unique], dtype=np.float64)
+        values = np.asarray(minors, dtype=np.float64) * factors[inverse]
+        missing = np.isnan(values)
+        return np.rint(np.where(missing, 0, values)).astype(np.int64), missing
+
+    def convert_amounts(self, currencies, minors, target):
+        """Суммы строк в target: список Decimal (None для валют без курса)"""
+        values, missing = self.convert(currencies, minors, target)
+        return [
+            None if absent else from_minor(value, target)
+            for value, absent in zip(values.tolist(), missing.tolist())
+        ]
+
+    def convert_totals(self, totals_list, target):
+        """Итоги {валюта: Decimal} в target для списка итогов одним проходом.
+
+        Возвращает список Decimal (None, если для какой-либо валюты итога нет курса).
+        """
+        import numpy as np
+        owners, currencies, minors = [], [], []
+        for i, totals in enumerate(totals_list):
+            for currency, amount in totals.items():
+                owners.append(i)
+                currencies.append(currency)
+                minors.append(to_minor(amount, currency))
+
+        values, missing = self.convert(currencies, minors, target)
+        owners = np.asarray(owners, dtype=np.int64)
+        sums = np.zeros(len(totals_list), dtype=np.int64)
+        np.add.at(sums, owners, values)
+        incomplete = np.bincount(owners[missing], minlength=len(totals_list)) > 0
+        return [
+            None if absent else from_minor(value, target)
+            for value, absent in zip(sums.tolist(), incomplete.tolist())
+        ]
+
+    def missing(self, currencies):
+        """Валюты без курса"""
+        return sorted(set(currencies) - set(self.rates))
+
+class RateCache:
+    """Курсы в памяти процесса; перечитываются из базы при смене версии"""
+
+    def __init__(self):
+        self._table = None
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        table = self._table
+        if table is not None and table.version == version:
+            return table
+        with self._lock:
+            if self._table is None or self._table.version != version:
+                self._table = _load_table(version)
+            return self._table
+
+    def invalidate(self):
+        with self._lock:
+            self._table = None
+
+rate_cache = RateCache()
+
+def init_fx(app):
+    """Сброс курсов в памяти (база и FX_BASE_CURRENCY могли смениться)"""
+    rate_cache.invalidate()
+
+def base_currency():
+    return current_app.config.get('FX_BASE_CURRENCY', DEFAULT_CURRENCY)
+
+def _load_table(version):
+    rates = dict(db.session.execute(select(FxRate.currency, FxRate.rate)).all())
+    return FxTable(version, {currency: Decimal(rate) for currency, rate in rates.items()}, base_currency())
+
+def reporting_context():
+    """(валюта отчетов, таблица курсов) для текущего пользователя.
+
+    Если conditional_get уже прочитал версии для ETag, повторного запроса нет.
+    """
+    state = g.get('cache_state')
+    if state is None:
+        state = g.cache_state = get_cache_state(g.current_user.id)
+    _, currency, version = state
+    return currency, rate_cache.get(version)
+
+def report(totals_list):
+    """Итоги в валюте отчетов (список Decimal или None) и блок "reporting" ответа"""
+    currency, table = reporting_context()
+    return table.convert_totals(totals_list, currency), {
+        'currency': currency,
+        'rates_version': table.version,
+        'missing_rates': table.missing(currency for totals in totals_list for currency in totals)
+    }
+
+def add_reporting_amounts(items, currencies, minors):
+    """Поле reporting_amount для строк ответа - один векторный проход по всем строкам"""
+    currency, table = reporting_context()
+    for item, amount in zip(items, table.convert_amounts(currencies, minors, currency)):
+        item['reporting_amount'] = amount
+    return items
+
+def parse_rates(payload):
+    """Курсы из тела запроса или файла: {"base": "RUB", "rates": {"USD": "92.5"}}.
+
+    Возвращает ({валюта: Decimal}, None) или (None, текст ошибки).
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('rates'), dict):
+        return None, 'Expected an object with "rates"'
+
+    base = payload.get('base', base_currency())
+    if base != base_currency():
+        return None, f'Rates must be quoted against {base_currency()}'
+
+    rates = {}
+    for currency, value in payload['rates'].items():
+        if currency not in CURRENCY_EXPONENTS:
+            return None, f'Unsupported currency: {currency}'
+        if currency == base:
+            return None, f'Rate of the base currency {base} is always 1'
+        try:
+            rate = Decimal(str(value))
+        except (ValueError, InvalidOperation):
+            return None, f'Invalid rate for {currency}'
+        if not rate.is_finite() or rate <= 0:
+            return None, f'Invalid rate for {currency}'
+        rates[currency] = rate
+    return rates, None
+
+def store_rates(rates):
+    """Запись курсов новой версией (коммит) и сброс кэша процесса; возвращает версию.
+
+    Остальные процессы увидят новую версию при следующем чтении версии.
+    При шардировании курсы с одной версией пишутся на каждый шард, а коммит
+    выполняется только после записи на все шарды; повторная загрузка после
+    сбоя коммита выравнивает версии (новая версия больше максимальной).
+    """
+    try:
+        version = max(db.session.execute(rates_version()).scalar() for _ in each_shard()) + 1
+        now = datetime.utcnow()
+        for _ in each_shard():
+            for currency, rate in rates.items():
+                values = {'rate': rate, 'version': version, 'updated_at': now}
+                updated = db.session.execute(
+                    update(FxRate).where(FxRate.currency == currency).values(**values)
+                ).rowcount
+                if not updated:
+                    db.session.execute(insert(FxRate).values(currency=currency, **values))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    rate_cache.invalidate()
+    return version
+
+def list_rates():
+    """Текущие курсы и их версия"""
+    rows = db.session.execute(select(FxRate.currency, FxRate.rate, FxRate.version).order_by(FxRate.currency)).all()
+    return {
+        'base': base_currency(),
+        'version': max((row.version for row in rows), default=0),
+        'rates': {row.currency: Decimal(row.rate) for row in rows}
+    }
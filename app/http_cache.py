@@ -0,0 +1,71 @@
+import hashlib
+from datetime import date
+from functools import wraps
+from flask import request, g, current_app, make_response
+from app.cache import TTLCache
+from app.database import get_cache_state
+
+# Кэш готовых ответов: (user_id, версии, endpoint, аргументы, дата) -> (тело, статус)
+response_cache = TTLCache()
+
+def init_response_cache(app):
+    """Настройка кэша ответов из конфигурации приложения"""
+    response_cache.configure(
+        maxsize=app.config.get('RESPONSE_CACHE_SIZE', 10000),
+        ttl=app.config.get('RESPONSE_CACHE_TTL', 300)
+    )
+    response_cache.clear()
+
+def make_etag(*parts):
+    """Сильный ETag из компонентов ключа"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+
+def conditional_get(f):
+    """Декоратор для GET-эндпоинтов: ETag по версии данных пользователя, валюте
+    отчетов и версии курсов валют; ответ 304.
+
+    Версии проверяются одним запросом до любых запросов к подпискам. Должен стоять после token_required.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not current_app.config.get('ETAG_ENABLED', True):
+            return f(*args, **kwargs)
+        
+        user_id = g.current_user.id
+        # Сохраняется в g: обработчику не нужно перечитывать валюту и версию курсов
+        state = g.cache_state = get_cache_state(user_id)
+        # Дата входит в ключ: окна "upcoming" и прогноза зависят от текущего дня
+        key = (
+            user_id,
+            state,
+            request.endpoint,
+            tuple(sorted(request.args.items(multi=True))),
+            date.today().isoformat()
+        )
+        etag = make_etag(*key)
+        
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+        
+        use_cache = current_app.config.get('RESPONSE_CACHE_ENABLED', False)
+        if use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                body, status = cached
+                response = current_app.response_class(body, status=status, mimetype='application/json')
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+        
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            if use_cache:
+                response_cache.set(key, (response.get_data(), response.status_code))
+        
+        return response
+    
+    return decorated
@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, g, current_app, make_response
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.cache import TTLCache
+from app.models import IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+# Завершенные ответы: (user_id, ключ) -> (хэш запроса, статус, тело)
+idempotency_cache = TTLCache()
+
+# Запросы, выполняющиеся в этом процессе: (user_id, ключ) -> Event
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def init_idempotency(app):
+    """Настройка кэша ответов по Idempotency-Key"""
+    idempotency_cache.configure(
+        maxsize=app.config.get('IDEMPOTENCY_CACHE_SIZE', 10000),
+        ttl=app.config.get('IDEMPOTENCY_TTL', 86400)
+    )
+    idempotency_cache.clear()
+
+def request_fingerprint():
+    """Хэш метода, пути и тела: один ключ нельзя использовать для разных запросов"""
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def _replay(request_hash, stored):
+    stored_hash, status_code, body = stored
+    if stored_hash != request_hash:
+        return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+    response = current_app.response_class(body, status=status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def _load(user_id, key):
+    row = db.session.execute(
+        select(
+            IdempotencyKey.request_hash,
+            IdempotencyKey.status_code,
+            IdempotencyKey.response_body,
+            IdempotencyKey.created_at
+        ).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    ).first()
+    # Закрываем транзакцию, чтобы следующее чтение видело чужие коммиты
+    db.session.commit()
+    return row
+
+def _claim(user_id, key, request_hash):
+    """Захват ключа строкой "в процессе"; False, если ключ уже занят"""
+    try:
+        db.session.execute(insert(IdempotencyKey).values(
+            user_id=user_id, key=key, request_hash=request_hash, created_at=datetime.utcnow()
+        ))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+def _release(user_id, key):
+    db.session.rollback()
+    db.session.execute(delete(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id, IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None)
+    ))
+    db.session.commit()
+
+def _store(user_id, key, request_hash, response):
+    body = response.get_data(as_text=True)
+    db.session.rollback()
+    db.session.execute(update(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+    ).values(status_code=response.status_code, response_body=body))
+    db.session.commit()
+    idempotency_cache.set((user_id, key), (request_hash, response.status_code, body))
+
+def _acquire(user_id, key, request_hash):
+    """Захват ключа или ожидание результата параллельного запроса.
+
+    Возвращает None, если ключ захвачен (запрос нужно выполнить), или
+    сохраненный ответ (хэш, статус, тело). Если параллельный запрос не
+    завершился за IDEMPOTENCY_WAIT_TIMEOUT, возвращается 'in_progress'.
+    """
+    ttl = timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL', 86400))
+    lock_timeout = timedelta(seconds=current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+    deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 10)
+    
+    while True:
+        if _claim(user_id, key, request_hash):
+            return None
+        
+        row = _load(user_id, key)
+        now = datetime.utcnow()
+        if row is None:
+            # Строку удалили между попытками (ответ с ошибкой или очистка): повторяем захват с паузой
+            if time.monotonic() >= deadline:
+                return 'in_progress'
+            time.sleep(POLL_INTERVAL)
+            continue
+        if row.status_code is not None:
+            if now - row.created_at < ttl:
+                return row.request_hash, row.status_code, row.response_body
+        elif now - row.created_at < lock_timeout:
+            # Запрос с этим ключом выполняется: ждем его завершения
+            if time.monotonic() >= deadline:
+                return 'in_progress'
+            with _inflight_lock:
+                event = _inflight.get((user_id, key))
+            if event is not None:
+                event.wait(max(0, min(deadline - time.monotonic(), 1.0)))
+            else:
+                time.sleep(POLL_INTERVAL)
+            continue
+        
+        # Просроченный ответ или брошенный захват: ключ можно использовать заново
+        db.session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.created_at == row.created_at
+        ))
+        db.session.commit()
+
+def idempotent(f):
+    """Декоратор для изменяющих эндпоинтов: повтор запроса с тем же Idempotency-Key
+    возвращает первый ответ, не выполняя запрос заново. Ставится после token_required.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+        
+        user_id = g.current_user.id
+        request_hash = request_fingerprint()
+        
+        stored = idempotency_cache.get((user_id, key))
+        if stored is not None:
+            return _replay(request_hash, stored)
+        
+        stored = _acquire(user_id, key, request_hash)
+        if stored == 'in_progress':
+            return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+        if stored is not None:
+            idempotency_cache.set((user_id, key), stored)
+            return _replay(request_hash, stored)
+        
+        event = threading.Event()
+        with _inflight_lock:
+            _inflight[(user_id, key)] = event
+        try:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code >= 500:
+                # Ошибку сервера не запоминаем: повтор выполнит запрос заново
+                _release(user_id, key)
+            else:
+                _store(user_id, key, request_hash, response)
+            return response
+        except Exception:
+            _release(user_id, key)
+            raise
+        finally:
+            with _inflight_lock:
+                _inflight.pop((user_id, key), None)
+            event.set()
+    
+    return decorated
+
+def purge_expired(ttl=None):
+    """Удаление ключей старше TTL"""
+    ttl = ttl if ttl is not None else current_app.config.get('IDEMPOTENCY_TTL', 86400)
+    deleted = db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - timedelta(seconds=ttl))
+    ).rowcount
+    db.session.commit()
+    return deleted
@@ -0,0 +1,190 @@
+import bisect
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from flask import g, request, current_app, has_app_context
+from sqlalchemy import event
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм, мс
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+_PLACEHOLDER_LISTS = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|:\w+|\$\d+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+|\$\d+)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+def statement_shape(statement):
+    """Форма запроса: без лишних пробелов и с раскрытыми IN-списками, свернутыми в (?)"""
+    return _PLACEHOLDER_LISTS.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+class RequestMetrics:
+    """SQL-метрики одного запроса"""
+    __slots__ = ('started', 'queries', 'sql_ms', 'slowest_ms', 'slowest_statement', 'pool_wait_ms', 'shapes')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement = None
+        self.pool_wait_ms = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, elapsed_ms):
+        self.queries += 1
+        self.sql_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def to_dict(self):
+        buckets = {f'le_{bound}': n for bound, n in zip(self.bounds, self.counts)}
+        buckets['inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avg': round(self.total / self.count, 3) if self.count else 0.0,
+            'buckets': buckets
+        }
+
+class EndpointStats:
+    """Агрегированные гистограммы по эндпоинтам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, metrics, total_ms):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'duration_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'sql_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'pool_wait_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'queries': Histogram(QUERY_COUNT_BUCKETS),
+                }
+            stats['duration_ms'].observe(total_ms)
+            stats['sql_ms'].observe(metrics.sql_ms)
+            stats['pool_wait_ms'].observe(metrics.pool_wait_ms)
+            stats['queries'].observe(metrics.queries)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {name: histogram.to_dict() for name, histogram in stats.items()}
+                for endpoint, stats in sorted(self._endpoints.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+endpoint_stats = EndpointStats()
+
+def _current_metrics():
+    # Фоновые потоки (например, запись аудита) работают без метрик запроса
+    return g.get('sql_metrics') if has_app_context() else None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время начала хранится в контексте выполнения: при ошибке запроса он просто отбрасывается
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = _current_metrics()
+    if metrics is not None:
+        metrics.record(statement, (time.perf_counter() - context._query_started) * 1000)
+
+def instrument_engine(engine):
+    """Подключение счетчиков к движку (один раз)"""
+    if engine.__dict__.get('_instrumented'):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    # Ожидание соединения из пула: событий "до выдачи соединения" в SQLAlchemy нет,
+    # поэтому замеряется сам вызов raw_connection (переживает engine.dispose()).
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        started = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            metrics = _current_metrics()
+            if metrics is not None:
+                metrics.pool_wait_ms += (time.perf_counter() - started) * 1000
+
+    engine.raw_connection = timed_raw_connection
+    engine._instrumented = True
+
+def server_timing(metrics, total_ms):
+    """Значение заголовка Server-Timing"""
+    return ', '.join((
+        f'db;dur={metrics.sql_ms:.2f};desc="{metrics.queries} queries"',
+        f'db-slowest;dur={metrics.slowest_ms:.2f}',
+        f'pool;dur={metrics.pool_wait_ms:.2f}',
+        f'total;dur={total_ms:.2f}',
+    ))
+
+def _start_request():
+    g.sql_metrics = RequestMetrics()
+
+def _finish_request(response):
+    metrics = g.pop('sql_metrics', None)
+    if metrics is None:
+        return response
+
+    total_ms = (time.perf_counter() - metrics.started) * 1000
+    endpoint = request.endpoint or 'unknown'
+    endpoint_stats.observe(endpoint, metrics, total_ms)
+    response.headers['Server-Timing'] = server_timing(metrics, total_ms)
+
+    logger.info(json.dumps({
+        'event': 'request_sql',
+        'method': request.method,
+        'endpoint': endpoint,
+        'status': response.status_code,
+        'duration_ms': round(total_ms, 3),
+        'queries': metrics.queries,
+        'sql_ms': round(metrics.sql_ms, 3),
+        'slowest_ms': round(metrics.slowest_ms, 3),
+        'slowest_statement': metrics.slowest_statement,
+        'pool_wait_ms': round(metrics.pool_wait_ms, 3),
+    }, ensure_ascii=False))
+
+    threshold = current_app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 10)
+    for shape, count in metrics.shapes.items():
+        if count > threshold:
+            logger.warning('Possible N+1 in %s: statement repeated %d times: %s', endpoint, count, shape)
+    return response
+
+def init_instrumentation(app):
+    """Включение SQL-инструментирования запросов (SQL_INSTRUMENTATION_ENABLED)"""
+    endpoint_stats.clear()
+    if not app.config.get('SQL_INSTRUMENTATION_ENABLED', False):
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -1,5 +1,8 @@
 from app import db
-from datetime import datetime, timedelta
+from sqlalchemy import true, false
+from app.schedule import add_period
+from app.money import DEFAULT_CURRENCY, from_minor
+from datetime import datetime
 from enum import Enum
 import json
 
@@ -10,13 +13,28 @@ class Periodicity(Enum):
     QUARTERLY = 'quarterly'
     YEARLY = 'yearly'
 
+# СУБД, поддерживающие частичные индексы (WHERE is_active)
+PARTIAL_INDEX_DIALECTS = ('postgresql', 'sqlite')
+
+def _without_partial_indexes(ddl, target, bind, dialect=None, **kw):
+    return dialect.name not in PARTIAL_INDEX_DIALECTS
+
+# Идентификаторы пользователей, подписок и аудита: 64 бита (при шардировании id
+# несут номер шарда и бакета, app/sharding.py). В SQLite INTEGER уже 64-битный
+# и только он служит псевдонимом rowid (автоинкремент)
+BigId = db.BigInteger().with_variant(db.Integer(), 'sqlite')
+
 class User(db.Model):
     __tablename__ = 'users'
     
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(BigId, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Версия данных пользователя, растет при каждом изменении подписок (для ETag)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Валюта, в которую пересчитываются итоги сводок
+    reporting_currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY, server_default=DEFAULT_CURRENCY)
     
     subscriptions = db.relationship('Subscription', backref='user', lazy=True)
     audit_logs = db.relationship('AuditLog', backref='user', lazy=True)
@@ -24,10 +42,12 @@ class User(db.Model):
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
     
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    id = db.Column(BigId, primary_key=True)
+    user_id = db.Column(BigId, db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    # Сумма в минимальных единицах валюты (копейках, центах)
+    amount_minor = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY, server_default=DEFAULT_CURRENCY)
     periodicity = db.Column(db.Enum(Periodicity), nullable=False)
     start_date = db.Column(db.Date, nullable=False)
     next_payment_date = db.Column(db.Date, nullable=False)
@@ -35,26 +55,195 @@ class Subscription(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Частичный индекс по активным подпискам (PostgreSQL и SQLite)
+        db.Index(
+            'ix_subscriptions_active_user_next_payment',
+            'user_id', 'next_payment_date', 'id',
+            postgresql_where=is_active == true(),
+            sqlite_where=is_active == true()
+        ).ddl_if(dialect=PARTIAL_INDEX_DIALECTS),
+        db.Index('ix_subscriptions_user_id', 'user_id').ddl_if(dialect=PARTIAL_INDEX_DIALECTS),
+        # Диапазон дат платежей по всем пользователям (напоминания, продвижение платежей)
+        db.Index(
+            'ix_subscriptions_active_next_payment',
+            'next_payment_date', 'id',
+            postgresql_where=is_active == true(),
+            sqlite_where=is_active == true()
+        ).ddl_if(dialect=PARTIAL_INDEX_DIALECTS),
+        # Составной индекс для остальных СУБД
+        db.Index(
+            'ix_subscriptions_user_active_next_payment',
+            'user_id', 'is_active', 'next_payment_date', 'id'
+        ).ddl_if(callable_=_without_partial_indexes),
+        db.Index(
+            'ix_subscriptions_next_payment_active',
+            'next_payment_date', 'is_active', 'id'
+        ).ddl_if(callable_=_without_partial_indexes),
+        # Удаленные подписки, ожидающие переноса в архив (updated_at - время удаления)
+        db.Index(
+            'ix_subscriptions_inactive_updated',
+            'updated_at', 'id',
+            postgresql_where=is_active == false(),
+            sqlite_where=is_active == false()
+        ).ddl_if(dialect=PARTIAL_INDEX_DIALECTS),
+        db.Index(
+            'ix_subscriptions_active_updated',
+            'is_active', 'updated_at', 'id'
+        ).ddl_if(callable_=_without_partial_indexes),
+    )
+    
+    @property
+    def amount(self):
+        """Сумма платежа в Decimal"""
+        return from_minor(self.amount_minor, self.currency)
+    
     def calculate_next_payment(self):
-        if self.periodicity == Periodicity.DAILY:
-            return self.next_payment_date + timedelta(days=1)
-        elif self.periodicity == Periodicity.WEEKLY:
-            return self.next_payment_date + timedelta(weeks=1)
-        elif self.periodicity == Periodicity.MONTHLY:
-            return self.next_payment_date + timedelta(days=30)
-        elif self.periodicity == Periodicity.QUARTERLY:
-            return self.next_payment_date + timedelta(days=90)
-        elif self.periodicity == Periodicity.YEARLY:
-            return self.next_payment_date + timedelta(days=365)
+        """Дата платежа после next_payment_date (день списания берется из start_date)"""
+        return add_period(self.next_payment_date, self.periodicity, anchor_day=self.start_date.day)
+
+class ArchivedSubscription(db.Model):
+    """Удаленная подписка, перенесенная из subscriptions в холодный архив (app/archive.py)"""
+    __tablename__ = 'subscriptions_archive'
+    
+    # id и остальные поля сохраняются как были в subscriptions
+    id = db.Column(BigId, primary_key=True, autoincrement=False)
+    user_id = db.Column(BigId, db.ForeignKey('users.id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    amount_minor = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+    periodicity = db.Column(db.Enum(Periodicity), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    next_payment_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_subscriptions_archive_user_next_payment', 'user_id', 'next_payment_date'),
+    )
+    
+    # Архивные подписки всегда удалены
+    is_active = False
+    
+    @property
+    def amount(self):
+        """Сумма платежа в Decimal"""
+        return from_minor(self.amount_minor, self.currency)
 
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
     
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    id = db.Column(BigId, primary_key=True)
+    user_id = db.Column(BigId, db.ForeignKey('users.id'), nullable=False)
     action = db.Column(db.String(50), nullable=False)
     table_name = db.Column(db.String(50), nullable=False)
-    record_id = db.Column(db.Integer, nullable=False)
+    record_id = db.Column(BigId, nullable=False)
     old_values = db.Column(db.Text)
     new_values = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_audit_logs_user_created', 'user_id', 'created_at'),
+        db.Index('ix_audit_logs_table_record', 'table_name', 'record_id'),
+    )
+
+class AuditSegment(db.Model):
+    """Сжатый неизменяемый архив записей аудита пользователя за месяц"""
+    __tablename__ = 'audit_segments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(BigId, nullable=False)
+    month = db.Column(db.Integer, nullable=False)  # YYYYMM
+    row_count = db.Column(db.Integer, nullable=False)
+    min_id = db.Column(BigId, nullable=False)
+    max_id = db.Column(BigId, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib(NDJSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_audit_segments_user_month', 'user_id', 'month'),
+    )
+
+class SpendRollup(db.Model):
+    """Число и сумма активных подписок пользователя по месяцу начала, периодичности и валюте"""
+    __tablename__ = 'spend_rollups'
+    
+    user_id = db.Column(BigId, db.ForeignKey('users.id'), primary_key=True)
+    period = db.Column(db.Integer, primary_key=True)  # YYYYMM
+    periodicity = db.Column(db.Enum(Periodicity), primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    subscription_count = db.Column(db.Integer, nullable=False, default=0)
+    total_minor = db.Column(db.BigInteger, nullable=False, default=0)
+
+class FxRate(db.Model):
+    """Курс валюты: сколько единиц базовой валюты (FX_BASE_CURRENCY) стоит единица currency"""
+    __tablename__ = 'fx_rates'
+    
+    currency = db.Column(db.String(3), primary_key=True)
+    rate = db.Column(db.Numeric(20, 10), nullable=False)
+    # Версия загрузки, в которой курс последний раз менялся; max(version) - версия таблицы
+    version = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ReminderOutbox(db.Model):
+    """Напоминание о платеже, ожидающее доставки (одно на подписку и дату платежа)"""
+    __tablename__ = 'reminder_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    subscription_id = db.Column(BigId, nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    user_id = db.Column(BigId, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON сообщения
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('subscription_id', 'due_date', name='uq_reminder_outbox_subscription_due'),
+        db.Index('ix_reminder_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+class BillingClaim(db.Model):
+    """Захват подписки воркером продвижения платежей (для СУБД без SKIP LOCKED)"""
+    __tablename__ = 'billing_claims'
+    
+    subscription_id = db.Column(BigId, primary_key=True)
+    due_date = db.Column(db.Date, primary_key=True)
+    worker_id = db.Column(db.String(100), nullable=False)
+    claimed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class SchemaState(db.Model):
+    """Служебные значения схемы (отпечаток моделей, с которым согласована база)"""
+    __tablename__ = 'schema_state'
+    
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.String(128), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class IdempotencyKey(db.Model):
+    """Первый ответ на запрос с заголовком Idempotency-Key (status_code NULL - запрос выполняется)"""
+    __tablename__ = 'idempotency_keys'
+    
+    user_id = db.Column(BigId, db.ForeignKey('users.id'), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_idempotency_keys_created', 'created_at'),
+    )
+
+class ShardSequence(db.Model):
+    """Счетчик id таблицы на шарде для СУБД без последовательностей (app/sharding.py)"""
+    __tablename__ = 'shard_sequences'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False)
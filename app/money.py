@@ -0,0 +1,61 @@
+from decimal import Decimal, InvalidOperation
+
+DEFAULT_CURRENCY = 'RUB'
+
+# Число знаков дробной части (ISO 4217) для поддерживаемых валют
+CURRENCY_EXPONENTS = {
+    'RUB': 2, 'USD': 2, 'EUR': 2, 'GBP': 2, 'CHF': 2, 'CNY': 2, 'KZT': 2, 'BYN': 2,
+    'UAH': 2, 'AMD': 2, 'GEL': 2, 'UZS': 2, 'TRY': 2, 'AED': 2, 'INR': 2, 'CAD': 2,
+    'AUD': 2, 'PLN': 2, 'CZK': 2, 'SEK': 2, 'NOK': 2, 'ILS': 2, 'THB': 2,
+    'JPY': 0, 'KRW': 0, 'VND': 0,
+    'KWD': 3, 'BHD': 3,
+}
+
+def minor_exponent(currency):
+    return CURRENCY_EXPONENTS[currency]
+
+def parse_amount(value, currency):
+    """Сумма из запроса в Decimal с проверкой точности валюты.
+
+    Возвращает (Decimal, None) или (None, текст ошибки).
+    """
+    try:
+        amount = Decimal(str(value))
+    except (ValueError, InvalidOperation):
+        return None, 'Invalid amount format'
+    if not amount.is_finite():
+        return None, 'Invalid amount format'
+    error = precision_error(amount, currency)
+    if error:
+        return None, error
+    return amount, None
+
+def precision_error(amount, currency):
+    """Текст ошибки, если сумма точнее минимальной единицы валюты (иначе None)"""
+    if amount.normalize().as_tuple().exponent < -minor_exponent(currency):
+        return f'Amount has too many decimal places for {currency}'
+    return None
+
+def to_minor(amount, currency):
+    """Decimal в целое число минимальных единиц (копеек, центов)"""
+    return int(Decimal(str(amount)).scaleb(minor_exponent(currency)).to_integral_value())
+
+def from_minor(value, currency):
+    """Целое число минимальных единиц в Decimal с точностью валюты"""
+    exponent = minor_exponent(currency)
+    return Decimal(int(value or 0)).scaleb(-exponent).quantize(Decimal(1).scaleb(-exponent))
+
+def currency_totals(rows):
+    """{валюта: Decimal} из пар (валюта, сумма в минимальных единицах)"""
+    totals = {}
+    for currency, minor in rows:
+        totals[currency] = totals.get(currency, 0) + int(minor or 0)
+    return {currency: from_minor(minor, currency) for currency, minor in sorted(totals.items())}
+
+def single_total(totals):
+    """Общая сумма, если все суммы в одной валюте (иначе None: складывать разные валюты нельзя)"""
+    if not totals:
+        return from_minor(0, DEFAULT_CURRENCY)
+    if len(totals) == 1:
+        return next(iter(totals.values()))
+    return None
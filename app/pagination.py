@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import tuple_, Select
+from app import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class InvalidCursor(ValueError):
+    """Некорректный или поврежденный курсор"""
+
+def encode_cursor(values):
+    """Упаковка значений ключа в непрозрачный курсор"""
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """Распаковка курсора в значения ключа с учетом типов колонок"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise InvalidCursor('Invalid cursor')
+    
+    values = []
+    for value, column in zip(payload, columns):
+        python_type = column.type.python_type
+        try:
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise TypeError
+        except (ValueError, TypeError):
+            raise InvalidCursor('Invalid cursor')
+        values.append(value)
+    
+    return values
+
+def parse_page_args(args, default_limit=DEFAULT_PAGE_SIZE, max_limit=MAX_PAGE_SIZE):
+    """Чтение limit и cursor из параметров запроса"""
+    limit = args.get('limit', default=default_limit, type=int)
+    limit = max(1, min(limit, max_limit))
+    return limit, args.get('cursor') or None
+
+def paginate(query, order_columns, limit, cursor=None, descending=False):
+    """Постраничная выборка по ключу (keyset pagination).
+
+    query - ORM Query или Core select(); возвращает (items, next_cursor),
+    next_cursor равен None на последней странице.
+    """
+    if cursor:
+        key = tuple_(*order_columns)
+        values = tuple_(*decode_cursor(cursor, order_columns))
+        query = query.filter(key < values if descending else key > values)
+    
+    order = [c.desc() for c in order_columns] if descending else list(order_columns)
+    query = query.order_by(*order).limit(limit + 1)
+    items = db.session.execute(query).all() if isinstance(query, Select) else query.all()
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([getattr(items[-1], c.key) for c in order_columns])
+    
+    return items, next_cursor
+
+def paginate_list(items, key, columns, limit, cursor=None):
+    """Постраничная выдача уже отсортированного списка по ключу key(item)"""
+    if cursor:
+        after = tuple(decode_cursor(cursor, columns))
+        items = [item for item in items if key(item) > after]
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(key(items[-1]))
+    
+    return items, next_cursor
@@ -0,0 +1,204 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from importlib import import_module
+from flask import request, jsonify, g, current_app
+
+logger = logging.getLogger(__name__)
+
+def refill(tokens, updated, now, rate, capacity):
+    """Пополнение корзины: rate токенов в секунду, не больше capacity"""
+    return min(capacity, tokens + max(now - updated, 0) * rate)
+
+def take(tokens, rate, cost):
+    """Списание cost токенов: (осталось, разрешено, через сколько секунд повторить)"""
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / rate
+
+class MemoryBackend:
+    """Корзины в памяти процесса (тесты, один воркер)"""
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, rate, capacity, cost=1, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, allowed, retry_after = take(refill(tokens, updated, now, rate, capacity), rate, cost)
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens, retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+class SQLiteBackend:
+    """Корзины в файле SQLite, общем для всех процессов-воркеров на хосте.
+
+    Каждое списание - короткая транзакция BEGIN IMMEDIATE, которая
+    сериализует воркеры на блокировке файла. Состояние не критично,
+    поэтому запись идет без fsync.
+    """
+
+    PRUNE_EVERY = 1000
+    PRUNE_AGE = 3600
+
+    def __init__(self, path=None, **options):
+        self.path = path or 'ratelimit.db'
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self):
+        # Соединение на поток; после fork создается заново
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def consume(self, key, rate, capacity, cost=1, now=None):
+        now = time.time() if now is None else now
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, allowed, retry_after = take(refill(tokens, updated, now, rate, capacity), rate, cost)
+            connection.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                               (key, tokens, now))
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                # Полные корзины можно удалить: отсутствие строки означает то же самое
+                connection.execute('DELETE FROM buckets WHERE updated < ?', (now - self.PRUNE_AGE,))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, tokens, retry_after
+
+    def reset(self):
+        self._connection().execute('DELETE FROM buckets')
+
+class RedisBackend:
+    """Корзины в Redis (несколько хостов). Требует пакет redis."""
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local rate, capacity, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url=None, **options):
+        import redis
+        self.client = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def consume(self, key, rate, capacity, cost=1, now=None):
+        now = time.time() if now is None else now
+        allowed, tokens = self._script(keys=[f'ratelimit:{key}'], args=[rate, capacity, cost, now])
+        tokens = float(tokens)
+        return bool(allowed), tokens, 0.0 if allowed else (cost - tokens) / rate
+
+    def reset(self):
+        for key in self.client.scan_iter('ratelimit:*'):
+            self.client.delete(key)
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sqlite': SQLiteBackend,
+    'redis': RedisBackend,
+}
+
+def load_backend(name, **options):
+    """Бэкенд по имени из BACKENDS или по пути 'модуль:Класс'"""
+    if ':' in name:
+        module, attr = name.split(':')
+        backend_class = getattr(import_module(module), attr)
+    else:
+        backend_class = BACKENDS[name]
+    return backend_class(**options)
+
+class RateLimiter:
+    """Ограничение частоты запросов по эндпоинтам (token bucket).
+
+    Лимиты - RATE_LIMITS: {endpoint: (запросов, секунд)}. Корзина
+    пополняется равномерно, ее емкость равна числу запросов за период.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.limits = {}
+        self.backend = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', False)
+        self.limits = dict(app.config.get('RATE_LIMITS', {}))
+        self.backend = None
+        if self.enabled:
+            self.backend = load_backend(
+                app.config.get('RATE_LIMIT_BACKEND', 'sqlite'),
+                path=app.config.get('RATE_LIMIT_STORAGE'),
+                url=app.config.get('RATE_LIMIT_URL')
+            )
+        app.extensions['rate_limiter'] = self
+
+    def check(self, endpoint, identity):
+        """(разрешено, секунд до повтора) для запроса identity к endpoint"""
+        limit = self.limits.get(endpoint)
+        if not self.enabled or limit is None:
+            return True, 0.0
+        
+        requests, period = limit
+        try:
+            allowed, _, retry_after = self.backend.consume(f'{endpoint}:{identity}', requests / period, requests)
+        except Exception as e:
+            # Недоступное хранилище лимитов не должно останавливать API
+            logger.error('Rate limit backend error: %s', e)
+            return True, 0.0
+        return allowed, retry_after
+
+limiter = RateLimiter()
+
+def client_identity():
+    """Пользователь из token_required или IP клиента (для /auth/*)"""
+    user = g.get('current_user')
+    if user is not None:
+        return f'user:{user.id}'
+    return f'ip:{request.remote_addr}'
+
+def rate_limit(f):
+    """Декоратор ограничения частоты; для эндпоинтов с токеном ставится после token_required"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        allowed, retry_after = limiter.check(request.endpoint, client_identity())
+        if not allowed:
+            response = jsonify({'error': 'Rate limit exceeded'})
+            response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+            return response, 429
+        return f(*args, **kwargs)
+    
+    return decorated
@@ -0,0 +1,317 @@
+"""Напоминания о предстоящих платежах через transactional outbox.
+
+Планировщик одним проходом по индексу next_payment_date (по всем
+пользователям сразу) складывает напоминания в reminder_outbox; уникальный
+ключ (subscription_id, due_date) не дает создать дубликат при повторном
+запуске. Пул воркеров забирает пачки из outbox и доставляет их через
+подключаемый отправитель с повторами и экспоненциальной задержкой.
+Доставка "как минимум один раз": в сообщении есть idempotency_key.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from importlib import import_module
+from flask import current_app
+from sqlalchemy import select, insert, update, delete, bindparam, tuple_, or_, func
+from app import db
+from app.models import ReminderOutbox, Subscription, User
+from app.money import from_minor
+from app.rollup import UPSERT_DIALECTS
+from app.billing import SKIP_LOCKED_DIALECTS, default_worker_id
+from app.sharding import using_shard
+
+logger = logging.getLogger(__name__)
+
+# --- Отправители ---
+
+class LogSender:
+    """Запись напоминаний в лог приложения"""
+
+    def __init__(self, **options):
+        pass
+
+    def send(self, message):
+        logger.info('reminder %s', json.dumps(message, ensure_ascii=False))
+
+class FileSender:
+    """Напоминания строками NDJSON в локальный файл (тесты, отладка)"""
+
+    def __init__(self, path=None, **options):
+        self.path = path or 'reminders.ndjson'
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        line = json.dumps(message, ensure_ascii=False) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as output:
+            output.write(line)
+
+SENDERS = {
+    'log': LogSender,
+    'file': FileSender,
+}
+
+def load_sender(name, **options):
+    """Отправитель по имени из SENDERS или по пути 'модуль:Класс' (метод send(message))"""
+    if ':' in name:
+        module, attr = name.split(':')
+        sender_class = getattr(import_module(module), attr)
+    else:
+        sender_class = SENDERS[name]
+    return sender_class(**options)
+
+# --- Планировщик ---
+
+def build_message(row):
+    """Сообщение напоминания из строки выборки"""
+    return {
+        'idempotency_key': f'{row.id}:{row.next_payment_date.isoformat()}',
+        'user_id': row.user_id,
+        'email': row.email,
+        'subscription_id': row.id,
+        'name': row.name,
+        'amount': str(from_minor(row.amount_minor, row.currency)),
+        'currency': row.currency,
+        'due_date': row.next_payment_date.isoformat()
+    }
+
+def _due_reminders_query(date_from, date_to):
+    return select(
+        Subscription.id,
+        Subscription.user_id,
+        User.email,
+        Subscription.name,
+        Subscription.amount_minor,
+        Subscription.currency,
+        Subscription.next_payment_date
+    ).join(User, User.id == Subscription.user_id).where(
+        Subscription.is_active == True,
+        Subscription.next_payment_date >= date_from,
+        Subscription.next_payment_date <= date_to
+    )
+
+def _enqueue(rows):
+    """Вставка пачки напоминаний в outbox без дубликатов; возвращает число новых"""
+    table = ReminderOutbox.__table__
+    existing = set(db.session.execute(
+        select(table.c.subscription_id, table.c.due_date).where(
+            table.c.subscription_id.in_([row.id for row in rows]),
+            table.c.due_date.between(rows[0].next_payment_date, rows[-1].next_payment_date)
+        )
+    ).all())
+
+    now = datetime.utcnow()
+    values = [{
+        'subscription_id': row.id,
+        'due_date': row.next_payment_date,
+        'user_id': row.user_id,
+        'payload': json.dumps(build_message(row), ensure_ascii=False),
+        'status': 'pending',
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now
+    } for row in rows if (row.id, row.next_payment_date) not in existing]
+    if not values:
+        return 0
+
+    # ON CONFLICT DO NOTHING защищает от параллельного запуска планировщика
+    upsert = UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    statement = insert(table) if upsert is None else upsert(table).on_conflict_do_nothing(
+        index_elements=['subscription_id', 'due_date']
+    )
+    db.session.execute(statement, values)
+    return len(values)
+
+def schedule_reminders(days_ahead=3, as_of=None, batch_size=1000):
+    """Постановка напоминаний о платежах в ближайшие days_ahead дней.
+
+    Подписки читаются пачками по ключу (next_payment_date, id), каждая
+    пачка вставляется и коммитится отдельно. Возвращает статистику.
+    """
+    as_of = as_of or date.today()
+    query = _due_reminders_query(as_of, as_of + timedelta(days=days_ahead))
+    order = (Subscription.next_payment_date, Subscription.id)
+
+    started = time.perf_counter()
+    scanned = created = 0
+    after = None
+    while True:
+        batch_query = query if after is None else query.where(tuple_(*order) > tuple_(*after))
+        try:
+            rows = db.session.execute(batch_query.order_by(*order).limit(batch_size)).all()
+            if not rows:
+                db.session.commit()
+                break
+            created += _enqueue(rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        scanned += len(rows)
+        after = (rows[-1].next_payment_date, rows[-1].id)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'scanned': scanned,
+        'created': created,
+        'seconds': round(elapsed, 4),
+        'rows_per_second': round(scanned / elapsed, 1) if elapsed else None
+    }
+    logger.info('reminders scheduled: %(created)d new of %(scanned)d due in %(seconds)ss', stats)
+    return stats
+
+# --- Доставка ---
+
+def claim_batch(worker_id, batch_size, lock_timeout):
+    """Захват пачки готовых к отправке напоминаний одним UPDATE (с SKIP LOCKED, где он есть)"""
+    table = ReminderOutbox.__table__
+    now = datetime.utcnow()
+    available = or_(table.c.locked_by.is_(None), table.c.locked_at < now - timedelta(seconds=lock_timeout))
+    ready = select(table.c.id).where(
+        table.c.status == 'pending',
+        table.c.next_attempt_at <= now,
+        available
+    ).order_by(table.c.next_attempt_at, table.c.id).limit(batch_size)
+    if db.engine.dialect.name in SKIP_LOCKED_DIALECTS:
+        ready = ready.with_for_update(skip_locked=True)
+
+    try:
+        db.session.execute(
+            update(table)
+            .where(table.c.id.in_(ready.scalar_subquery()), available)
+            .values(locked_by=worker_id, locked_at=now),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return db.session.execute(
+        select(table.c.id, table.c.payload, table.c.attempts)
+        .where(table.c.locked_by == worker_id, table.c.status == 'pending')
+        .order_by(table.c.id)
+    ).all()
+
+def deliver_batch(rows, sender, max_attempts, backoff):
+    """Отправка захваченной пачки и запись результатов; возвращает (отправлено, отложено, отброшено)"""
+    sent, failures = [], []
+    for row in rows:
+        try:
+            sender.send(json.loads(row.payload))
+            sent.append(row.id)
+        except Exception as e:
+            failures.append((row, e))
+
+    table = ReminderOutbox.__table__
+    now = datetime.utcnow()
+    try:
+        if sent:
+            db.session.execute(
+                update(table).where(table.c.id.in_(sent)).values(
+                    status='sent', sent_at=now, attempts=table.c.attempts + 1, locked_by=None, locked_at=None
+                ),
+                execution_options={'synchronize_session': False}
+            )
+        if failures:
+            db.session.execute(
+                update(table).where(table.c.id == bindparam('r_id')).values(
+                    status=bindparam('r_status'),
+                    attempts=bindparam('r_attempts'),
+                    next_attempt_at=bindparam('r_next'),
+                    last_error=bindparam('r_error'),
+                    locked_by=None,
+                    locked_at=None
+                ),
+                [{
+                    'r_id': row.id,
+                    'r_status': 'failed' if row.attempts + 1 >= max_attempts else 'pending',
+                    'r_attempts': row.attempts + 1,
+                    'r_next': now + timedelta(seconds=backoff * 2 ** row.attempts),
+                    'r_error': str(error)[:500]
+                } for row, error in failures]
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    dropped = sum(1 for row, _ in failures if row.attempts + 1 >= max_attempts)
+    return len(sent), len(failures) - dropped, dropped
+
+def _run_worker(app, worker_id, sender, options):
+    stats = {'worker': worker_id, 'batches': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+    with app.app_context(), using_shard(options['shard']):
+        try:
+            while options['max_batches'] is None or stats['batches'] < options['max_batches']:
+                rows = claim_batch(worker_id, options['batch_size'], options['lock_timeout'])
+                if not rows:
+                    break
+                sent, retried, failed = deliver_batch(rows, sender, options['max_attempts'], options['backoff'])
+                stats['batches'] += 1
+                stats['sent'] += sent
+                stats['retried'] += retried
+                stats['failed'] += failed
+        finally:
+            db.session.remove()
+    return stats
+
+def dispatch_reminders(workers=None, batch_size=None, sender=None, max_batches=None, shard=None):
+    """Доставка напоминаний из outbox пулом потоков до опустошения очереди.
+
+    Каждый поток работает в своем контексте приложения и сессии (с шардом
+    shard, если он задан). Несколько процессов с этой функцией также могут
+    работать одновременно: пачки захватываются атомарно. Возвращает итоговую
+    статистику и по воркерам.
+    """
+    app = current_app._get_current_object()
+    config = app.config
+    workers = workers or config.get('REMINDER_WORKERS', 4)
+    sender = sender or load_sender(config.get('REMINDER_SENDER', 'log'), path=config.get('REMINDER_FILE'))
+    options = {
+        'batch_size': batch_size or config.get('REMINDER_BATCH_SIZE', 100),
+        'max_attempts': config.get('REMINDER_MAX_ATTEMPTS', 5),
+        'backoff': config.get('REMINDER_RETRY_BACKOFF', 60),
+        'lock_timeout': config.get('REMINDER_LOCK_TIMEOUT', 300),
+        'max_batches': max_batches,
+        'shard': shard
+    }
+    base_id = default_worker_id()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reminders') as pool:
+        futures = [
+            pool.submit(_run_worker, app, f'{base_id}-{i}', sender, options)
+            for i in range(workers)
+        ]
+        per_worker = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    stats = {
+        'sent': sum(item['sent'] for item in per_worker),
+        'retried': sum(item['retried'] for item in per_worker),
+        'failed': sum(item['failed'] for item in per_worker),
+        'seconds': round(elapsed, 4),
+        'workers': per_worker
+    }
+    stats['sent_per_second'] = round(stats['sent'] / elapsed, 1) if elapsed else None
+    logger.info('reminders dispatched: %(sent)d sent, %(retried)d retried, %(failed)d failed '
+                'in %(seconds)ss (%(sent_per_second)s/s)', stats)
+    return stats
+
+def outbox_stats():
+    """Число напоминаний по статусам"""
+    return dict(db.session.execute(
+        select(ReminderOutbox.status, func.count()).group_by(ReminderOutbox.status)
+    ).all())
+
+def purge_sent(older_than_days=30):
+    """Удаление доставленных напоминаний старше older_than_days дней"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    result = db.session.execute(
+        delete(ReminderOutbox).where(ReminderOutbox.status == 'sent', ReminderOutbox.sent_at < cutoff)
+    )
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,189 @@
+"""Чтение с реплик.
+
+Реплики задаются в SQLALCHEMY_BINDS ключами replica_0, replica_1, ...
+(из DATABASE_REPLICA_URLS). Сессия GET/HEAD-запроса читает через одну из
+здоровых реплик (по кругу), записи идут в основную базу, и после первой
+записи все чтения этого запроса тоже идут в основную базу. CLI-команды и
+фоновые задачи всегда работают с основной базой.
+
+Реплика, к которой не удалось подключиться или отставание которой больше
+DB_REPLICA_MAX_LAG, исключается на DB_REPLICA_CHECK_INTERVAL секунд;
+если здоровых реплик нет, запросы читают из основной базы.
+"""
+import itertools
+import logging
+import threading
+import time
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from app.sharding import shard_map, current_shard, bind_key
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+SAFE_METHODS = frozenset(['GET', 'HEAD'])
+
+# Отставание реплики в секундах (0, если все полученные изменения применены)
+LAG_QUERIES = {
+    'postgresql': (
+        'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END'
+    ),
+}
+
+class ReplicaRouter:
+    """Выбор реплики для чтения и учет их состояния в процессе"""
+
+    def __init__(self):
+        self.keys = ()
+        self.check_interval = 30
+        self.max_lag = None
+        self._engines = {}
+        self._checked_at = {}
+        self._down = {}
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def init_app(self, app):
+        from app import db
+
+        self.keys = tuple(sorted(
+            key for key in app.config.get('SQLALCHEMY_BINDS', {})
+            if key and key.startswith(REPLICA_BIND_PREFIX)
+        ))
+        self.check_interval = app.config.get('DB_REPLICA_CHECK_INTERVAL', 30)
+        self.max_lag = app.config.get('DB_REPLICA_MAX_LAG')
+        self._checked_at.clear()
+        self._down.clear()
+        if not self.keys:
+            self._engines = {}
+            return
+
+        with app.app_context():
+            self._engines = {key: db.engines[key] for key in self.keys}
+        for key, engine in self._engines.items():
+            event.listen(engine, 'handle_error', self._on_error(key))
+        app.before_request(_reset_routing)
+
+    def _on_error(self, key):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.mark_down(key, context.original_exception)
+        return handle_error
+
+    def choose(self):
+        """Ключ здоровой реплики по кругу или None (читать из основной базы)"""
+        start = next(self._counter)
+        for i in range(len(self.keys)):
+            key = self.keys[(start + i) % len(self.keys)]
+            if self._healthy(key):
+                return key
+        return None
+
+    def _healthy(self, key):
+        now = time.monotonic()
+        if now - self._checked_at.get(key, float('-inf')) < self.check_interval:
+            return key not in self._down
+        # Проверку выполняет один поток, остальные пока используют прежнее состояние
+        if not self._lock.acquire(blocking=False):
+            return key not in self._down
+        try:
+            self._checked_at[key] = now
+            self._check(key)
+        finally:
+            self._lock.release()
+        return key not in self._down
+
+    def _check(self, key):
+        engine = self._engines[key]
+        try:
+            with engine.connect() as connection:
+                query = LAG_QUERIES.get(engine.dialect.name)
+                lag = connection.execute(text(query or 'SELECT 1')).scalar()
+                if query is None:
+                    lag = None
+        except DBAPIError as e:
+            self.mark_down(key, e)
+            return
+        if lag is not None and self.max_lag is not None and lag > self.max_lag:
+            self.mark_down(key, f'replication lag {lag:.1f}s')
+            return
+        if self._down.pop(key, None) is not None:
+            logger.info('Read replica %s is back', key)
+
+    def mark_down(self, key, reason):
+        """Исключение реплики до следующей проверки"""
+        if key not in self._down:
+            logger.warning('Read replica %s is unavailable: %s', key, reason)
+        self._down[key] = str(reason)
+        self._checked_at[key] = time.monotonic()
+
+    def status(self):
+        """Состояние реплик для /api/admin/metrics"""
+        return {
+            key: {'healthy': key not in self._down, 'error': self._down.get(key)}
+            for key in self.keys
+        }
+
+replica_router = ReplicaRouter()
+
+def _reset_routing():
+    # В тестах контекст приложения (и сессия) общий для нескольких запросов
+    from app import db
+    db.session.info.pop('replica', None)
+    db.session.info.pop('primary', None)
+
+def read_primary():
+    """Перевод чтений текущего запроса на основную базу (например, строки еще нет на отстающей реплике).
+
+    Возвращает True, если запрос до этого читал с реплики и чтение стоит повторить.
+    """
+    from app import db
+    info = db.session.info
+    was_replica = not info.get('primary') and info.get('replica') is not None
+    info['primary'] = True
+    return was_replica
+
+class RoutingSession(Session):
+    """Сессия, выбирающая шард пользователя (app/sharding.py) и реплику для чтений GET-запросов.
+
+    При шардировании реплики не используются.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and shard_map.enabled:
+            return self._db.engines[bind_key(current_shard(self.info))]
+        if bind is None and replica_router.keys:
+            key = self._read_replica(clause)
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _read_replica(self, clause):
+        info = self.info
+        if info.get('primary') or not has_request_context() or request.method not in SAFE_METHODS:
+            return None
+        # Запись (flush, INSERT/UPDATE/DELETE, SELECT FOR UPDATE) закрепляет
+        # запрос за основной базой, чтобы он видел свои изменения
+        if self._flushing or clause is not None and (
+            getattr(clause, 'is_dml', False) or getattr(clause, '_for_update_arg', None) is not None
+        ):
+            info['primary'] = True
+            return None
+        if 'replica' not in info:
+            info['replica'] = replica_router.choose()
+        return info['replica']
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        key = self.info.get('replica')
+        if key is None or engine is not self._db.engines[key]:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        try:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        except DBAPIError as e:
+            # Реплика недоступна: этот и следующие запросы читают из основной базы
+            replica_router.mark_down(key, e)
+            self.info['replica'] = None
+            return super()._connection_for_bind(self._db.engines[None], execution_options, **kw)
@@ -0,0 +1,177 @@
+from collections import defaultdict
+from sqlalchemy import select, insert, update, delete, func, extract
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import SpendRollup, Subscription
+
+UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+def period_of(value):
+    """Ключ месяца в виде числа YYYYMM"""
+    return value.year * 100 + value.month
+
+def apply_rollup_deltas(deltas):
+    """Применение изменений к агрегатам в текущей транзакции (без коммита).
+
+    deltas - итерируемое (user_id, start_date, periodicity, currency, count_delta, amount_minor_delta).
+    Изменения по одному ключу предварительно суммируются.
+    """
+    merged = defaultdict(lambda: [0, 0])
+    for user_id, start_date, periodicity, currency, count_delta, minor_delta in deltas:
+        key = (user_id, period_of(start_date), periodicity, currency)
+        merged[key][0] += count_delta
+        merged[key][1] += minor_delta
+    
+    table = SpendRollup.__table__
+    upsert = UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    
+    for (user_id, period, periodicity, currency), (count_delta, minor_delta) in merged.items():
+        if count_delta == 0 and minor_delta == 0:
+            continue
+        
+        values = {
+            'user_id': user_id,
+            'period': period,
+            'periodicity': periodicity,
+            'currency': currency,
+            'subscription_count': count_delta,
+            'total_minor': minor_delta
+        }
+        
+        if upsert is not None:
+            statement = upsert(table).values(**values)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['user_id', 'period', 'periodicity', 'currency'],
+                set_={
+                    'subscription_count': table.c.subscription_count + statement.excluded.subscription_count,
+                    'total_minor': table.c.total_minor + statement.excluded.total_minor
+                }
+            ))
+            continue
+        
+        result = db.session.execute(
+            update(table)
+            .where(
+                table.c.user_id == user_id,
+                table.c.period == period,
+                table.c.periodicity == periodicity,
+                table.c.currency == currency
+            )
+            .values(
+                subscription_count=table.c.subscription_count + count_delta,
+                total_minor=table.c.total_minor + minor_delta
+            )
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**values))
+
+def apply_rollup_delta(user_id, start_date, periodicity, currency, count_delta, minor_delta):
+    """Изменение агрегата для одной подписки"""
+    apply_rollup_deltas([(user_id, start_date, periodicity, currency, count_delta, minor_delta)])
+
+def subscription_delta(subscription, sign=1):
+    """Вклад подписки в агрегаты (sign=-1 - снятие вклада)"""
+    return (
+        subscription.user_id, subscription.start_date, subscription.periodicity,
+        subscription.currency, sign, sign * subscription.amount_minor
+    )
+
+def rollup_summary(user_id, year, month):
+    """Количество и суммы (в минимальных единицах по валютам) активных подписок,
+    начавшихся не позже месяца, по периодичности - один GROUP BY по агрегатам
+    """
+    rows = db.session.execute(
+        select(
+            SpendRollup.periodicity,
+            SpendRollup.currency,
+            func.sum(SpendRollup.subscription_count),
+            func.sum(SpendRollup.total_minor)
+        ).where(
+            SpendRollup.user_id == user_id,
+            SpendRollup.period <= year * 100 + month
+        ).group_by(SpendRollup.periodicity, SpendRollup.currency)
+    ).all()
+    
+    summary = {}
+    for periodicity, currency, count, minor in rows:
+        if not count:
+            continue
+        item = summary.setdefault(periodicity.value, {'subscriptions': 0, 'totals': {}})
+        item['subscriptions'] += int(count)
+        item['totals'][currency] = int(minor)
+    return summary
+
+def _expected_rollups(user_id=None):
+    """Агрегаты, рассчитанные заново по таблице подписок"""
+    period = extract('year', Subscription.start_date) * 100 + extract('month', Subscription.start_date)
+    query = select(
+        Subscription.user_id,
+        period.label('period'),
+        Subscription.periodicity,
+        Subscription.currency,
+        func.count(Subscription.id),
+        func.sum(Subscription.amount_minor)
+    ).where(Subscription.is_active == True)
+    
+    if user_id is not None:
+        query = query.where(Subscription.user_id == user_id)
+    
+    return query.group_by(Subscription.user_id, period, Subscription.periodicity, Subscription.currency)
+
+def rebuild_rollups(user_id=None):
+    """Полный пересчет агрегатов (для заполнения и исправления расхождений)"""
+    table = SpendRollup.__table__
+    statement = delete(table)
+    if user_id is not None:
+        statement = statement.where(table.c.user_id == user_id)
+    db.session.execute(statement)
+    
+    rows = [{
+        'user_id': row[0],
+        'period': int(row[1]),
+        'periodicity': row[2],
+        'currency': row[3],
+        'subscription_count': row[4],
+        'total_minor': int(row[5])
+    } for row in db.session.execute(_expected_rollups(user_id))]
+    
+    if rows:
+        db.session.execute(insert(table), rows)
+    db.session.commit()
+    return len(rows)
+
+def check_rollups(user_id=None):
+    """Сравнение агрегатов с таблицей подписок; возвращает список расхождений"""
+    expected = {
+        (row[0], int(row[1]), row[2], row[3]): (row[4], int(row[5]))
+        for row in db.session.execute(_expected_rollups(user_id))
+    }
+    
+    query = select(
+        SpendRollup.user_id, SpendRollup.period, SpendRollup.periodicity, SpendRollup.currency,
+        SpendRollup.subscription_count, SpendRollup.total_minor
+    )
+    if user_id is not None:
+        query = query.where(SpendRollup.user_id == user_id)
+    actual = {
+        (row[0], row[1], row[2], row[3]): (row[4], row[5])
+        for row in db.session.execute(query)
+        if row[4] or row[5]
+    }
+    
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=lambda k: (k[0], k[1], k[2].value, k[3])):
+        if expected.get(key) != actual.get(key):
+            user, period, periodicity, currency = key
+            mismatches.append({
+                'user_id': user,
+                'period': period,
+                'periodicity': periodicity.value,
+                'currency': currency,
+                'expected': expected.get(key),
+                'actual': actual.get(key)
+            })
+    return mismatches
@@ -1,24 +1,50 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, current_app, stream_with_context
+from sqlalchemy import insert, select
 from app import db
-from app.models import Subscription, User, AuditLog, Periodicity
-from app.auth import token_required, login_user, register_user, create_token
-from app.validators import validate_subscription_data, sanitize_input
-from app.database import create_audit_log, get_upcoming_payments
+from app.models import Subscription, User, AuditLog
+from app.auth import token_required, admin_required, login_user, register_user, create_token, principal_cache_stats
+from app.validators import validate_date
+from app.schemas import SUBSCRIPTION_SCHEMA, SUBSCRIPTION_UPDATE_SCHEMA, USER_SCHEMA, dump
+from app.database import (
+    create_audit_log, create_audit_logs_bulk, upcoming_payments_criteria,
+    get_upcoming_payments, get_payment_forecast, get_monthly_summary, bump_data_version,
+    subscription_totals, get_cache_state
+)
+from app.http_cache import conditional_get
+from app.serializers import SUBSCRIPTION_LIST, SUBSCRIPTION_CREATED, SUBSCRIPTION_UPDATED, UPCOMING_PAYMENT
+from app.rollup import apply_rollup_deltas, subscription_delta
+from app.money import CURRENCY_EXPONENTS, to_minor, precision_error, currency_totals, single_total
+from app.fx import report, add_reporting_amounts, parse_rates, store_rates, list_rates
+from app.export import stream_export, EXPORTS, EXPORT_FORMATS
+from app.audit_store import query_audit
+from app.archive import restore_subscription as restore_archived_subscription
+from app.audit import audit_sink
+from app.instrumentation import endpoint_stats
+from app.replicas import replica_router
+from app.sharding import shard_map, assign_ids
+from app.ratelimit import rate_limit
+from app.idempotency import idempotent
+from app.pagination import paginate, paginate_list, parse_page_args, InvalidCursor
 from datetime import datetime
 import json
 
+PAYMENT_ORDER = (Subscription.next_payment_date, Subscription.id)
+MAX_FORECAST_MONTHS = 60
+
 api_bp = Blueprint('api', __name__)
 
 # Новый endpoint для аутентификации
 @api_bp.route('/auth/register', methods=['POST'])
+@rate_limit
 def register():
     """Регистрация нового пользователя"""
-    data = request.get_json()
+    data = request.get_json(silent=True)
     
-    if not data or 'email' not in data or 'username' not in data:
-        return jsonify({'error': 'Email and username are required'}), 400
+    values, errors = USER_SCHEMA.validate(data)
+    if errors:
+        return jsonify({'errors': errors}), 400
     
-    user, error = register_user(data['username'], data['email'], data.get('password'))
+    user, error = register_user(values['username'], values['email'], data.get('password'))
     
     if error:
         return jsonify({'error': error}), 400
@@ -32,6 +58,7 @@ def register():
     }), 201
 
 @api_bp.route('/auth/login', methods=['POST'])
+@rate_limit
 def login():
     """Аутентификация пользователя"""
     data = request.get_json()
@@ -52,36 +79,25 @@ def login():
 # Обновите другие endpoints с использованием валидации
 @api_bp.route('/subscriptions', methods=['POST'])
 @token_required  # Теперь требуется аутентификация
+@idempotent
+@rate_limit
 def create_subscription():
     """Создание новой подписки"""
+    # Схема возвращает уже разобранные значения (Decimal, Periodicity, date)
+    values, errors = SUBSCRIPTION_SCHEMA.validate(request.get_json(silent=True))
+    if errors:
+        return jsonify({'errors': errors}), 400
+    
     try:
-        data = request.get_json()
-        
-        # Санитизация входных данных
-        data = sanitize_input(data)
-        
-        # Валидация
-        validation_errors = validate_subscription_data(data)
-        if validation_errors:
-            return jsonify({'errors': validation_errors}), 400
-        
-        # Проверка периодичности
-        try:
-            periodicity = Periodicity(data['periodicity'])
-        except ValueError:
-            return jsonify({'error': 'Invalid periodicity'}), 400
-        
-        # Преобразование даты
-        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
-        
         # Создание подписки (теперь используем g.current_user из декоратора)
         subscription = Subscription(
             user_id=g.current_user.id,  # Берем ID из токена
-            name=data['name'],
-            amount=float(data['amount']),
-            periodicity=periodicity,
-            start_date=start_date,
-            next_payment_date=start_date,
+            name=values['name'],
+            amount_minor=to_minor(values['amount'], values['currency']),
+            currency=values['currency'],
+            periodicity=values['periodicity'],
+            start_date=values['start_date'],
+            next_payment_date=values['start_date'],
             is_active=True
         )
         
@@ -94,57 +110,137 @@ def create_subscription():
             action='CREATE',
             table_name='subscriptions',
             record_id=subscription.id,
-            new_values=data
+            new_values=dump(values)
         )
         
+        # Агрегаты для месячной сводки
+        apply_rollup_deltas([subscription_delta(subscription)])
+        bump_data_version(g.current_user.id)
+        
         db.session.commit()
         
         return jsonify({
             'message': 'Subscription created successfully',
-            'subscription': {
-                'id': subscription.id,
-                'name': subscription.name,
-                'amount': subscription.amount,
-                'periodicity': subscription.periodicity.value,
-                'start_date': subscription.start_date.isoformat(),
-                'next_payment_date': subscription.next_payment_date.isoformat()
-            }
+            'subscription': SUBSCRIPTION_CREATED.object(subscription)
         }), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@api_bp.route('/subscriptions', methods=['GET'])
+@api_bp.route('/subscriptions/bulk', methods=['POST'])
 @token_required
-def get_subscriptions():
-    """Получение всех активных подписок пользователя"""
+@idempotent
+@rate_limit
+def create_subscriptions_bulk():
+    """Пакетное создание подписок (режимы atomic и partial)"""
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('subscriptions'), list):
+        return jsonify({'error': 'subscriptions list is required'}), 400
+    
+    mode = data.get('mode', 'atomic')
+    if mode not in ('atomic', 'partial'):
+        return jsonify({'error': 'mode must be one of: atomic, partial'}), 400
+    
+    items = data['subscriptions']
+    max_items = current_app.config.get('BULK_MAX_ITEMS', 1000)
+    if not items:
+        return jsonify({'error': 'subscriptions list is empty'}), 400
+    if len(items) > max_items:
+        return jsonify({'error': f'Too many subscriptions, maximum is {max_items}'}), 400
+    
+    # Валидация всего пакета до обращения к базе
+    accepted, errors = SUBSCRIPTION_SCHEMA.validate_many(items)
+    rows = [{
+        'user_id': g.current_user.id,
+        'name': values['name'],
+        'amount_minor': to_minor(values['amount'], values['currency']),
+        'currency': values['currency'],
+        'periodicity': values['periodicity'],
+        'start_date': values['start_date'],
+        'next_payment_date': values['start_date'],
+        'is_active': True
+    } for index, values in accepted]
+    
+    if errors and (mode == 'atomic' or not rows):
+        return jsonify({'errors': errors}), 400
+    
     try:
-        subscriptions = Subscription.query.filter_by(
-            user_id=g.current_user.id, 
-            is_active=True
+        # Многострочный INSERT одной транзакцией (при шардировании id выдаются заранее)
+        if shard_map.enabled:
+            rows = assign_ids(db.session.connection(), Subscription.__table__, rows)
+        ids = db.session.scalars(
+            insert(Subscription).returning(Subscription.id, sort_by_parameter_order=True),
+            rows
         ).all()
         
-        result = []
-        for sub in subscriptions:
-            result.append({
-                'id': sub.id,
-                'name': sub.name,
-                'amount': sub.amount,
-                'periodicity': sub.periodicity.value,
-                'start_date': sub.start_date.isoformat(),
-                'next_payment_date': sub.next_payment_date.isoformat(),
-                'is_active': sub.is_active,
-                'created_at': sub.created_at.isoformat()
-            })
+        create_audit_logs_bulk([{
+            'user_id': g.current_user.id,
+            'action': 'CREATE',
+            'table_name': 'subscriptions',
+            'record_id': subscription_id,
+            'new_values': dump(values)
+        } for subscription_id, (index, values) in zip(ids, accepted)])
         
-        return jsonify({'subscriptions': result}), 200
+        apply_rollup_deltas([
+            (row['user_id'], row['start_date'], row['periodicity'], row['currency'], 1, row['amount_minor'])
+            for row in rows
+        ])
+        bump_data_version(g.current_user.id)
         
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    created = []
+    for subscription_id, row, (index, values) in zip(ids, rows, accepted):
+        created.append({
+            'index': index,
+            'subscription': SUBSCRIPTION_CREATED.mapping({**row, 'id': subscription_id})
+        })
+    
+    return jsonify({
+        'message': f'{len(created)} subscriptions created successfully',
+        'created': created,
+        'errors': errors
+    }), 207 if errors else 201
+
+@api_bp.route('/subscriptions', methods=['GET'])
+@token_required
+@conditional_get
+def get_subscriptions():
+    """Получение активных подписок пользователя (постранично)"""
+    limit, cursor = parse_page_args(request.args)
+    
+    try:
+        # Строки Core без создания ORM-объектов
+        rows, next_cursor = paginate(
+            SUBSCRIPTION_LIST.select().where(
+                Subscription.user_id == g.current_user.id,
+                Subscription.is_active == True
+            ),
+            PAYMENT_ORDER,
+            limit,
+            cursor
+        )
+        
+        return jsonify({
+            'subscriptions': SUBSCRIPTION_LIST.rows(rows),
+            'limit': limit,
+            'next_cursor': next_cursor
+        }), 200
+        
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/subscriptions/<int:subscription_id>', methods=['PUT'])
 @token_required
+@idempotent
+@rate_limit
 def update_subscription(subscription_id):
     """Обновление информации о подписке"""
     try:
@@ -157,38 +253,43 @@ def update_subscription(subscription_id):
         if not subscription:
             return jsonify({'error': 'Subscription not found'}), 404
         
-        # Санитизация данных
-        data = sanitize_input(data)
+        values, errors = SUBSCRIPTION_UPDATE_SCHEMA.validate(data)
+        if errors:
+            return jsonify({'errors': errors}), 400
         
-        # Валидация
-        validation_errors = validate_subscription_data(data)
-        if validation_errors:
-            return jsonify({'errors': validation_errors}), 400
+        old_delta = subscription_delta(subscription, -1)
+        
+        # Сумма проверяется по итоговой валюте подписки
+        currency = values.get('currency', subscription.currency)
+        amount = values.get('amount', subscription.amount)
+        error = precision_error(amount, currency)
+        if error:
+            return jsonify({'errors': {'amount': error}}), 400
         
         # Сохраняем старые значения для аудита
         old_values = {
             'name': subscription.name,
-            'amount': subscription.amount,
+            'amount': str(subscription.amount),
+            'currency': subscription.currency,
             'periodicity': subscription.periodicity.value,
             'next_payment_date': subscription.next_payment_date.isoformat()
         }
         
         # Обновляем поля
-        if 'name' in data:
-            subscription.name = data['name']
-        if 'amount' in data:
-            subscription.amount = float(data['amount'])
-        if 'periodicity' in data:
-            subscription.periodicity = Periodicity(data['periodicity'])
-        if 'next_payment_date' in data:
-            subscription.next_payment_date = datetime.strptime(
-                data['next_payment_date'], '%Y-%m-%d'
-            ).date()
+        if 'name' in values:
+            subscription.name = values['name']
+        subscription.amount_minor = to_minor(amount, currency)
+        subscription.currency = currency
+        if 'periodicity' in values:
+            subscription.periodicity = values['periodicity']
+        if 'next_payment_date' in values:
+            subscription.next_payment_date = values['next_payment_date']
         
         # Логирование в аудит
         new_values = {
             'name': subscription.name,
-            'amount': subscription.amount,
+            'amount': str(subscription.amount),
+            'currency': subscription.currency,
             'periodicity': subscription.periodicity.value,
             'next_payment_date': subscription.next_payment_date.isoformat()
         }
@@ -202,17 +303,15 @@ def update_subscription(subscription_id):
             new_values=new_values
         )
         
+        if subscription.is_active:
+            apply_rollup_deltas([old_delta, subscription_delta(subscription)])
+        bump_data_version(g.current_user.id)
+        
         db.session.commit()
         
         return jsonify({
             'message': 'Subscription updated successfully',
-            'subscription': {
-                'id': subscription.id,
-                'name': subscription.name,
-                'amount': subscription.amount,
-                'periodicity': subscription.periodicity.value,
-                'next_payment_date': subscription.next_payment_date.isoformat()
-            }
+            'subscription': SUBSCRIPTION_UPDATED.object(subscription)
         }), 200
         
     except Exception as e:
@@ -221,6 +320,7 @@ def update_subscription(subscription_id):
 
 @api_bp.route('/subscriptions/<int:subscription_id>', methods=['DELETE'])
 @token_required
+@rate_limit
 def delete_subscription(subscription_id):
     """Удаление подписки (мягкое удаление)"""
     try:
@@ -233,6 +333,7 @@ def delete_subscription(subscription_id):
             return jsonify({'error': 'Subscription not found'}), 404
         
         # Мягкое удаление
+        was_active = subscription.is_active
         subscription.is_active = False
         
         # Логирование в аудит
@@ -243,11 +344,16 @@ def delete_subscription(subscription_id):
             record_id=subscription.id,
             old_values={
                 'name': subscription.name,
-                'amount': subscription.amount,
+                'amount': str(subscription.amount),
+                'currency': subscription.currency,
                 'periodicity': subscription.periodicity.value
             }
         )
         
+        if was_active:
+            apply_rollup_deltas([subscription_delta(subscription, -1)])
+        bump_data_version(g.current_user.id)
+        
         db.session.commit()
         
         return jsonify({
@@ -258,30 +364,277 @@ def delete_subscription(subscription_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/subscriptions/<int:subscription_id>/restore', methods=['POST'])
+@token_required
+@rate_limit
+def restore_subscription(subscription_id):
+    """Восстановление удаленной подписки (в том числе перенесенной в архив)"""
+    subscription, error = restore_archived_subscription(g.current_user.id, subscription_id)
+    
+    if error == 'Subscription not found':
+        return jsonify({'error': error}), 404
+    if error:
+        return jsonify({'error': error}), 500
+    
+    return jsonify({
+        'message': 'Subscription restored successfully',
+        'subscription': SUBSCRIPTION_CREATED.object(subscription)
+    }), 200
+
 # Новый endpoint для предстоящих платежей
 @api_bp.route('/subscriptions/upcoming', methods=['GET'])
 @token_required
+@conditional_get
 def get_upcoming():
     """Получение предстоящих платежей"""
     days_ahead = request.args.get('days', default=30, type=int)
+    limit, cursor = parse_page_args(request.args)
     
-    upcoming = get_upcoming_payments(g.current_user.id, days_ahead)
+    # expand=true: каждый платеж в окне по графику, включая повторы
+    if request.args.get('expand', 'false').lower() == 'true':
+        return _get_upcoming_expanded(days_ahead, limit, cursor)
     
-    result = []
-    for sub in upcoming:
-        result.append({
-            'id': sub.id,
-            'name': sub.name,
-            'amount': sub.amount,
-            'next_payment_date': sub.next_payment_date.isoformat(),
-            'days_until': (sub.next_payment_date - datetime.now().date()).days
-        })
+    criteria = upcoming_payments_criteria(g.current_user.id, days_ahead)
+    
+    try:
+        rows, next_cursor = paginate(UPCOMING_PAYMENT.select().where(*criteria), PAYMENT_ORDER, limit, cursor)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Итоги считаются агрегатом в базе, а не по текущей странице
+    total_count, totals = subscription_totals(*criteria)
+    
+    items = add_reporting_amounts(
+        UPCOMING_PAYMENT.rows(rows, datetime.now().date()),
+        [row.currency for row in rows],
+        [row.amount_minor for row in rows]
+    )
+    (reporting_total,), reporting = report([totals])
+    
+    return jsonify({
+        'upcoming_payments': items,
+        'total_count': total_count,
+        'total_amount': single_total(totals),
+        'totals': totals,
+        'reporting': {**reporting, 'total_amount': reporting_total},
+        'limit': limit,
+        'next_cursor': next_cursor
+    }), 200
+
+def _get_upcoming_expanded(days_ahead, limit, cursor):
+    """Предстоящие платежи с разверткой графика"""
+    payments = get_upcoming_payments(g.current_user.id, days_ahead)
+    
+    try:
+        page, next_cursor = paginate_list(
+            payments,
+            lambda p: (p['next_payment_date'], p['id']),
+            PAYMENT_ORDER,
+            limit,
+            cursor
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    today = datetime.now().date()
+    result = add_reporting_amounts(
+        [UPCOMING_PAYMENT.mapping(p, today) for p in page],
+        [p['currency'] for p in page],
+        [p['amount_minor'] for p in page]
+    )
+    totals = currency_totals((p['currency'], p['amount_minor']) for p in payments)
+    (reporting_total,), reporting = report([totals])
     
     return jsonify({
         'upcoming_payments': result,
-        'total_amount': sum(sub.amount for sub in upcoming)
+        'total_count': len(payments),
+        'total_amount': single_total(totals),
+        'totals': totals,
+        'reporting': {**reporting, 'total_amount': reporting_total},
+        'limit': limit,
+        'next_cursor': next_cursor
+    }), 200
+
+@api_bp.route('/subscriptions/summary', methods=['GET'])
+@token_required
+@conditional_get
+def get_summary():
+    """Месячная сводка по подпискам"""
+    today = datetime.now().date()
+    year = request.args.get('year', default=today.year, type=int)
+    month = request.args.get('month', default=today.month, type=int)
+    include_payments = request.args.get('payments', 'false').lower() == 'true'
+    
+    if month < 1 or month > 12 or year < 1 or year > 9999:
+        return jsonify({'error': 'Invalid year or month'}), 400
+    
+    summary = get_monthly_summary(g.current_user.id, year, month, include_payments)
+    
+    # Общий итог и разбивка по периодичности пересчитываются одним проходом
+    breakdown = list(summary['by_periodicity'].values())
+    converted, reporting = report([summary['totals']] + [item['totals'] for item in breakdown])
+    summary['reporting'] = {**reporting, 'total_amount': converted[0]}
+    for item, amount in zip(breakdown, converted[1:]):
+        item['reporting_amount'] = amount
+    
+    if include_payments:
+        summary['upcoming_payments'] = [
+            {**payment, 'date': payment['date'].isoformat()}
+            for payment in summary['upcoming_payments']
+        ]
+    
+    return jsonify({'year': year, 'month': month, **summary}), 200
+
+@api_bp.route('/subscriptions/forecast', methods=['GET'])
+@token_required
+@conditional_get
+def get_forecast():
+    """Прогноз платежей по месяцам"""
+    months = request.args.get('months', default=12, type=int)
+    
+    if months < 1 or months > MAX_FORECAST_MONTHS:
+        return jsonify({'error': f'months must be between 1 and {MAX_FORECAST_MONTHS}'}), 400
+    
+    forecast = get_payment_forecast(g.current_user.id, months)
+    totals = currency_totals(
+        (currency, to_minor(amount, currency)) for month in forecast for currency, amount in month['totals'].items()
+    )
+    converted, reporting = report([totals] + [month['totals'] for month in forecast])
+    for month, amount in zip(forecast, converted[1:]):
+        month['reporting_amount'] = amount
+    
+    return jsonify({
+        'months': forecast,
+        'total_amount': single_total(totals),
+        'totals': totals,
+        'reporting': {**reporting, 'total_amount': converted[0]}
+    }), 200
+
+@api_bp.route('/export/<kind>', methods=['GET'])
+@token_required
+@rate_limit
+def export_data(kind):
+    """Потоковая выгрузка подписок или истории аудита пользователя (NDJSON/CSV)"""
+    if kind not in EXPORTS:
+        return jsonify({'error': f'Unknown export. Must be one of: {sorted(EXPORTS)}'}), 404
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid format. Must be one of: {sorted(EXPORT_FORMATS)}'}), 400
+    
+    dates = {}
+    for name in ('from', 'to'):
+        if request.args.get(name):
+            dates[name], error = validate_date(request.args[name], name)
+            if error:
+                return jsonify({'error': error}), 400
+    
+    generator = stream_export(
+        kind, fmt,
+        user_id=g.current_user.id,
+        date_from=dates.get('from'),
+        date_to=dates.get('to')
+    )
+    
+    response = Response(stream_with_context(generator), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{fmt}'
+    return response
+
+@api_bp.route('/audit', methods=['GET'])
+@token_required
+def get_audit_log():
+    """История изменений пользователя (постранично, от новых к старым)"""
+    limit, cursor = parse_page_args(request.args)
+    
+    filters = {
+        'action': request.args.get('action'),
+        'table_name': request.args.get('table'),
+        'record_id': request.args.get('record_id', type=int)
+    }
+    for name in ('from', 'to'):
+        if request.args.get(name):
+            filters[f'date_{name}'], error = validate_date(request.args[name], name)
+            if error:
+                return jsonify({'error': error}), 400
+    
+    try:
+        entries, next_cursor = query_audit(g.current_user.id, limit, cursor, **filters)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'audit_log': entries,
+        'limit': limit,
+        'next_cursor': next_cursor
+    }), 200
+
+@api_bp.route('/admin/metrics', methods=['GET'])
+@admin_required
+def admin_metrics():
+    """Гистограммы по эндпоинтам, состояние кэшей, очереди аудита, outbox напоминаний и реплик"""
+    from app.reminders import outbox_stats
+    
+    return jsonify({
+        'endpoints': endpoint_stats.snapshot(),
+        'principal_cache': principal_cache_stats(),
+        'audit_sink': audit_sink.stats(),
+        'reminder_outbox': outbox_stats(),
+        'replicas': replica_router.status()
     }), 200
 
+@api_bp.route('/admin/fx-rates', methods=['GET'])
+@admin_required
+def admin_fx_rates():
+    """Текущие курсы валют и их версия"""
+    return jsonify(list_rates()), 200
+
+@api_bp.route('/admin/fx-rates', methods=['PUT'])
+@admin_required
+def admin_update_fx_rates():
+    """Загрузка курсов валют новой версией (курсы, не указанные в запросе, не меняются)"""
+    rates, error = parse_rates(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        store_rates(rates)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify(list_rates()), 200
+
+@api_bp.route('/settings', methods=['GET'])
+@token_required
+def get_settings():
+    """Настройки пользователя"""
+    _, currency, _ = get_cache_state(g.current_user.id)
+    return jsonify({'reporting_currency': currency}), 200
+
+@api_bp.route('/settings', methods=['PUT'])
+@token_required
+def update_settings():
+    """Изменение валюты отчетов (итоги сводок пересчитываются в нее)"""
+    data = request.get_json()
+    
+    if not data or 'reporting_currency' not in data:
+        return jsonify({'error': 'reporting_currency is required'}), 400
+    
+    currency = data['reporting_currency']
+    if currency not in CURRENCY_EXPONENTS:
+        return jsonify({'errors': {
+            'reporting_currency': f'Unsupported currency. Must be one of: {sorted(CURRENCY_EXPONENTS)}'
+        }}), 400
+    
+    try:
+        user = db.session.get(User, g.current_user.id)
+        user.reporting_currency = currency
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({'reporting_currency': currency}), 200
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """Проверка здоровья приложения"""
@@ -0,0 +1,142 @@
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+
+# numpy импортируется внутри функций: он нужен только для развертки графиков,
+# а его импорт заметно удлиняет старт воркера
+
+# Шаг периодичности: единица ('D' - дни, 'M' - месяцы) и количество единиц
+PERIOD_STEPS = {
+    'daily': ('D', 1),
+    'weekly': ('D', 7),
+    'monthly': ('M', 1),
+    'quarterly': ('M', 3),
+    'yearly': ('M', 12),
+}
+
+PaymentSchedule = namedtuple('PaymentSchedule', ['index', 'dates'])
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def _period_key(periodicity):
+    return getattr(periodicity, 'value', periodicity)
+
+def _as_days(values):
+    """Список дат в массив datetime64[D] (через ординалы, это заметно быстрее np.asarray)"""
+    import numpy as np
+    if isinstance(values, np.ndarray):
+        return values.astype('datetime64[D]')
+    ordinals = np.fromiter((d.toordinal() for d in values), dtype=np.int64)
+    return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+
+def add_period(value, periodicity, anchor_day=None, count=1):
+    """Сдвиг даты на count периодов с учетом длины месяца и високосных лет.
+
+    anchor_day - день списания (обычно день start_date): после короткого месяца
+    платеж возвращается на него, например 31.01 -> 29.02 -> 31.03.
+    """
+    unit, step = PERIOD_STEPS[_period_key(periodicity)]
+
+    if unit == 'D':
+        return value + timedelta(days=step * count)
+
+    months = value.year * 12 + value.month - 1 + step * count
+    year, month = divmod(months, 12)
+    month += 1
+    day = min(anchor_day or value.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+def expand_schedule(next_dates, anchor_days, periodicities, start, end, ordered=True):
+    """Развертка графика платежей для множества подписок за один проход.
+
+    Для каждой подписки берется ближайший платеж next_dates[i], последующие
+    считаются от него с днем списания anchor_days[i]. Возвращает индексы
+    подписок и даты всех платежей в интервале [start, end] (упорядоченные
+    по дате, если ordered).
+    """
+    import numpy as np
+    next_dates = _as_days(next_dates)
+    anchor_days = np.asarray(anchor_days, dtype=np.int64)
+    periodicities = np.asarray([_period_key(p) for p in periodicities])
+    start = np.datetime64(start, 'D')
+    end = np.datetime64(end, 'D')
+
+    indexes = []
+    dates = []
+    for key, (unit, step) in PERIOD_STEPS.items():
+        (rows,) = np.nonzero(periodicities == key)
+        if rows.size == 0:
+            continue
+
+        first = next_dates[rows]
+        if unit == 'D':
+            gap = (start - first).astype(np.int64)
+            k0 = np.maximum(0, -(-gap // step))
+            span = (end - first).astype(np.int64) // step - k0 + 1
+            width = int(span.max(initial=0))
+            if width <= 0:
+                continue
+            ks = k0[:, None] + np.arange(width)
+            occurrences = first[:, None] + ks * step
+        else:
+            first_month = first.astype('datetime64[M]')
+            gap = (start.astype('datetime64[M]') - first_month).astype(np.int64)
+            k0 = np.maximum(0, gap // step)
+            span = (end.astype('datetime64[M]') - first_month).astype(np.int64) // step - k0 + 1
+            width = int(span.max(initial=0))
+            if width <= 0:
+                continue
+            ks = k0[:, None] + np.arange(width)
+            months = first_month[:, None] + ks * step
+            month_start = months.astype('datetime64[D]')
+            month_length = ((months + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+            day = np.minimum(anchor_days[rows][:, None], month_length)
+            occurrences = month_start + (day - 1)
+            # Первый платеж - это сама next_payment_date
+            occurrences = np.where(ks == 0, first[:, None], occurrences)
+
+        valid = (occurrences >= start) & (occurrences <= end)
+        row_idx, col_idx = np.nonzero(valid)
+        indexes.append(rows[row_idx])
+        dates.append(occurrences[row_idx, col_idx])
+
+    if not indexes:
+        return PaymentSchedule(np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[D]'))
+
+    indexes = np.concatenate(indexes)
+    dates = np.concatenate(dates)
+    if not ordered:
+        return PaymentSchedule(indexes, dates)
+    order = np.lexsort((indexes, dates))
+    return PaymentSchedule(indexes[order], dates[order])
+
+def schedule_for_rows(rows, start, end, ordered=True):
+    """Развертка графика для строк с полями next_payment_date, start_date и periodicity"""
+    return expand_schedule(
+        [row.next_payment_date for row in rows],
+        [row.start_date.day for row in rows],
+        [row.periodicity for row in rows],
+        start,
+        end,
+        ordered
+    )
+
+def monthly_totals(schedule, amounts, start, months, groups=None, group_count=1):
+    """Суммы и количество платежей по месяцам, начиная с месяца start.
+
+    amounts - целые суммы подписок (в минимальных единицах), groups - номер
+    группы (валюты) каждой подписки. Возвращает массив сумм [группа, месяц]
+    (int64) и массив количества платежей по месяцам.
+    """
+    import numpy as np
+    amounts = np.asarray(amounts, dtype=np.int64)
+    first_month = np.datetime64(start, 'M')
+    buckets = (schedule.dates.astype('datetime64[M]') - first_month).astype(np.int64)
+    if groups is not None:
+        buckets = buckets + np.asarray(groups, dtype=np.int64)[schedule.index] * months
+
+    # Веса bincount - float64: для целых сумм до 2**53 результат точный
+    totals = np.bincount(buckets, weights=amounts[schedule.index], minlength=group_count * months)
+    counts = np.bincount(buckets % months, minlength=months)
+
+    return np.rint(totals).astype(np.int64).reshape(group_count, months), counts
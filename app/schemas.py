@@ -0,0 +1,245 @@
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from enum import Enum
+from app.models import Periodicity
+from app.money import CURRENCY_EXPONENTS, DEFAULT_CURRENCY, precision_error
+
+MISSING = object()
+
+class FieldError(Exception):
+    """Ошибка значения поля; сообщение попадает в ответ"""
+
+Rule = namedtuple('Rule', ['name', 'parser', 'required', 'default', 'allow_blank'])
+
+def rule(name, parser, required=False, default=MISSING, allow_blank=None):
+    """Правило поля: парсер получает значение и возвращает разобранное (или
+    бросает FieldError). Пустые значения (None, '') у обязательных полей -
+    ошибка, у необязательных - как отсутствие поля.
+    """
+    return Rule(name, parser, required, default, not required if allow_blank is None else allow_blank)
+
+class Schema:
+    """Схема входных данных.
+
+    Правила один раз разворачиваются в кортежи, по которым идет проверка:
+    чтение ключа, обязательность, значение по умолчанию, вызов парсера.
+    Результат - уже разобранные значения (Decimal, date, Enum), поэтому
+    маршрутам не нужно разбирать их повторно. checks - проверки нескольких
+    полей, check(values, errors).
+    """
+
+    def __init__(self, *rules, checks=(), item_error='Item must be an object'):
+        self.rules = rules
+        self.checks = checks
+        self.item_error = item_error
+        self._plan = tuple(
+            (r.name, r.parser, r.required, r.default, r.allow_blank, f'{r.name} is required')
+            for r in rules
+        )
+
+    def _validate(self, data):
+        values = {}
+        errors = {}
+        for name, parse, required, default, allow_blank, required_error in self._plan:
+            value = data.get(name, MISSING)
+            if value is MISSING or value is None or value == '':
+                # Пустое значение допустимого поля - как отсутствие поля
+                if required or not (value is MISSING or allow_blank):
+                    errors[name] = required_error
+                elif default is not MISSING:
+                    values[name] = default
+                continue
+            try:
+                values[name] = parse(value)
+            except FieldError as error:
+                errors[name] = error.args[0]
+        for check in self.checks:
+            check(values, errors)
+        return values, errors
+
+    def validate(self, data):
+        """(значения, ошибки) для одного объекта; ошибки - {поле: сообщение}"""
+        if not isinstance(data, dict):
+            return {}, {'item': self.item_error}
+        return self._validate(data)
+
+    def validate_many(self, items):
+        """Проверка пакета: ([(индекс, значения)], [{'index': индекс, 'errors': {...}}])"""
+        validate = self._validate
+        item_error = {'item': self.item_error}
+        accepted = []
+        errors = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'errors': dict(item_error)})
+                continue
+            values, item_errors = validate(item)
+            if item_errors:
+                errors.append({'index': index, 'errors': item_errors})
+            else:
+                accepted.append((index, values))
+        return accepted, errors
+
+    def partial(self, *names):
+        """Схема для частичного обновления: поля names (по умолчанию все)
+        необязательны и без значений по умолчанию; пустое значение у
+        обязательного поля остается ошибкой
+        """
+        rules = [
+            r._replace(required=False, default=MISSING)
+            for r in self.rules if not names or r.name in names
+        ]
+        return Schema(*rules, item_error=self.item_error)
+
+def dump(values):
+    """Разобранные значения в JSON-совместимый вид (для аудита)"""
+    return {name: _plain(value) for name, value in values.items()}
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+# --- Парсеры ---
+
+def text(label, max_length, min_length=1, escape=True):
+    """Строка без пробелов по краям (с экранированием < и > - базовая защита от XSS)"""
+    required = f'{label} is required'
+    too_short = f'{label} must be at least {min_length} characters'
+    too_long = f'{label} must be less than {max_length} characters'
+    not_string = f'{label} must be a string'
+
+    def parse(value):
+        if type(value) is not str:
+            raise FieldError(not_string)
+        value = value.strip()
+        if escape:
+            value = value.replace('<', '&lt;').replace('>', '&gt;')
+        if not value:
+            raise FieldError(required)
+        if len(value) < min_length:
+            raise FieldError(too_short)
+        if len(value) > max_length:
+            raise FieldError(too_long)
+        return value
+    return parse
+
+def email(max_length=120):
+    def parse(value):
+        if type(value) is not str:
+            raise FieldError('Invalid email format')
+        value = value.strip()
+        if '@' not in value or '.' not in value:
+            raise FieldError('Invalid email format')
+        if len(value) > max_length:
+            raise FieldError(f'Email must be less than {max_length} characters')
+        return value
+    return parse
+
+def choice(enum, label):
+    """Значение перечисления по его value (словарь строится один раз)"""
+    members = {member.value: member for member in enum}
+    message = f'Invalid {label}. Must be one of: {list(members)}'
+
+    def parse(value):
+        try:
+            return members[value]
+        except (KeyError, TypeError):
+            raise FieldError(message) from None
+    return parse
+
+def one_of(values, label):
+    allowed = frozenset(values)
+    message = f'Unsupported {label}. Must be one of: {sorted(allowed)}'
+
+    def parse(value):
+        if value not in allowed:
+            raise FieldError(message)
+        return value
+    return parse
+
+def positive_decimal(label, max_value):
+    """Decimal больше нуля и не больше max_value (float разбирается через repr)"""
+    invalid = f'Invalid {label} format'
+    not_positive = f'{label.capitalize()} must be greater than 0'
+    too_large = f'{label.capitalize()} is too large'
+    max_value = Decimal(max_value)
+
+    def parse(value):
+        kind = type(value)
+        try:
+            if kind is str:
+                amount = Decimal(value.strip())
+            elif kind is int:
+                amount = Decimal(value)
+            elif kind is float:
+                amount = Decimal(repr(value))
+            else:
+                raise FieldError(invalid)
+        except InvalidOperation:
+            raise FieldError(invalid) from None
+        if not amount.is_finite():
+            raise FieldError(invalid)
+        if amount <= 0:
+            raise FieldError(not_positive)
+        if amount > max_value:
+            raise FieldError(too_large)
+        return amount
+    return parse
+
+def iso_date(not_past_message=None):
+    """Дата строго в формате YYYY-MM-DD (date.fromisoformat вместо strptime)"""
+    invalid = 'Invalid date format. Use YYYY-MM-DD'
+
+    def parse(value):
+        if type(value) is not str:
+            raise FieldError(invalid)
+        value = value.strip()
+        if len(value) != 10 or value[4] != '-' or value[7] != '-':
+            raise FieldError(invalid)
+        try:
+            result = date.fromisoformat(value)
+        except ValueError:
+            raise FieldError(invalid) from None
+        if not_past_message and result < date.today():
+            raise FieldError(not_past_message)
+        return result
+    return parse
+
+def amount_fits_currency(values, errors):
+    """Сумма не точнее минимальной единицы валюты"""
+    if 'amount' in values and 'currency' not in errors:
+        error = precision_error(values['amount'], values.get('currency', DEFAULT_CURRENCY))
+        if error:
+            errors['amount'] = error
+            del values['amount']
+
+# --- Схемы ---
+
+SUBSCRIPTION_SCHEMA = Schema(
+    rule('name', text('Name', 100), required=True),
+    rule('amount', positive_decimal('amount', 1000000), required=True),
+    rule('currency', one_of(CURRENCY_EXPONENTS, 'currency'), default=DEFAULT_CURRENCY),
+    rule('periodicity', choice(Periodicity, 'periodicity'), required=True),
+    rule('start_date', iso_date(), required=True),
+    checks=(amount_fits_currency,),
+    item_error='Subscription must be an object'
+)
+
+# Точность суммы при обновлении проверяется по итоговой валюте подписки
+SUBSCRIPTION_UPDATE_SCHEMA = Schema(
+    *SUBSCRIPTION_SCHEMA.partial('name', 'amount', 'currency', 'periodicity').rules,
+    rule('next_payment_date', iso_date('Next payment date cannot be in the past')),
+    item_error='Subscription must be an object'
+)
+
+USER_SCHEMA = Schema(
+    rule('email', email(), required=True),
+    rule('username', text('Username', 80, min_length=3), required=True),
+    item_error='User must be an object'
+)
@@ -0,0 +1,134 @@
+from collections import namedtuple
+from operator import attrgetter, itemgetter
+from sqlalchemy import select
+from app.models import Subscription
+from app.money import from_minor
+
+Field = namedtuple('Field', ['name', 'column', 'converter', 'uses_context'])
+
+def field(name, column, converter=None, uses_context=False):
+    """Описание поля ответа: имя, колонка-источник (или кортеж колонок - тогда
+    конвертер получает их значения по порядку) и необязательный конвертер
+    """
+    return Field(name, column, converter, uses_context)
+
+def _columns_of(f):
+    return f.column if isinstance(f.column, tuple) else (f.column,)
+
+def _reader(get, f, several):
+    """Значение поля из строки или объекта: get - itemgetter/attrgetter колонок поля"""
+    converter = f.converter
+    if converter is None:
+        return lambda source, ctx: get(source)
+    if several and f.uses_context:
+        return lambda source, ctx: converter(*get(source), ctx)
+    if several:
+        return lambda source, ctx: converter(*get(source))
+    if f.uses_context:
+        return lambda source, ctx: converter(get(source), ctx)
+    return lambda source, ctx: converter(get(source))
+
+def isoformat(value):
+    return value.isoformat() if value is not None else None
+
+def enum_value(value):
+    return value.value if value is not None else None
+
+class RowSerializer:
+    """Сериализатор строк в словари.
+
+    Для каждого поля один раз при создании готовится функция чтения: по
+    индексу (строки Core, operator.itemgetter) или по атрибуту (ORM-объекты,
+    operator.attrgetter) с вызовом конвертера.
+    """
+
+    def __init__(self, *fields):
+        self.fields = fields
+        # Колонка, используемая несколькими полями, выбирается один раз
+        self.columns = []
+        for f in fields:
+            for column in _columns_of(f):
+                if not any(column is c for c in self.columns):
+                    self.columns.append(column)
+        
+        row_readers = []
+        obj_readers = []
+        for f in fields:
+            columns = _columns_of(f)
+            indexes = [next(n for n, c in enumerate(self.columns) if c is column) for column in columns]
+            row_readers.append((f.name, _reader(itemgetter(*indexes), f, len(columns) > 1)))
+            obj_readers.append((f.name, _reader(attrgetter(*(column.key for column in columns)), f, len(columns) > 1)))
+        self._row_readers = tuple(row_readers)
+        self._obj_readers = tuple(obj_readers)
+
+    def _from_row(self, row, ctx=None):
+        return {name: read(row, ctx) for name, read in self._row_readers}
+
+    def _from_object(self, obj, ctx=None):
+        return {name: read(obj, ctx) for name, read in self._obj_readers}
+
+    def select(self):
+        """SELECT только нужных колонок (без загрузки ORM-объектов)"""
+        return select(*self.columns)
+
+    def row(self, row, ctx=None):
+        return self._from_row(row, ctx)
+
+    def rows(self, rows, ctx=None):
+        from_row = self._from_row
+        return [from_row(r, ctx) for r in rows]
+
+    def object(self, obj, ctx=None):
+        return self._from_object(obj, ctx)
+
+    def mapping(self, values, ctx=None):
+        """Сериализация словаря {имя колонки: значение} (например, строки для INSERT)"""
+        return self._from_row([values[c.key] for c in self.columns], ctx)
+
+def days_until(value, today):
+    return (value - today).days
+
+# Сумма в Decimal из (amount_minor, currency)
+SUBSCRIPTION_AMOUNT = (Subscription.amount_minor, Subscription.currency)
+
+# Ответы эндпоинтов подписок
+SUBSCRIPTION_LIST = RowSerializer(
+    field('id', Subscription.id),
+    field('name', Subscription.name),
+    field('amount', SUBSCRIPTION_AMOUNT, from_minor),
+    field('currency', Subscription.currency),
+    field('periodicity', Subscription.periodicity, enum_value),
+    field('start_date', Subscription.start_date, isoformat),
+    field('next_payment_date', Subscription.next_payment_date, isoformat),
+    field('is_active', Subscription.is_active),
+    field('created_at', Subscription.created_at, isoformat),
+)
+
+SUBSCRIPTION_CREATED = RowSerializer(
+    field('id', Subscription.id),
+    field('name', Subscription.name),
+    field('amount', SUBSCRIPTION_AMOUNT, from_minor),
+    field('currency', Subscription.currency),
+    field('periodicity', Subscription.periodicity, enum_value),
+    field('start_date', Subscription.start_date, isoformat),
+    field('next_payment_date', Subscription.next_payment_date, isoformat),
+)
+
+SUBSCRIPTION_UPDATED = RowSerializer(
+    field('id', Subscription.id),
+    field('name', Subscription.name),
+    field('amount', SUBSCRIPTION_AMOUNT, from_minor),
+    field('currency', Subscription.currency),
+    field('periodicity', Subscription.periodicity, enum_value),
+    field('next_payment_date', Subscription.next_payment_date, isoformat),
+)
+
+# ctx - текущая дата
+UPCOMING_PAYMENT = RowSerializer(
+    field('id', Subscription.id),
+    field('name', Subscription.name),
+    field('amount', SUBSCRIPTION_AMOUNT, from_minor),
+    field('currency', Subscription.currency),
+    field('next_payment_date', Subscription.next_payment_date, isoformat),
+    field('days_until', Subscription.next_payment_date, days_until, uses_context=True),
+)
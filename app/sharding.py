@@ -0,0 +1,437 @@
+"""Шардирование данных пользователей по user_id.
+
+Шард 0 - основная база (SQLALCHEMY_DATABASE_URI), шарды 1..N-1 - binds
+shard_1, shard_2, ... (из SHARD_URLS). Пользователь относится к бакету
+user_id % SHARD_BUCKETS, бакет - к шарду по карте (SHARD_MAP_FILE, без файла
+все бакеты на шарде 0). Все строки пользователя (подписки, аудит, агрегаты,
+напоминания, ключи идемпотентности) лежат на его шарде; курсы валют
+копируются на все шарды.
+
+Сессия выбирает шард по явно заданному (using_shard, пакетные задачи), по
+пользователю запроса (g.shard_user_id из token_required и регистрации, иначе
+g.current_user), иначе шард 0.
+
+Id пользователей, подписок и аудита уникальны между шардами: шард k выдает
+номера с остатком k по модулю SHARD_ID_STRIDE (в PostgreSQL - последовательность
+с шагом SHARD_ID_STRIDE, в остальных СУБД - счетчик в shard_sequences), а id
+пользователя - это номер * SHARD_BUCKETS + бакет. Поэтому строки переносятся
+между шардами без изменения id. Число бакетов нельзя менять после появления
+данных.
+
+Перенос бакета (move_buckets): бакет переводится в режим только для чтения,
+строки копируются на новый шард, карта переключается, после чего строки
+удаляются со старого шарда. Процессы перечитывают карту при изменении файла
+(не чаще SHARD_MAP_RELOAD секунд).
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from flask import g, has_app_context
+from sqlalchemy import event, select, insert, update, delete, func, text
+
+SHARD_BIND_PREFIX = 'shard_'
+# Наибольшее число шардов: id, выданные шардом k, дают остаток k по этому модулю
+SHARD_ID_STRIDE = 64
+# СУБД с последовательностями: id выдает nextval с шагом SHARD_ID_STRIDE
+ID_SEQUENCE_DIALECTS = ('postgresql',)
+SHARDED_ID_TABLES = ('users', 'subscriptions', 'audit_logs')
+
+# Таблицы с данными пользователя в порядке вставки: (таблица, столбец пользователя)
+USER_TABLES = (
+    ('users', 'id'),
+    ('subscriptions', 'user_id'),
+    ('subscriptions_archive', 'user_id'),
+    ('audit_logs', 'user_id'),
+    ('audit_segments', 'user_id'),
+    ('spend_rollups', 'user_id'),
+    ('idempotency_keys', 'user_id'),
+    ('reminder_outbox', 'user_id'),
+)
+# Внутренние id этих таблиц на новом шарде выдаются заново
+REKEYED_TABLES = ('audit_segments', 'reminder_outbox')
+
+class ShardMap:
+    """Карта бакетов пользователей по шардам"""
+
+    def __init__(self):
+        self.count = 1
+        self.buckets = 64
+        self.assignment = (0,) * self.buckets
+        self.readonly = frozenset()
+        self.path = None
+        self.reload_interval = 5
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.count > 1
+
+    def configure(self, count, buckets=64, path=None, reload_interval=5):
+        if count > SHARD_ID_STRIDE:
+            raise ValueError(f'At most {SHARD_ID_STRIDE} shards are supported')
+        if buckets < count:
+            raise ValueError('SHARD_BUCKETS must not be less than the number of shards')
+        self.count = count
+        self.buckets = buckets
+        self.assignment = (0,) * buckets
+        self.readonly = frozenset()
+        self.path = path
+        self.reload_interval = reload_interval
+        self._mtime = None
+        self._checked_at = time.monotonic()
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        """Чтение карты из файла {"buckets": N, "assignment": [...], "readonly": [...]}"""
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, encoding='utf-8') as source:
+                data = json.load(source)
+            if data.get('buckets') != self.buckets:
+                raise ValueError(f"Shard map has {data.get('buckets')} buckets, SHARD_BUCKETS is {self.buckets}")
+            assignment = tuple(data['assignment'])
+            if len(assignment) != self.buckets or not all(0 <= shard < self.count for shard in assignment):
+                raise ValueError('Shard map does not match the configured shards')
+            self.assignment = assignment
+            self.readonly = frozenset(data.get('readonly', ()))
+            self._mtime = mtime
+
+    def refresh(self):
+        """Перечитать файл карты, если он изменился (не чаще reload_interval)"""
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self.load()
+
+    def save(self, assignment, readonly=()):
+        """Атомарная запись карты (процессы увидят ее при следующей проверке)"""
+        if not self.path:
+            raise RuntimeError('SHARD_MAP_FILE is not configured')
+        data = {'buckets': self.buckets, 'assignment': list(assignment), 'readonly': sorted(readonly)}
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as output:
+            json.dump(data, output)
+        os.replace(temporary, self.path)
+        self.load()
+
+    def bucket_of(self, user_id):
+        return user_id % self.buckets
+
+    def shard_of(self, user_id):
+        return self.assignment[user_id % self.buckets]
+
+    def is_readonly(self, user_id):
+        return user_id % self.buckets in self.readonly
+
+    def bucket_for_email(self, email):
+        """Бакет нового пользователя: одинаковый email всегда попадает на один шард"""
+        return zlib.crc32(email.encode('utf-8')) % self.buckets
+
+shard_map = ShardMap()
+
+def bind_key(shard):
+    return None if shard == 0 else f'{SHARD_BIND_PREFIX}{shard}'
+
+def shard_engine(shard):
+    from app import db
+    return db.engines[bind_key(shard)]
+
+def init_sharding(app):
+    """Настройка карты шардов из SQLALCHEMY_BINDS (shard_1..shard_N) и SHARD_*"""
+    from app.models import Subscription, AuditLog
+
+    keys = {key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key and key.startswith(SHARD_BIND_PREFIX)}
+    count = len(keys) + 1
+    if keys != {bind_key(shard) for shard in range(1, count)}:
+        raise ValueError(f'Shard binds must be numbered {SHARD_BIND_PREFIX}1..{SHARD_BIND_PREFIX}{count - 1}')
+    shard_map.configure(
+        count,
+        buckets=app.config.get('SHARD_BUCKETS', 64),
+        path=app.config.get('SHARD_MAP_FILE'),
+        reload_interval=app.config.get('SHARD_MAP_RELOAD', 5)
+    )
+    if not shard_map.enabled:
+        return
+
+    for model in (Subscription, AuditLog):
+        if not event.contains(model, 'before_insert', _assign_orm_id):
+            event.listen(model, 'before_insert', _assign_orm_id)
+    app.before_request(shard_map.refresh)
+
+def current_shard(info):
+    """Шард сессии: заданный явно, шард текущего пользователя или 0"""
+    shard = info.get('shard')
+    if shard is not None:
+        return shard
+    if has_app_context():
+        # shard_user_id выставляет token_required до загрузки пользователя
+        user_id = g.get('shard_user_id')
+        if user_id is None and g.get('current_user') is not None:
+            user_id = g.current_user.id
+        if user_id is not None:
+            return shard_map.shard_of(user_id)
+    return 0
+
+@contextmanager
+def using_shard(shard):
+    """Работа сессии с заданным шардом (None - без изменений)"""
+    from app import db
+
+    if shard is None:
+        yield None
+        return
+    info = db.session.info
+    previous = info.get('shard')
+    info['shard'] = shard
+    try:
+        yield shard
+    finally:
+        if previous is None:
+            info.pop('shard', None)
+        else:
+            info['shard'] = previous
+
+def each_shard(user_id=None):
+    """Шарды для пакетных задач: тело цикла работает с сессией шарда.
+
+    Без шардирования - один проход с None, с user_id - только его шард.
+    """
+    if not shard_map.enabled:
+        yield None
+        return
+    shards = [shard_map.shard_of(user_id)] if user_id is not None else range(shard_map.count)
+    for shard in shards:
+        with using_shard(shard):
+            yield shard
+
+# --- Id, уникальные между шардами ---
+
+def allocate_ids(connection, name, count):
+    """count новых id таблицы name на шарде соединения"""
+    if connection.dialect.name in ID_SEQUENCE_DIALECTS:
+        return list(connection.execute(
+            text(f"SELECT nextval('{name}_id_seq') FROM generate_series(1, :count)"), {'count': count}
+        ).scalars())
+
+    from app.models import ShardSequence
+    table = ShardSequence.__table__
+    last = connection.execute(
+        update(table).where(table.c.name == name)
+        .values(value=table.c.value + count * SHARD_ID_STRIDE)
+        .returning(table.c.value)
+    ).scalar()
+    if last is None:
+        raise RuntimeError(f'No id counter for {name}; run "flask shards init"')
+    return [last - (count - 1 - i) * SHARD_ID_STRIDE for i in range(count)]
+
+def allocate_user_id(connection, bucket):
+    """Id нового пользователя в бакете bucket"""
+    return allocate_ids(connection, 'users', 1)[0] * shard_map.buckets + bucket
+
+def assign_ids(connection, table, rows):
+    """Строки для вставки executemany с id шарда (без шардирования - как есть)"""
+    if not shard_map.enabled:
+        return rows
+    ids = allocate_ids(connection, table.name, len(rows))
+    return [dict(row, id=new_id) for row, new_id in zip(rows, ids)]
+
+def _assign_orm_id(mapper, connection, target):
+    if shard_map.enabled and target.id is None:
+        target.id = allocate_ids(connection, mapper.local_table.name, 1)[0]
+
+def _first_free(maximum, shard):
+    """Наименьшее число больше maximum с остатком shard по модулю SHARD_ID_STRIDE"""
+    value = maximum - maximum % SHARD_ID_STRIDE + shard
+    return value if value > maximum else value + SHARD_ID_STRIDE
+
+def init_id_sequences():
+    """Настройка выдачи id на всех шардах выше наибольшего существующего id.
+
+    Повторный запуск безопасен: счетчики только перескакивают вперед.
+    """
+    from app import db
+    from app.models import ShardSequence
+
+    tables = db.metadata.tables
+    maxima = {}
+    for name in SHARDED_ID_TABLES:
+        column = tables[name].c.id
+        found = []
+        for shard in range(shard_map.count):
+            with shard_engine(shard).connect() as connection:
+                found.append(connection.execute(select(func.coalesce(func.max(column), 0))).scalar())
+        # Номер в id пользователя - частное от деления на число бакетов
+        maxima[name] = max(found) // shard_map.buckets if name == 'users' else max(found)
+
+    sequences = ShardSequence.__table__
+    result = {}
+    for shard in range(shard_map.count):
+        engine = shard_engine(shard)
+        with engine.begin() as connection:
+            for name, maximum in maxima.items():
+                start = _first_free(maximum, shard)
+                if engine.dialect.name in ID_SEQUENCE_DIALECTS:
+                    connection.execute(text(
+                        f'ALTER SEQUENCE {name}_id_seq INCREMENT BY {SHARD_ID_STRIDE} RESTART WITH {start}'
+                    ))
+                else:
+                    connection.execute(delete(sequences).where(sequences.c.name == name))
+                    connection.execute(insert(sequences).values(name=name, value=start - SHARD_ID_STRIDE))
+        result[shard] = {name: _first_free(maximum, shard) for name, maximum in maxima.items()}
+    return result
+
+# --- Перенос бакетов ---
+
+def shard_status():
+    """Число бакетов и пользователей на каждом шарде"""
+    from app import db
+    users = db.metadata.tables['users']
+    status = []
+    for shard in range(shard_map.count):
+        with shard_engine(shard).connect() as connection:
+            user_count = connection.execute(select(func.count()).select_from(users)).scalar()
+        status.append({
+            'shard': shard,
+            'buckets': sum(1 for owner in shard_map.assignment if owner == shard),
+            'users': user_count
+        })
+    return status
+
+def plan_rebalance():
+    """Переносы {бакет: шард}, после которых у шардов поровну бакетов"""
+    owned = {shard: [] for shard in range(shard_map.count)}
+    for bucket, shard in enumerate(shard_map.assignment):
+        owned[shard].append(bucket)
+    base, extra = divmod(shard_map.buckets, shard_map.count)
+    quota = {shard: base + (1 if shard < extra else 0) for shard in owned}
+
+    surplus = [bucket for shard, buckets in owned.items() for bucket in buckets[quota[shard]:]]
+    moves = {}
+    for shard, buckets in owned.items():
+        for _ in range(quota[shard] - len(buckets)):
+            moves[surplus.pop()] = shard
+    return moves
+
+def _bucket_user_ids(connection, bucket, limit, after=0):
+    from app import db
+    users = db.metadata.tables['users']
+    return connection.execute(
+        select(users.c.id)
+        .where(users.c.id % shard_map.buckets == bucket, users.c.id > after)
+        .order_by(users.c.id).limit(limit)
+    ).scalars().all()
+
+def _delete_users(connection, user_ids):
+    from app import db
+    tables = db.metadata.tables
+    subscriptions = tables['subscriptions']
+    claims = tables['billing_claims']
+    connection.execute(delete(claims).where(claims.c.subscription_id.in_(
+        select(subscriptions.c.id).where(subscriptions.c.user_id.in_(user_ids))
+    )))
+    for name, column in reversed(USER_TABLES):
+        table = tables[name]
+        connection.execute(delete(table).where(table.c[column].in_(user_ids)))
+
+def copy_bucket(bucket, source, target, chunk_size=500):
+    """Копирование строк пользователей бакета с шарда source на target.
+
+    Строки этих пользователей на target сначала удаляются, поэтому
+    прерванный перенос можно запустить повторно. Возвращает число строк по таблицам.
+    """
+    from app import db
+    tables = db.metadata.tables
+    counts = {name: 0 for name, _ in USER_TABLES}
+    after = 0
+    with shard_engine(source).connect() as reader:
+        while True:
+            user_ids = _bucket_user_ids(reader, bucket, chunk_size, after)
+            if not user_ids:
+                break
+            with shard_engine(target).begin() as writer:
+                _delete_users(writer, user_ids)
+                for name, column in USER_TABLES:
+                    table = tables[name]
+                    result = reader.execution_options(yield_per=1000).execute(
+                        select(table).where(table.c[column].in_(user_ids))
+                    )
+                    for rows in result.mappings().partitions():
+                        rows = [dict(row) for row in rows]
+                        if name in REKEYED_TABLES:
+                            for row in rows:
+                                del row['id']
+                        writer.execute(insert(table), rows)
+                        counts[name] += len(rows)
+            after = user_ids[-1]
+    return counts
+
+def delete_bucket(bucket, shard, chunk_size=500):
+    """Удаление строк пользователей бакета с шарда; возвращает число пользователей"""
+    deleted = 0
+    with shard_engine(shard).begin() as connection:
+        while True:
+            user_ids = _bucket_user_ids(connection, bucket, chunk_size)
+            if not user_ids:
+                break
+            _delete_users(connection, user_ids)
+            deleted += len(user_ids)
+    return deleted
+
+def move_buckets(moves, wait=None, chunk_size=500):
+    """Перенос бакетов {бакет: шард} с кратким режимом только для чтения.
+
+    1. бакеты помечаются readonly (запросы на запись получают 503), ожидание,
+       пока все процессы перечитают карту;
+    2. строки копируются на новые шарды, карта переключается, снова ожидание;
+    3. строки удаляются со старых шардов.
+    Если копирование не удалось, карта возвращается к прежней, а скопированные
+    строки удаляются с целевых шардов. Пакетные задачи (advance-billing, reminders) на время переноса лучше остановить.
+    """
+    for bucket, shard in moves.items():
+        if not 0 <= bucket < shard_map.buckets or not 0 <= shard < shard_map.count:
+            raise ValueError(f'Invalid move of bucket {bucket} to shard {shard}')
+    moves = {bucket: shard for bucket, shard in moves.items() if shard_map.assignment[bucket] != shard}
+    if not moves:
+        return []
+    wait = shard_map.reload_interval + 1 if wait is None else wait
+
+    original = list(shard_map.assignment)
+    assignment = list(original)
+    shard_map.save(assignment, shard_map.readonly | set(moves))
+    time.sleep(wait)
+
+    stats = []
+    copied = []
+    try:
+        for bucket, target in sorted(moves.items()):
+            source = assignment[bucket]
+            copied.append((bucket, target))
+            rows = copy_bucket(bucket, source, target, chunk_size)
+            stats.append({'bucket': bucket, 'from': source, 'to': target, 'rows': rows})
+            assignment[bucket] = target
+    except Exception:
+        # Бакеты остаются на прежних шардах и снова доступны для записи;
+        # уже скопированные (в том числе частично) строки убираются с целевых шардов
+        shard_map.save(original, shard_map.readonly - set(moves))
+        for bucket, target in copied:
+            delete_bucket(bucket, target, chunk_size)
+        raise
+
+    shard_map.save(assignment, shard_map.readonly - set(moves))
+    time.sleep(wait)
+
+    for item in stats:
+        delete_bucket(item['bucket'], item['from'], chunk_size)
+    return stats
@@ -0,0 +1,65 @@
+import hashlib
+import logging
+from datetime import datetime
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateTable, CreateIndex
+from app import db
+from app.models import SchemaState
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_KEY = 'models_fingerprint'
+
+def schema_fingerprint(dialect=None):
+    """Отпечаток схемы моделей: хэш DDL всех таблиц и индексов для диалекта базы"""
+    dialect = dialect or db.engine.dialect
+    digest = hashlib.sha256()
+    for table in db.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+def stored_fingerprint():
+    """Отпечаток, записанный в базу (None, если его нет или нет таблицы schema_state)"""
+    try:
+        with db.engine.connect() as connection:
+            return connection.execute(
+                select(SchemaState.value).where(SchemaState.key == FINGERPRINT_KEY)
+            ).scalar()
+    except DBAPIError:
+        return None
+
+def stamp_fingerprint(fingerprint=None):
+    """Запись текущего отпечатка (после flask db upgrade)"""
+    fingerprint = fingerprint or schema_fingerprint()
+    values = {'value': fingerprint, 'updated_at': datetime.utcnow()}
+    with db.engine.begin() as connection:
+        updated = connection.execute(
+            update(SchemaState).where(SchemaState.key == FINGERPRINT_KEY).values(**values)
+        ).rowcount
+        if not updated:
+            connection.execute(insert(SchemaState).values(key=FINGERPRINT_KEY, **values))
+    return fingerprint
+
+def prepare_schema(app):
+    """Проверка схемы при старте одним запросом вместо db.create_all().
+
+    Если отпечаток в базе совпадает с моделями, DDL не выполняется. Иначе при
+    SCHEMA_AUTO_CREATE (разработка) создаются недостающие таблицы, а в
+    продакшене пишется предупреждение: миграции применяются только командой
+    flask db upgrade. Возвращает 'current', 'created' или 'outdated'.
+    """
+    with app.app_context():
+        fingerprint = schema_fingerprint()
+        if stored_fingerprint() == fingerprint:
+            return 'current'
+        
+        if app.config.get('SCHEMA_AUTO_CREATE', False):
+            db.create_all(bind_key=None)
+            stamp_fingerprint(fingerprint)
+            return 'created'
+    
+    logger.warning('Database schema does not match the models; run "flask db upgrade" and "flask schema stamp"')
+    return 'outdated'
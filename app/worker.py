@@ -0,0 +1,14 @@
+from app import db
+from app.audit import audit_sink
+
+def reset_after_fork(app):
+    """Подготовка процесса-воркера после fork.
+
+    Соединения пула, открытые в мастере (create_all при загрузке приложения),
+    не должны использоваться двумя процессами: пул заменяется новым, а
+    унаследованные сокеты не закрываются, чтобы не оборвать их у родителя.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    audit_sink.reset_after_fork()
@@ -0,0 +1,188 @@
+"""Бенчмарк слоя данных и эндпоинтов на синтетическом наборе.
+
+Замеряет функции app.database и обработчики маршрутов через тестовый клиент
+Flask на SQLite (или PostgreSQL через --database-url), результат пишет в JSON.
+Режим сравнения отмечает регрессии медианы больше порога и завершается с кодом 1.
+
+python benchmarks/bench_data_layer.py --users 200 --subscriptions 20 --output results.json
+python benchmarks/bench_data_layer.py --compare baseline.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from app import create_app, db
+from app.auth import create_token
+from app.database import (
+    get_user_subscriptions, get_upcoming_payments, get_monthly_summary, update_subscription_next_payment
+)
+from app.models import Subscription, User
+from benchmarks.dataset import generate_dataset
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def measure(fn, args_cycle, repeat, warmup=3):
+    """Время вызовов fn(*args) в мс; аргументы берутся по кругу из args_cycle"""
+    for i in range(warmup):
+        fn(*args_cycle[i % len(args_cycle)])
+        db.session.remove()
+    
+    samples = []
+    for i in range(repeat):
+        args = args_cycle[i % len(args_cycle)]
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+        db.session.remove()
+    return {
+        'runs': repeat,
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(percentile(samples, 0.95), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'ops_per_s': round(1000 / statistics.fmean(samples), 1),
+    }
+
+def route_call(client, method, url, token, json_body=None):
+    def call(user_id, *extra):
+        response = client.open(
+            url.format(*extra), method=method, json=json_body,
+            headers={'Authorization': f'Bearer {token[user_id]}'}
+        )
+        assert response.status_code < 400, (url, response.status_code, response.get_data(as_text=True))
+    return call
+
+def run_cases(app, repeat, sample_users):
+    today = date.today()
+    user_ids = db.session.execute(select(User.id).order_by(User.id).limit(sample_users)).scalars().all()
+    subscription_ids = db.session.execute(
+        select(Subscription.id, Subscription.user_id)
+        .where(Subscription.user_id.in_(user_ids), Subscription.is_active == True)
+        .order_by(Subscription.id)
+    ).all()
+    tokens = {user_id: create_token(user_id) for user_id in user_ids}
+    users = [(user_id,) for user_id in user_ids]
+    client = app.test_client()
+    
+    cases = {
+        'db.get_user_subscriptions': (get_user_subscriptions, users),
+        'db.get_upcoming_payments': (lambda u: get_upcoming_payments(u, 30), users),
+        'db.get_monthly_summary': (lambda u: get_monthly_summary(u, today.year, today.month), users),
+        'db.update_subscription_next_payment': (
+            update_subscription_next_payment, [(sub_id,) for sub_id, _ in subscription_ids]
+        ),
+        'GET /api/subscriptions': (route_call(client, 'GET', '/api/subscriptions', tokens), users),
+        'GET /api/subscriptions/upcoming': (route_call(client, 'GET', '/api/subscriptions/upcoming', tokens), users),
+        'GET /api/subscriptions/summary': (route_call(client, 'GET', '/api/subscriptions/summary', tokens), users),
+        'GET /api/subscriptions/forecast': (route_call(client, 'GET', '/api/subscriptions/forecast', tokens), users),
+        'POST /api/subscriptions': (route_call(client, 'POST', '/api/subscriptions', tokens, {
+            'name': 'Bench', 'amount': '9.99', 'periodicity': 'monthly', 'start_date': today.isoformat()
+        }), users),
+        'PUT /api/subscriptions/<id>': (route_call(client, 'PUT', '/api/subscriptions/{}', tokens, {
+            'amount': '11.49'
+        }), [(user_id, sub_id) for sub_id, user_id in subscription_ids]),
+    }
+    
+    results = {}
+    for name, (fn, args_cycle) in cases.items():
+        results[name] = measure(fn, args_cycle, repeat)
+        print(f"{name:40} median {results[name]['median_ms']:9.3f} ms   p95 {results[name]['p95_ms']:9.3f} ms")
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current, baseline, threshold):
+    """Сравнение медиан с базовым результатом; возвращает список регрессий"""
+    regressions = []
+    print(f"\n{'case':40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f'{name:40} {"-":>10} {result["median_ms"]:10.3f}      new')
+            continue
+        change = result['median_ms'] / base['median_ms'] - 1 if base['median_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append({'case': name, 'baseline_ms': base['median_ms'],
+                                'current_ms': result['median_ms'], 'change': round(change, 4)})
+            flag = '  REGRESSION'
+        print(f"{name:40} {base['median_ms']:10.3f} {result['median_ms']:10.3f} {change:+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--subscriptions', type=int, default=20, help='Подписок на пользователя (в среднем)')
+    parser.add_argument('--audit', type=int, default=3, help='Записей аудита на подписку')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--sample-users', type=int, default=50, help='Сколько пользователей опрашивать по кругу')
+    parser.add_argument('--database-url', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help='База для замеров (по умолчанию временный файл SQLite); будет очищена')
+    parser.add_argument('--output', help='Файл для результата в JSON')
+    parser.add_argument('--compare', help='JSON базового прогона для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Допустимый рост медианы (0.15 = 15%%)')
+    args = parser.parse_args()
+    
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': url,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    })
+    
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        dataset = generate_dataset(args.users, args.subscriptions, args.audit, args.seed)
+        print(f"dataset: {dataset} in {time.perf_counter() - started:.1f} s ({db.engine.dialect.name})")
+        
+        report = {
+            'meta': {
+                'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'dialect': db.engine.dialect.name,
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'dataset': dataset,
+            },
+            'results': run_cases(app, args.repeat, args.sample_users),
+        }
+        if args.database_url:
+            db.drop_all()
+    
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report['regressions'] = regressions
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) over {args.threshold:.0%}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
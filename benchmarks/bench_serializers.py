@@ -0,0 +1,108 @@
+"""Микробенчмарк сериализации списка подписок.
+
+Сравнивает прежний путь (ORM-объекты + словарь вручную) с RowSerializer
+по строкам Core. Запуск: python benchmarks/bench_serializers.py --rows 20000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import Subscription, User, Periodicity
+from app.serializers import SUBSCRIPTION_LIST
+from app.money import from_minor
+
+def orm_dicts(user_id):
+    """Прежний код get_subscriptions"""
+    subscriptions = Subscription.query.filter_by(user_id=user_id, is_active=True).all()
+    
+    result = []
+    for sub in subscriptions:
+        result.append({
+            'id': sub.id,
+            'name': sub.name,
+            'amount': sub.amount,
+            'currency': sub.currency,
+            'periodicity': sub.periodicity.value,
+            'start_date': sub.start_date.isoformat(),
+            'next_payment_date': sub.next_payment_date.isoformat(),
+            'is_active': sub.is_active,
+            'created_at': sub.created_at.isoformat()
+        })
+    return result
+
+def core_serializer(user_id):
+    rows = db.session.execute(
+        SUBSCRIPTION_LIST.select().where(Subscription.user_id == user_id, Subscription.is_active == True)
+    ).all()
+    return SUBSCRIPTION_LIST.rows(rows)
+
+def serializer_only(rows):
+    return SUBSCRIPTION_LIST.rows(rows)
+
+def manual_only(rows):
+    return [{
+        'id': r.id,
+        'name': r.name,
+        'amount': from_minor(r.amount_minor, r.currency),
+        'currency': r.currency,
+        'periodicity': r.periodicity.value,
+        'start_date': r.start_date.isoformat(),
+        'next_payment_date': r.next_payment_date.isoformat(),
+        'is_active': r.is_active,
+        'created_at': r.created_at.isoformat()
+    } for r in rows]
+
+def measure(fn, arg, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return rows / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        db.session.add(user)
+        db.session.flush()
+        periodicities = list(Periodicity)
+        db.session.execute(insert(Subscription), [{
+            'user_id': user.id,
+            'name': f'Subscription {i}',
+            'amount_minor': 999 + i % 100 * 100,
+            'periodicity': periodicities[i % len(periodicities)],
+            'start_date': date(2024, 1, 1) + timedelta(days=i % 365),
+            'next_payment_date': date(2025, 1, 1) + timedelta(days=i % 365),
+            'is_active': True
+        } for i in range(args.rows)])
+        db.session.commit()
+        
+        orm_objects = Subscription.query.filter_by(user_id=user.id).all()
+        core_rows = db.session.execute(SUBSCRIPTION_LIST.select()).all()
+        
+        results = {
+            'query + ORM + dict (old)': measure(orm_dicts, user.id, args.rows, args.repeat),
+            'query + Core + RowSerializer': measure(core_serializer, user.id, args.rows, args.repeat),
+            'dict building only (old)': measure(manual_only, orm_objects, args.rows, args.repeat),
+            'RowSerializer only': measure(serializer_only, core_rows, args.rows, args.repeat),
+        }
+        
+        for name, rate in results.items():
+            print(f'{name:32} {rate:12,.0f} rows/s')
+
+if __name__ == '__main__':
+    main()
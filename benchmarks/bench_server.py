@@ -0,0 +1,104 @@
+"""Пропускная способность сервера разработки и gunicorn.
+
+Поднимает сервер отдельным процессом на файле SQLite (или DATABASE_URL),
+создает пользователя с подписками и нагружает GET /api/subscriptions
+параллельными клиентами. Запуск:
+python benchmarks/bench_server.py --server gunicorn --workers 4 --clients 16 --seconds 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def request(url, data=None, headers=None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json', **(headers or {})})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.status, response.read()
+
+def start_server(kind, port, workers, env):
+    if kind == 'dev':
+        command = [sys.executable, '-c',
+                   f"from run import app; app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)"]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+        env = {**env, 'BIND': f'127.0.0.1:{port}', 'WEB_CONCURRENCY': str(workers)}
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def wait_ready(base, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            request(f'{base}/api/health')
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+def load(url, headers, clients, seconds):
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.time() + seconds
+
+    def client(i):
+        while time.time() < stop:
+            try:
+                request(url, headers=headers)
+                counts[i] += 1
+            except OSError:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, sum(errors)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--server', choices=('dev', 'gunicorn'), default='gunicorn')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--subscriptions', type=int, default=50)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        'FLASK_CONFIG': 'production',
+        'DATABASE_URL': os.environ.get('DATABASE_URL', f'sqlite:///{tmpdir}/bench.db'),
+        'AUDIT_WRITE_MODE': 'transaction',
+        'SCHEMA_AUTO_CREATE': 'true',
+    }
+    base = f'http://127.0.0.1:{args.port}'
+    server = start_server(args.server, args.port, args.workers, env)
+    try:
+        wait_ready(base)
+        _, body = request(f'{base}/api/auth/register', {
+            'email': f'bench-{time.time_ns()}@example.com', 'username': f'bench{time.time_ns()}'
+        })
+        headers = {'Authorization': f"Bearer {json.loads(body)['token']}"}
+        request(f'{base}/api/subscriptions/bulk', {'subscriptions': [
+            {'name': f'Sub {i}', 'amount': 9.99, 'periodicity': 'monthly', 'start_date': '2030-01-15'}
+            for i in range(args.subscriptions)
+        ]}, headers)
+
+        rps, errors = load(f'{base}/api/subscriptions', headers, args.clients, args.seconds)
+        print(f'{args.server} (workers={args.workers if args.server == "gunicorn" else 1}, '
+              f'clients={args.clients}): {rps:.0f} req/s, errors={errors}')
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == '__main__':
+    main()
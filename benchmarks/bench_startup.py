@@ -0,0 +1,70 @@
+"""Время до первого ответа при холодном старте процесса.
+
+Каждый замер - новый интерпретатор: импорт точки входа, создание приложения
+и первый запрос GET /api/health через тестовый клиент. База - файл SQLite,
+подготовленный первым (неучитываемым) запуском. Запуск:
+python benchmarks/bench_startup.py --runs 10 [--entry wsgi:app] [--root другой/checkout] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+started = time.perf_counter()
+from {module} import {attr} as app
+created = time.perf_counter()
+response = app.test_client().get('/api/health')
+assert response.status_code == 200, response.status_code
+print(created - started, time.perf_counter() - started)
+"""
+
+def run_once(root, entry, env):
+    module, attr = entry.split(':')
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, attr=attr)],
+        cwd=root, env=env, capture_output=True, text=True, check=True
+    ).stdout.split()
+    total = time.perf_counter() - started
+    return float(output[0]) * 1000, float(output[1]) * 1000, total * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', default=ROOT, help='Каталог проекта (например, checkout прошлого релиза)')
+    parser.add_argument('--entry', default='wsgi:app', help='модуль:атрибут приложения')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--output', help='Файл для сохранения результата в JSON')
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        'FLASK_CONFIG': 'production',
+        'DATABASE_URL': os.environ.get('DATABASE_URL', f'sqlite:///{tempfile.mkdtemp()}/startup.db'),
+        'SCHEMA_AUTO_CREATE': 'true',
+    }
+    # Первый запуск создает схему и не учитывается
+    run_once(args.root, args.entry, env)
+
+    samples = [run_once(args.root, args.entry, env) for _ in range(args.runs)]
+    result = {
+        'entry': args.entry,
+        'runs': args.runs,
+        'create_app_ms': round(statistics.median(s[0] for s in samples), 1),
+        'first_response_ms': round(statistics.median(s[1] for s in samples), 1),
+        'process_ms': round(statistics.median(s[2] for s in samples), 1),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Микробенчмарк проверки входных данных подписок.
+
+Сравнивает прежний путь маршрутов (sanitize_input, validate_required_fields,
+validate_subscription_data и повторный разбор даты, периодичности и суммы)
+со схемой SUBSCRIPTION_SCHEMA. Каждый десятый элемент
+содержит ошибку. Запуск: python benchmarks/bench_validation.py --items 20000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Periodicity
+from app.money import CURRENCY_EXPONENTS, DEFAULT_CURRENCY, parse_amount, to_minor
+from app.schemas import SUBSCRIPTION_SCHEMA
+
+REQUIRED_FIELDS = ('name', 'amount', 'periodicity', 'start_date')
+PERIODICITIES = [p.value for p in Periodicity]
+
+# Прежние валидаторы маршрутов (бывшие app/validators.py), сохранены без
+# изменений как точка сравнения; в приложении используется app/schemas.py
+
+def validate_subscription_data(data):
+    """Валидация данных для создания/обновления подписки"""
+    errors = {}
+    
+    # Проверка названия
+    if 'name' in data:
+        if not data['name'] or len(data['name'].strip()) == 0:
+            errors['name'] = 'Name is required'
+        elif len(data['name']) > 100:
+            errors['name'] = 'Name must be less than 100 characters'
+    
+    # Проверка валюты
+    currency = data.get('currency') or DEFAULT_CURRENCY
+    if currency not in CURRENCY_EXPONENTS:
+        errors['currency'] = f'Unsupported currency. Must be one of: {sorted(CURRENCY_EXPONENTS)}'
+        currency = DEFAULT_CURRENCY
+    
+    # Проверка суммы (не точнее минимальной единицы валюты)
+    if 'amount' in data:
+        amount, error = parse_amount(data['amount'], currency)
+        if error:
+            errors['amount'] = error
+        elif amount <= 0:
+            errors['amount'] = 'Amount must be greater than 0'
+        elif amount > 1000000:  # Максимальная сумма
+            errors['amount'] = 'Amount is too large'
+    
+    # Проверка периодичности
+    if 'periodicity' in data:
+        try:
+            periodicity = Periodicity(data['periodicity'])
+        except ValueError:
+            errors['periodicity'] = f'Invalid periodicity. Must be one of: {[p.value for p in Periodicity]}'
+    
+    # Проверка даты начала
+    if 'start_date' in data:
+        try:
+            date_obj = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+            #if date_obj < datetime.now().date():
+             #   errors['start_date'] = 'Start date cannot be in the past'
+        except ValueError:
+            errors['start_date'] = 'Invalid date format. Use YYYY-MM-DD'
+    
+    # Проверка даты следующего платежа (при обновлении)
+    if 'next_payment_date' in data:
+        try:
+            date_obj = datetime.strptime(data['next_payment_date'], '%Y-%m-%d').date()
+            if date_obj < datetime.now().date():
+                errors['next_payment_date'] = 'Next payment date cannot be in the past'
+        except ValueError:
+            errors['next_payment_date'] = 'Invalid date format. Use YYYY-MM-DD'
+    
+    return errors
+
+def validate_required_fields(data, fields):
+    """Проверка наличия обязательных полей"""
+    errors = {}
+    
+    for field in fields:
+        if field not in data or data[field] in (None, ''):
+            errors[field] = f'{field} is required'
+    
+    return errors
+
+def sanitize_input(data):
+    """Санитизация входных данных"""
+    sanitized = {}
+    
+    for key, value in data.items():
+        if isinstance(value, str):
+            # Удаляем лишние пробелы
+            sanitized[key] = value.strip()
+            # Заменяем опасные символы (базовая защита от XSS)
+            sanitized[key] = sanitized[key].replace('<', '&lt;').replace('>', '&gt;')
+        else:
+            sanitized[key] = value
+    
+    return sanitized
+
+def make_items(count):
+    items = []
+    for i in range(count):
+        item = {
+            'name': f' Subscription {i} ',
+            'amount': f'{9 + i % 100}.99',
+            'periodicity': PERIODICITIES[i % len(PERIODICITIES)],
+            'start_date': f'2030-{1 + i % 12:02d}-{1 + i % 28:02d}'
+        }
+        if i % 10 == 9:
+            item['amount'] = '-1'
+        items.append(item)
+    return items
+
+def old_path(items):
+    """Прежний код create_subscriptions_bulk до вставки"""
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'errors': {'item': 'Subscription must be an object'}})
+            continue
+        item = sanitize_input(item)
+        item_errors = validate_required_fields(item, REQUIRED_FIELDS)
+        item_errors.update(validate_subscription_data(item))
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+            continue
+        start_date = datetime.strptime(item['start_date'], '%Y-%m-%d').date()
+        currency = item.get('currency') or DEFAULT_CURRENCY
+        rows.append({
+            'name': item['name'],
+            'amount_minor': to_minor(item['amount'], currency),
+            'currency': currency,
+            'periodicity': Periodicity(item['periodicity']),
+            'start_date': start_date
+        })
+    return rows, errors
+
+def schema_path(items):
+    accepted, errors = SUBSCRIPTION_SCHEMA.validate_many(items)
+    rows = [{
+        'name': values['name'],
+        'amount_minor': to_minor(values['amount'], values['currency']),
+        'currency': values['currency'],
+        'periodicity': values['periodicity'],
+        'start_date': values['start_date']
+    } for index, values in accepted]
+    return rows, errors
+
+def schema_only(items):
+    return SUBSCRIPTION_SCHEMA.validate_many(items)
+
+def measure(fn, items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(items)
+        best = min(best, time.perf_counter() - started)
+    return len(items) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    items = make_items(args.items)
+    old_rows, old_errors = old_path(items)
+    new_rows, new_errors = schema_path(items)
+    assert len(old_rows) == len(new_rows) and len(old_errors) == len(new_errors)
+    
+    results = {
+        'validators + re-parse (old)': measure(old_path, items, args.repeat),
+        'schema + minor units': measure(schema_path, items, args.repeat),
+        'schema only': measure(schema_only, items, args.repeat),
+    }
+    
+    for name, rate in results.items():
+        print(f'{name:32} {rate:12,.0f} items/s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Детерминированный синтетический набор данных для бенчмарков.
+
+N пользователей по ~M подписок с реалистичным распределением периодичности,
+сумм и дат, плюс история аудита. При одинаковых seed и today набор
+совпадает побайтно.
+"""
+import json
+import math
+import random
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import insert, select
+from app import db
+from app.models import AuditLog, Periodicity, Subscription, User
+from app.money import DEFAULT_CURRENCY, from_minor
+from app.rollup import rebuild_rollups
+from app.schedule import PERIOD_STEPS, add_period
+
+# Доля подписок каждой периодичности
+PERIODICITY_WEIGHTS = {
+    Periodicity.MONTHLY: 0.60,
+    Periodicity.YEARLY: 0.15,
+    Periodicity.WEEKLY: 0.10,
+    Periodicity.QUARTERLY: 0.10,
+    Periodicity.DAILY: 0.05,
+}
+
+SERVICE_NAMES = (
+    'Netflix', 'Spotify', 'YouTube Premium', 'iCloud', 'Google One', 'Яндекс Плюс',
+    'Dropbox', 'GitHub', 'Notion', 'Adobe CC', 'Microsoft 365', 'Фитнес-клуб',
+    'Мобильная связь', 'Интернет', 'Страховка', 'Облачный сервер', 'Кинопоиск', 'Storytel',
+)
+
+INSERT_BATCH = 5000
+
+def next_on_or_after(start, periodicity, today):
+    """Первая дата платежа, не раньше today, для подписки с началом start"""
+    if start >= today:
+        return start
+    unit, step = PERIOD_STEPS[periodicity.value]
+    if unit == 'D':
+        periods = math.ceil((today - start).days / step)
+    else:
+        periods = ((today.year - start.year) * 12 + today.month - start.month) // step
+    value = add_period(start, periodicity, anchor_day=start.day, count=periods)
+    if value < today:
+        value = add_period(start, periodicity, anchor_day=start.day, count=periods + 1)
+    return value
+
+def _amount_minor(rng, periodicity):
+    """Сумма платежа в копейках: логнормальное распределение вокруг типичной цены периода"""
+    typical = {'daily': 3, 'weekly': 8, 'monthly': 12, 'quarterly': 30, 'yearly': 90}[periodicity.value]
+    return round(typical * rng.lognormvariate(0, 0.6) * 100)
+
+def generate_dataset(users=100, subscriptions=20, audit=3, seed=42, today=None):
+    """Заполнение базы: users пользователей, в среднем subscriptions подписок на
+    пользователя и audit записей аудита на подписку. Возвращает статистику.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    periodicities = list(PERIODICITY_WEIGHTS)
+    weights = list(PERIODICITY_WEIGHTS.values())
+    
+    db.session.execute(insert(User), [{
+        'username': f'bench_user_{i}',
+        'email': f'bench_user_{i}@example.com',
+        'created_at': datetime.combine(today - timedelta(days=rng.randint(0, 1000)), time())
+    } for i in range(users)])
+    user_ids = db.session.execute(
+        select(User.id).where(User.username.like('bench_user_%')).order_by(User.id)
+    ).scalars().all()
+    
+    rows = []
+    for user_id in user_ids:
+        for _ in range(rng.randint(max(1, subscriptions // 2), max(1, subscriptions * 3 // 2))):
+            periodicity = rng.choices(periodicities, weights)[0]
+            start = today - timedelta(days=rng.randint(-30, 3 * 365))
+            rows.append({
+                'user_id': user_id,
+                'name': rng.choice(SERVICE_NAMES),
+                'amount_minor': _amount_minor(rng, periodicity),
+                'currency': DEFAULT_CURRENCY,
+                'periodicity': periodicity,
+                'start_date': start,
+                'next_payment_date': next_on_or_after(start, periodicity, today),
+                'is_active': rng.random() < 0.9,
+                'created_at': datetime.combine(start, time(rng.randint(0, 23), rng.randint(0, 59)))
+            })
+    for i in range(0, len(rows), INSERT_BATCH):
+        db.session.execute(insert(Subscription), rows[i:i + INSERT_BATCH])
+    
+    audit_rows = []
+    subscription_rows = db.session.execute(
+        select(Subscription.id, Subscription.user_id, Subscription.created_at, Subscription.amount_minor)
+        .order_by(Subscription.id)
+    ).all()
+    for sub_id, user_id, created_at, amount_minor in subscription_rows:
+        amount = str(from_minor(amount_minor, DEFAULT_CURRENCY))
+        updated = str(from_minor(round(amount_minor * 1.1), DEFAULT_CURRENCY))
+        audit_rows.append({
+            'user_id': user_id, 'action': 'CREATE', 'table_name': 'subscriptions', 'record_id': sub_id,
+            'old_values': None, 'new_values': json.dumps({'amount': amount}), 'created_at': created_at
+        })
+        span = max((datetime.combine(today, time()) - created_at).total_seconds(), 1)
+        for _ in range(audit - 1):
+            audit_rows.append({
+                'user_id': user_id, 'action': 'UPDATE', 'table_name': 'subscriptions', 'record_id': sub_id,
+                'old_values': json.dumps({'amount': amount}),
+                'new_values': json.dumps({'amount': updated}),
+                'created_at': created_at + timedelta(seconds=rng.uniform(0, span))
+            })
+    for i in range(0, len(audit_rows), INSERT_BATCH):
+        db.session.execute(insert(AuditLog), audit_rows[i:i + INSERT_BATCH])
+    db.session.commit()
+    
+    rebuild_rollups()
+    return {'users': len(user_ids), 'subscriptions': len(rows), 'audit_logs': len(audit_rows)}
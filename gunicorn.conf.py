@@ -0,0 +1,27 @@
+# Продакшен-сервер: gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+keepalive = 5
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+# Приложение загружается до fork: воркеры делят память copy-on-write
+preload_app = True
+
+accesslog = os.environ.get('WEB_ACCESS_LOG')
+errorlog = '-'
+
+def post_fork(server, worker):
+    from app.worker import reset_after_fork
+    reset_after_fork(server.app.wsgi())
+
+def worker_exit(server, worker):
+    # Дозапись очереди аудита воркера
+    from app.audit import audit_sink
+    audit_sink.shutdown()
@@ -0,0 +1,70 @@
+"""reminder outbox
+
+Revision ID: 2e7c9a5b1f63
+Revises: 8b3f6e1d9c42
+Create Date: 2026-10-17 11:21:44.190372
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e7c9a5b1f63'
+down_revision = '8b3f6e1d9c42'
+branch_labels = None
+depends_on = None
+
+PARTIAL_INDEX_DIALECTS = ('postgresql', 'sqlite')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.create_table('reminder_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('subscription_id', 'due_date', name='uq_reminder_outbox_subscription_due')
+    )
+    with op.batch_alter_table('reminder_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_reminder_outbox_status_next_attempt', ['status', 'next_attempt_at'], unique=False)
+
+    # Диапазон дат платежей по всем пользователям
+    if dialect in PARTIAL_INDEX_DIALECTS:
+        active = sa.text('is_active = true') if dialect == 'postgresql' else sa.text('is_active = 1')
+        op.create_index(
+            'ix_subscriptions_active_next_payment', 'subscriptions',
+            ['next_payment_date', 'id'], unique=False,
+            postgresql_where=active, sqlite_where=active
+        )
+    else:
+        op.create_index(
+            'ix_subscriptions_next_payment_active', 'subscriptions',
+            ['next_payment_date', 'is_active', 'id'], unique=False
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect in PARTIAL_INDEX_DIALECTS:
+        op.drop_index('ix_subscriptions_active_next_payment', table_name='subscriptions')
+    else:
+        op.drop_index('ix_subscriptions_next_payment_active', table_name='subscriptions')
+
+    with op.batch_alter_table('reminder_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_reminder_outbox_status_next_attempt')
+
+    op.drop_table('reminder_outbox')
@@ -0,0 +1,30 @@
+"""billing claims
+
+Revision ID: 3b7e1c9a4f20
+Revises: 784f0cb084b0
+Create Date: 2026-10-17 03:10:12.418503
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c9a4f20'
+down_revision = '784f0cb084b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('billing_claims',
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=False),
+    sa.Column('worker_id', sa.String(length=100), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('subscription_id', 'due_date')
+    )
+
+
+def downgrade():
+    op.drop_table('billing_claims')
@@ -0,0 +1,72 @@
+"""subscriptions archive
+
+Revision ID: 4f1b8e6c2d90
+Revises: 9c4d2a7e5b18
+Create Date: 2026-10-17 16:05:32.418277
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1b8e6c2d90'
+down_revision = '9c4d2a7e5b18'
+branch_labels = None
+depends_on = None
+
+PARTIAL_INDEX_DIALECTS = ('postgresql', 'sqlite')
+
+periodicity = sa.Enum('DAILY', 'WEEKLY', 'MONTHLY', 'QUARTERLY', 'YEARLY', name='periodicity', create_type=False)
+# В SQLite INTEGER уже 64-битный и служит псевдонимом rowid
+big_id = sa.BigInteger().with_variant(sa.Integer(), 'sqlite')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.create_table('subscriptions_archive',
+    sa.Column('id', big_id, autoincrement=False, nullable=False),
+    sa.Column('user_id', big_id, nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('amount_minor', sa.BigInteger(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('periodicity', periodicity, nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('next_payment_date', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('subscriptions_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_subscriptions_archive_user_next_payment', ['user_id', 'next_payment_date'], unique=False)
+
+    # Удаленные подписки, ожидающие переноса в архив
+    if dialect in PARTIAL_INDEX_DIALECTS:
+        inactive = sa.text('is_active = false') if dialect == 'postgresql' else sa.text('is_active = 0')
+        op.create_index(
+            'ix_subscriptions_inactive_updated', 'subscriptions',
+            ['updated_at', 'id'], unique=False,
+            postgresql_where=inactive, sqlite_where=inactive
+        )
+    else:
+        op.create_index(
+            'ix_subscriptions_active_updated', 'subscriptions',
+            ['is_active', 'updated_at', 'id'], unique=False
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect in PARTIAL_INDEX_DIALECTS:
+        op.drop_index('ix_subscriptions_inactive_updated', table_name='subscriptions')
+    else:
+        op.drop_index('ix_subscriptions_active_updated', table_name='subscriptions')
+
+    with op.batch_alter_table('subscriptions_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_subscriptions_archive_user_next_payment')
+
+    op.drop_table('subscriptions_archive')
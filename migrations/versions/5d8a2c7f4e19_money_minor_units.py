@@ -0,0 +1,107 @@
+"""money in minor units with currency
+
+Revision ID: 5d8a2c7f4e19
+Revises: 0c6e1f5a2b37
+Create Date: 2026-10-17 09:14:37.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8a2c7f4e19'
+down_revision = '0c6e1f5a2b37'
+branch_labels = None
+depends_on = None
+
+periodicity = sa.Enum('DAILY', 'WEEKLY', 'MONTHLY', 'QUARTERLY', 'YEARLY', name='periodicity', create_type=False)
+
+subscriptions = sa.table('subscriptions',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('amount', sa.Float),
+    sa.column('amount_minor', sa.BigInteger),
+    sa.column('currency', sa.String),
+    sa.column('periodicity', periodicity),
+    sa.column('start_date', sa.Date),
+    sa.column('is_active', sa.Boolean)
+)
+
+
+def _fill_rollups(columns, total):
+    """Заполнение агрегатов по активным подпискам"""
+    period = sa.cast(
+        sa.extract('year', subscriptions.c.start_date) * 100 + sa.extract('month', subscriptions.c.start_date),
+        sa.Integer
+    )
+    groups = [subscriptions.c.user_id, period, subscriptions.c.periodicity]
+    if 'currency' in columns:
+        groups.append(subscriptions.c.currency)
+    op.execute(
+        sa.table('spend_rollups', *[sa.column(name) for name in columns]).insert().from_select(
+            columns,
+            sa.select(*groups, sa.func.count(subscriptions.c.id), sa.func.sum(total))
+            .where(subscriptions.c.is_active == sa.true())
+            .group_by(*groups)
+        )
+    )
+
+
+def upgrade():
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount_minor', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default='RUB', nullable=False))
+
+    # Все существующие суммы - рубли с копейками
+    op.execute(subscriptions.update().values(
+        amount_minor=sa.cast(sa.func.round(subscriptions.c.amount * 100), sa.BigInteger)
+    ))
+
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.alter_column('amount_minor', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.drop_column('amount')
+
+    op.drop_table('spend_rollups')
+    op.create_table('spend_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Integer(), nullable=False),
+    sa.Column('periodicity', periodicity, nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('subscription_count', sa.Integer(), nullable=False),
+    sa.Column('total_minor', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'period', 'periodicity', 'currency')
+    )
+    _fill_rollups(
+        ['user_id', 'period', 'periodicity', 'currency', 'subscription_count', 'total_minor'],
+        subscriptions.c.amount_minor
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount', sa.Float(), nullable=True))
+
+    # Валюта при откате теряется: суммы переводятся из сотых долей
+    op.execute(subscriptions.update().values(amount=subscriptions.c.amount_minor / 100.0))
+
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.alter_column('amount', existing_type=sa.Float(), nullable=False)
+        batch_op.drop_column('currency')
+        batch_op.drop_column('amount_minor')
+
+    op.drop_table('spend_rollups')
+    op.create_table('spend_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Integer(), nullable=False),
+    sa.Column('periodicity', periodicity, nullable=False),
+    sa.Column('subscription_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'period', 'periodicity')
+    )
+    _fill_rollups(
+        ['user_id', 'period', 'periodicity', 'subscription_count', 'total_amount'],
+        subscriptions.c.amount
+    )
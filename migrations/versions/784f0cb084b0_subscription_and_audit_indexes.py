@@ -0,0 +1,52 @@
+"""subscription and audit indexes
+
+Revision ID: 784f0cb084b0
+Revises: da9fc977f14f
+Create Date: 2026-10-17 02:26:40.545424
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '784f0cb084b0'
+down_revision = 'da9fc977f14f'
+branch_labels = None
+depends_on = None
+
+PARTIAL_INDEX_DIALECTS = ('postgresql', 'sqlite')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.create_index('ix_audit_logs_user_created', 'audit_logs', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_audit_logs_table_record', 'audit_logs', ['table_name', 'record_id'], unique=False)
+
+    if dialect in PARTIAL_INDEX_DIALECTS:
+        active = sa.text('is_active = true') if dialect == 'postgresql' else sa.text('is_active = 1')
+        op.create_index(
+            'ix_subscriptions_active_user_next_payment', 'subscriptions',
+            ['user_id', 'next_payment_date', 'id'], unique=False,
+            postgresql_where=active, sqlite_where=active
+        )
+        op.create_index('ix_subscriptions_user_id', 'subscriptions', ['user_id'], unique=False)
+    else:
+        op.create_index(
+            'ix_subscriptions_user_active_next_payment', 'subscriptions',
+            ['user_id', 'is_active', 'next_payment_date', 'id'], unique=False
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect in PARTIAL_INDEX_DIALECTS:
+        op.drop_index('ix_subscriptions_user_id', table_name='subscriptions')
+        op.drop_index('ix_subscriptions_active_user_next_payment', table_name='subscriptions')
+    else:
+        op.drop_index('ix_subscriptions_user_active_next_payment', table_name='subscriptions')
+
+    op.drop_index('ix_audit_logs_table_record', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_user_created', table_name='audit_logs')
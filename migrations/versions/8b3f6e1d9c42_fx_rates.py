@@ -0,0 +1,35 @@
+"""fx rates and reporting currency
+
+Revision ID: 8b3f6e1d9c42
+Revises: 5d8a2c7f4e19
+Create Date: 2026-10-17 10:02:18.734561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3f6e1d9c42'
+down_revision = '5d8a2c7f4e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('fx_rates',
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('rate', sa.Numeric(precision=20, scale=10), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('currency')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reporting_currency', sa.String(length=3), server_default='RUB', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('reporting_currency')
+
+    op.drop_table('fx_rates')
@@ -0,0 +1,56 @@
+"""64-bit user, subscription and audit ids; shard id counters
+
+Revision ID: 9c4d2a7e5b18
+Revises: 2e7c9a5b1f63
+Create Date: 2026-10-17 14:21:07.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2a7e5b18'
+down_revision = '2e7c9a5b1f63'
+branch_labels = None
+depends_on = None
+
+# В SQLite INTEGER уже 64-битный: типы меняются только в PostgreSQL
+ID_COLUMNS = [
+    ('users', 'id'),
+    ('subscriptions', 'id'),
+    ('subscriptions', 'user_id'),
+    ('audit_logs', 'id'),
+    ('audit_logs', 'user_id'),
+    ('audit_logs', 'record_id'),
+    ('audit_segments', 'user_id'),
+    ('audit_segments', 'min_id'),
+    ('audit_segments', 'max_id'),
+    ('spend_rollups', 'user_id'),
+    ('reminder_outbox', 'subscription_id'),
+    ('reminder_outbox', 'user_id'),
+    ('billing_claims', 'subscription_id'),
+    ('idempotency_keys', 'user_id'),
+]
+
+
+def upgrade():
+    op.create_table('shard_sequences',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, column in ID_COLUMNS:
+            op.alter_column(table, column, type_=sa.BigInteger(), existing_type=sa.Integer())
+        for table in ('users', 'subscriptions', 'audit_logs'):
+            op.execute(f'ALTER SEQUENCE {table}_id_seq AS bigint')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in ('users', 'subscriptions', 'audit_logs'):
+            op.execute(f'ALTER SEQUENCE {table}_id_seq AS integer')
+        for table, column in reversed(ID_COLUMNS):
+            op.alter_column(table, column, type_=sa.Integer(), existing_type=sa.BigInteger())
+    op.drop_table('shard_sequences')
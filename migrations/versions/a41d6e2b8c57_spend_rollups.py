@@ -0,0 +1,64 @@
+"""spend rollups
+
+Revision ID: a41d6e2b8c57
+Revises: 3b7e1c9a4f20
+Create Date: 2026-10-17 03:42:51.006217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d6e2b8c57'
+down_revision = '3b7e1c9a4f20'
+branch_labels = None
+depends_on = None
+
+periodicity = sa.Enum('DAILY', 'WEEKLY', 'MONTHLY', 'QUARTERLY', 'YEARLY', name='periodicity', create_type=False)
+
+
+def upgrade():
+    op.create_table('spend_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Integer(), nullable=False),
+    sa.Column('periodicity', periodicity, nullable=False),
+    sa.Column('subscription_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'period', 'periodicity')
+    )
+
+    # Заполнение агрегатов по существующим активным подпискам
+    subscriptions = sa.table('subscriptions',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('amount', sa.Float),
+        sa.column('periodicity', periodicity),
+        sa.column('start_date', sa.Date),
+        sa.column('is_active', sa.Boolean)
+    )
+    period = sa.cast(
+        sa.extract('year', subscriptions.c.start_date) * 100 + sa.extract('month', subscriptions.c.start_date),
+        sa.Integer
+    )
+    op.execute(
+        sa.table('spend_rollups',
+            sa.column('user_id'), sa.column('period'), sa.column('periodicity'),
+            sa.column('subscription_count'), sa.column('total_amount')
+        ).insert().from_select(
+            ['user_id', 'period', 'periodicity', 'subscription_count', 'total_amount'],
+            sa.select(
+                subscriptions.c.user_id,
+                period,
+                subscriptions.c.periodicity,
+                sa.func.count(subscriptions.c.id),
+                sa.func.sum(subscriptions.c.amount)
+            ).where(subscriptions.c.is_active == sa.true())
+            .group_by(subscriptions.c.user_id, period, subscriptions.c.periodicity)
+        )
+    )
+
+
+def downgrade():
+    op.drop_table('spend_rollups')
@@ -0,0 +1,26 @@
+"""user data version
+
+Revision ID: c2f84d19e6a3
+Revises: a41d6e2b8c57
+Create Date: 2026-10-17 04:05:37.771920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f84d19e6a3'
+down_revision = 'a41d6e2b8c57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
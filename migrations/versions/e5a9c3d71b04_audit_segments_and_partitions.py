@@ -0,0 +1,121 @@
+"""audit segments and monthly audit partitions
+
+Revision ID: e5a9c3d71b04
+Revises: c2f84d19e6a3
+Create Date: 2026-10-17 06:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3d71b04'
+down_revision = 'c2f84d19e6a3'
+branch_labels = None
+depends_on = None
+
+AUDIT_COLUMNS = 'id, user_id, action, table_name, record_id, old_values, new_values, created_at'
+
+
+def upgrade():
+    op.create_table('audit_segments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('min_id', sa.Integer(), nullable=False),
+    sa.Column('max_id', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('audit_segments', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_segments_user_month', ['user_id', 'month'], unique=False)
+
+    op.execute('UPDATE audit_logs SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+
+    if op.get_bind().dialect.name != 'postgresql':
+        with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        return
+
+    # PostgreSQL: audit_logs становится секционированной по месяцам created_at.
+    # Ключ секционирования должен входить в первичный ключ, поэтому PK - (id, created_at).
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_legacy')
+    op.execute('ALTER INDEX ix_audit_logs_user_created RENAME TO ix_audit_logs_legacy_user_created')
+    op.execute('ALTER INDEX ix_audit_logs_table_record RENAME TO ix_audit_logs_legacy_table_record')
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            action VARCHAR(50) NOT NULL,
+            table_name VARCHAR(50) NOT NULL,
+            record_id INTEGER NOT NULL,
+            old_values TEXT,
+            new_values TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    # Секции для месяцев с данными и на три месяца вперед
+    op.execute("""
+        DO $$
+        DECLARE
+            month DATE;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    COALESCE(date_trunc('month', (SELECT min(created_at) FROM audit_logs_legacy)),
+                             date_trunc('month', now())),
+                    date_trunc('month', now()) + interval '3 months',
+                    interval '1 month'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE audit_logs_y%sm%s PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                    to_char(month, 'YYYY'), to_char(month, 'MM'), month, month + interval '1 month'
+                );
+            END LOOP;
+        END $$
+    """)
+
+    op.execute(f'INSERT INTO audit_logs ({AUDIT_COLUMNS}) SELECT {AUDIT_COLUMNS} FROM audit_logs_legacy')
+    op.execute('DROP TABLE audit_logs_legacy')
+    op.create_index('ix_audit_logs_user_created', 'audit_logs', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_audit_logs_table_record', 'audit_logs', ['table_name', 'record_id'], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_partitioned')
+        op.execute('ALTER INDEX ix_audit_logs_user_created RENAME TO ix_audit_logs_partitioned_user_created')
+        op.execute('ALTER INDEX ix_audit_logs_table_record RENAME TO ix_audit_logs_partitioned_table_record')
+        op.execute("""
+            CREATE TABLE audit_logs (
+                id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq') PRIMARY KEY,
+                user_id INTEGER NOT NULL REFERENCES users (id),
+                action VARCHAR(50) NOT NULL,
+                table_name VARCHAR(50) NOT NULL,
+                record_id INTEGER NOT NULL,
+                old_values TEXT,
+                new_values TEXT,
+                created_at TIMESTAMP WITHOUT TIME ZONE
+            )
+        """)
+        op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+        op.execute(f'INSERT INTO audit_logs ({AUDIT_COLUMNS}) SELECT {AUDIT_COLUMNS} FROM audit_logs_partitioned')
+        op.execute('DROP TABLE audit_logs_partitioned CASCADE')
+        op.create_index('ix_audit_logs_user_created', 'audit_logs', ['user_id', 'created_at'], unique=False)
+        op.create_index('ix_audit_logs_table_record', 'audit_logs', ['table_name', 'record_id'], unique=False)
+    else:
+        with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+
+    with op.batch_alter_table('audit_segments', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_segments_user_month')
+
+    op.drop_table('audit_segments')
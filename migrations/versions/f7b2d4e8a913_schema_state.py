@@ -0,0 +1,29 @@
+"""schema state
+
+Revision ID: f7b2d4e8a913
+Revises: e5a9c3d71b04
+Create Date: 2026-10-17 07:20:15.604482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b2d4e8a913'
+down_revision = 'e5a9c3d71b04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('schema_state',
+    sa.Column('key', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.String(length=128), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('schema_state')
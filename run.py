@@ -3,4 +3,5 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Сервер разработки; в продакшене: gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(debug=app.config.get('DEBUG', False), host='0.0.0.0', port=5000)
\ No newline at end of file
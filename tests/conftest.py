@@ -0,0 +1,41 @@
+import pytest
+from app import create_app, db
+
+def subscription_payload(**overrides):
+    """Тело запроса создания подписки (общие значения по умолчанию для тестов)"""
+    payload = {
+        'name': 'Netflix',
+        'amount': '9.99',
+        'periodicity': 'monthly',
+        'start_date': '2030-01-15'
+    }
+    payload.update(overrides)
+    return payload
+
+@pytest.fixture
+def app_config():
+    """Дополнительные настройки приложения; тестовые модули переопределяют эту фикстуру"""
+    return {}
+
+@pytest.fixture
+def app(app_config):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test-secret-key',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        **app_config
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post('/api/auth/register', json={
+        'email': 'user@example.com',
+        'username': 'user'
+    })
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
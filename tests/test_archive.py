@@ -0,0 +1,56 @@
+import json
+from datetime import datetime, timedelta
+from conftest import subscription_payload
+from app import db
+from app.archive import archive_subscriptions
+from app.database import get_user_subscriptions
+from app.models import Subscription, ArchivedSubscription
+from app.rollup import check_rollups
+
+def create_and_delete(client, auth_headers):
+    kept = client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(start_date='2030-02-01'))
+    deleted = client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(name='Spotify'))
+    subscription_id = deleted.get_json()['subscription']['id']
+    client.delete(f'/api/subscriptions/{subscription_id}', headers=auth_headers)
+    return kept.get_json()['subscription']['id'], subscription_id
+
+def test_archive_moves_old_deleted_subscriptions(client, auth_headers):
+    kept_id, deleted_id = create_and_delete(client, auth_headers)
+
+    # Удалена только что - остается в горячей таблице
+    assert archive_subscriptions(older_than_days=90) == []
+    stats = archive_subscriptions(older_than_days=90, now=datetime.utcnow() + timedelta(days=91))
+    assert [chunk['rows'] for chunk in stats] == [1]
+
+    assert db.session.get(Subscription, deleted_id) is None
+    assert db.session.get(ArchivedSubscription, deleted_id).name == 'Spotify'
+    listed = client.get('/api/subscriptions', headers=auth_headers).get_json()['subscriptions']
+    assert [item['id'] for item in listed] == [kept_id]
+
+    # Полная история и выгрузка включают архив
+    user_id = db.session.get(Subscription, kept_id).user_id
+    subscriptions = get_user_subscriptions(user_id, active_only=False)
+    assert [(s.id, s.is_active) for s in subscriptions] == [(deleted_id, False), (kept_id, True)]
+    exported = client.get('/api/export/subscriptions', headers=auth_headers).get_data(as_text=True)
+    rows = [json.loads(line) for line in exported.splitlines()]
+    assert [(row['id'], row['is_active'], row['amount']) for row in rows] == [(kept_id, True, '9.99'), (deleted_id, False, '9.99')]
+
+def test_restore_from_archive_and_hot_table(client, auth_headers):
+    kept_id, deleted_id = create_and_delete(client, auth_headers)
+    archive_subscriptions(older_than_days=90, now=datetime.utcnow() + timedelta(days=91))
+
+    restored = client.post(f'/api/subscriptions/{deleted_id}/restore', headers=auth_headers)
+    assert restored.status_code == 200
+    assert restored.get_json()['subscription']['id'] == deleted_id
+    assert ArchivedSubscription.query.count() == 0
+    listed = client.get('/api/subscriptions', headers=auth_headers).get_json()['subscriptions']
+    assert sorted(item['id'] for item in listed) == sorted([kept_id, deleted_id])
+    assert check_rollups() == []
+
+    # Еще не перенесенная в архив подписка восстанавливается на месте
+    client.delete(f'/api/subscriptions/{kept_id}', headers=auth_headers)
+    assert client.post(f'/api/subscriptions/{kept_id}/restore', headers=auth_headers).status_code == 200
+    assert db.session.get(Subscription, kept_id).is_active is True
+    assert check_rollups() == []
+
+    assert client.post('/api/subscriptions/999/restore', headers=auth_headers).status_code == 404
@@ -0,0 +1,73 @@
+import pytest
+from conftest import subscription_payload
+from app import db
+from app.audit import audit_sink
+from app.models import AuditLog
+
+AUDIT_ROW = {'user_id': 1, 'action': 'CREATE', 'table_name': 'subscriptions', 'record_id': 1}
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'audit.db'}",
+        'AUDIT_WRITE_MODE': 'async',
+        'AUDIT_FLUSH_INTERVAL': 60
+    }
+
+@pytest.fixture(autouse=True)
+def stop_audit_sink(app):
+    yield
+    audit_sink.shutdown()
+
+def test_async_sink_queues_until_flush(client, auth_headers):
+    response = client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload())
+    
+    assert response.status_code == 201
+    assert audit_sink.queue_depth() == 1
+    assert audit_sink.flush() == 1
+    assert AuditLog.query.count() == 1
+    assert audit_sink.stats()['flush_count'] == 1
+
+def test_rolled_back_records_are_discarded(app):
+    db.session.execute(db.text('SELECT 1'))
+    db.session.info['pending_audit'] = [{'user_id': 1}]
+    db.session.rollback()
+    
+    assert 'pending_audit' not in db.session.info
+    assert audit_sink.queue_depth() == 0
+
+def test_batch_is_dropped_after_max_attempts(app, caplog):
+    audit_sink.max_attempts = 2
+    before = audit_sink.stats()
+    AuditLog.__table__.drop(db.engine)
+    audit_sink.enqueue([AUDIT_ROW])
+    
+    # Первая неудача оставляет пачку для повтора, вторая - отбрасывает ее
+    assert audit_sink.flush() == 0
+    assert audit_sink.queue_depth() == 1
+    assert audit_sink.flush() == 0
+    assert audit_sink.queue_depth() == 0
+    
+    stats = audit_sink.stats()
+    assert stats['flush_errors'] - before['flush_errors'] == 2
+    assert stats['dropped_total'] - before['dropped_total'] == 1
+    assert any('Dropping 1 audit records' in record.getMessage() for record in caplog.records)
+    AuditLog.__table__.create(db.engine)
+
+def test_shutdown_logs_records_it_could_not_write(app, caplog):
+    audit_sink.max_attempts = 2
+    before = audit_sink.stats()
+    AuditLog.__table__.drop(db.engine)
+    audit_sink.enqueue([AUDIT_ROW, dict(AUDIT_ROW, record_id=2)])
+    # Пачки по одной записи; фоновый поток при этом не будится
+    audit_sink.flush_size = 1
+    
+    # Первая пачка повторяется до max_attempts, остаток очереди уходит в лог
+    audit_sink.shutdown()
+    
+    assert audit_sink.queue_depth() == 0
+    assert audit_sink.stats()['dropped_total'] - before['dropped_total'] == 2
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('Dropping 1 audit records after 2 attempts') for message in messages)
+    assert any(message.startswith('Dropping 1 audit records at shutdown') for message in messages)
+    AuditLog.__table__.create(db.engine)
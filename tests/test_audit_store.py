@@ -0,0 +1,42 @@
+from datetime import date, datetime
+from app import db
+from app.audit_store import compact_audit_log
+from app.models import AuditLog, AuditSegment, User
+
+def add_audit(user_id, created_at, record_id):
+    db.session.add(AuditLog(
+        user_id=user_id, action='UPDATE', table_name='subscriptions',
+        record_id=record_id, created_at=created_at
+    ))
+
+def test_audit_query_spans_hot_table_and_segments(client, auth_headers):
+    user = User.query.filter_by(email='user@example.com').first()
+    for month in range(1, 7):
+        add_audit(user.id, datetime(2030, month, 10), record_id=month)
+    db.session.commit()
+    
+    stats = compact_audit_log(keep_months=3, today=date(2030, 6, 15))
+    
+    assert [item['month'] for item in stats] == [203001, 203002]
+    assert AuditLog.query.count() == 4
+    assert AuditSegment.query.count() == 2
+    
+    record_ids = []
+    cursor = None
+    while True:
+        query = {'limit': 4, 'table': 'subscriptions'}
+        if cursor:
+            query['cursor'] = cursor
+        body = client.get('/api/audit', headers=auth_headers, query_string=query).get_json()
+        record_ids.extend(entry['record_id'] for entry in body['audit_log'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    
+    assert record_ids == [6, 5, 4, 3, 2, 1]
+    
+    filtered = client.get('/api/audit', headers=auth_headers, query_string={'record_id': 1}).get_json()
+    assert [entry['record_id'] for entry in filtered['audit_log']] == [1]
+    
+    exported = client.get('/api/export/audit', headers=auth_headers).get_data(as_text=True)
+    assert len(exported.splitlines()) == 6
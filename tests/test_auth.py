@@ -0,0 +1,31 @@
+from app import db
+from app.auth import principal_cache, token_cache, principal_cache_stats
+from app.models import User
+
+def test_principal_cache_skips_user_lookup(client, auth_headers):
+    client.get('/api/subscriptions', headers=auth_headers)
+    client.get('/api/subscriptions', headers=auth_headers)
+    
+    stats = principal_cache_stats()
+    assert stats['tokens']['hits'] >= 1
+    assert stats['principals']['hits'] >= 1
+
+def test_principal_cache_invalidated_on_user_change(client, auth_headers):
+    client.get('/api/subscriptions', headers=auth_headers)
+    user = User.query.filter_by(email='user@example.com').first()
+    assert principal_cache.get(user.id) is not None
+    
+    user.username = 'renamed'
+    db.session.commit()
+    
+    assert principal_cache.get(user.id) is None
+    assert len(token_cache) == 0
+
+def test_principal_cache_can_be_disabled(app, client, auth_headers):
+    app.config['PRINCIPAL_CACHE_ENABLED'] = False
+    principal_cache.clear()
+    
+    response = client.get('/api/subscriptions', headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert len(principal_cache) == 0
@@ -0,0 +1,38 @@
+from datetime import date
+from app import db
+from app.billing import advance_due_subscriptions
+from app.models import AuditLog, BillingClaim, Periodicity, Subscription, User
+
+def add_subscription(user, periodicity, next_payment_date, start_date=None):
+    subscription = Subscription(
+        user_id=user.id,
+        name=periodicity.value,
+        amount_minor=1000,
+        periodicity=periodicity,
+        start_date=start_date or next_payment_date,
+        next_payment_date=next_payment_date,
+        is_active=True
+    )
+    db.session.add(subscription)
+    return subscription
+
+def test_advance_due_subscriptions_is_idempotent(app):
+    user = User(username='user', email='user@example.com')
+    db.session.add(user)
+    db.session.flush()
+    monthly = add_subscription(user, Periodicity.MONTHLY, date(2024, 1, 31))
+    weekly = add_subscription(user, Periodicity.WEEKLY, date(2024, 2, 20))
+    future = add_subscription(user, Periodicity.YEARLY, date(2024, 6, 1))
+    db.session.commit()
+    
+    stats = advance_due_subscriptions(as_of=date(2024, 3, 1), chunk_size=1)
+    
+    assert [chunk['rows'] for chunk in stats] == [1, 1]
+    db.session.expire_all()
+    assert monthly.next_payment_date == date(2024, 3, 31)
+    assert weekly.next_payment_date == date(2024, 3, 5)
+    assert future.next_payment_date == date(2024, 6, 1)
+    assert AuditLog.query.filter_by(action='UPDATE_NEXT_PAYMENT').count() == 2
+    assert BillingClaim.query.count() == 0
+    
+    assert advance_due_subscriptions(as_of=date(2024, 3, 1)) == []
@@ -0,0 +1,34 @@
+from datetime import date
+from sqlalchemy import select
+from app import db
+from app.models import Periodicity, Subscription
+from app.rollup import check_rollups
+from benchmarks.dataset import generate_dataset, next_on_or_after
+
+def snapshot():
+    return db.session.execute(
+        select(Subscription.name, Subscription.amount_minor, Subscription.periodicity, Subscription.start_date)
+        .order_by(Subscription.id)
+    ).all()
+
+def test_dataset_is_deterministic_and_consistent(app):
+    today = date(2030, 6, 15)
+    stats = generate_dataset(users=5, subscriptions=4, audit=2, seed=7, today=today)
+    first = snapshot()
+    
+    assert stats['subscriptions'] == len(first)
+    assert stats['audit_logs'] == 2 * len(first)
+    assert check_rollups() == []
+    assert all(
+        row.next_payment_date >= today
+        for row in db.session.execute(select(Subscription.next_payment_date))
+    )
+    
+    db.drop_all()
+    db.create_all()
+    generate_dataset(users=5, subscriptions=4, audit=2, seed=7, today=today)
+    assert snapshot() == first
+
+def test_next_payment_respects_anchor_day():
+    assert next_on_or_after(date(2030, 1, 31), Periodicity.MONTHLY, date(2030, 3, 1)) == date(2030, 3, 31)
+    assert next_on_or_after(date(2030, 1, 1), Periodicity.WEEKLY, date(2030, 1, 9)) == date(2030, 1, 15)
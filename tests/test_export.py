@@ -0,0 +1,27 @@
+import csv
+import io
+import json
+
+def test_export_streams_ndjson_and_csv(client, auth_headers):
+    client.post('/api/subscriptions/bulk', headers=auth_headers, json={'subscriptions': [
+        {'name': f'Sub {i}', 'amount': '5', 'periodicity': 'monthly', 'start_date': '2030-01-01'}
+        for i in range(3)
+    ]})
+    
+    response = client.get('/api/export/subscriptions', headers=auth_headers)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.mimetype == 'application/x-ndjson'
+    assert [line['name'] for line in lines] == ['Sub 0', 'Sub 1', 'Sub 2']
+    
+    response = client.get('/api/export/audit', headers=auth_headers, query_string={'format': 'csv'})
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['action'] for row in rows] == ['CREATE'] * 3
+
+def test_export_filters_by_date_range(client, auth_headers):
+    client.post('/api/subscriptions', headers=auth_headers, json={
+        'name': 'Netflix', 'amount': '5', 'periodicity': 'monthly', 'start_date': '2030-01-01'
+    })
+    
+    response = client.get('/api/export/subscriptions', headers=auth_headers, query_string={'to': '2000-01-01'})
+    
+    assert response.get_data(as_text=True) == ''
@@ -0,0 +1,47 @@
+from decimal import Decimal
+from conftest import subscription_payload
+from app.fx import FxTable
+
+ADMIN = {'X-Admin-Token': 'admin-secret'}
+
+def test_conversion_uses_one_factor_per_currency():
+    table = FxTable(1, {'USD': Decimal('90'), 'JPY': Decimal('0.6')})
+    
+    assert table.convert_amounts(['USD', 'JPY', 'RUB', 'EUR'], [150, 1000, 4500, 100], 'USD') == [
+        Decimal('1.50'), Decimal('6.67'), Decimal('0.50'), None
+    ]
+    assert table.convert_totals([{'USD': Decimal('1.00'), 'RUB': Decimal('10.00')}, {'EUR': Decimal('1.00')}, {}], 'RUB') == [
+        Decimal('100.00'), None, Decimal('0.00')
+    ]
+
+def test_totals_follow_reporting_currency_and_rates(app, client, auth_headers):
+    app.config['ADMIN_TOKEN'] = 'admin-secret'
+    client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(amount='10'))
+    client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(amount='2', currency='USD'))
+    
+    body = client.get('/api/subscriptions/upcoming', headers=auth_headers, query_string={'days': 3650}).get_json()
+    assert body['reporting'] == {'currency': 'RUB', 'rates_version': 0, 'missing_rates': ['USD'], 'total_amount': None}
+    
+    response = client.put('/api/admin/fx-rates', headers=ADMIN, json={'base': 'RUB', 'rates': {'USD': '90'}})
+    assert response.get_json()['version'] == 1
+    
+    first = client.get('/api/subscriptions/upcoming', headers=auth_headers, query_string={'days': 3650})
+    assert first.get_json()['reporting']['total_amount'] == '190.00'
+    assert [item['reporting_amount'] for item in first.get_json()['upcoming_payments']] == ['10.00', '180.00']
+    
+    client.put('/api/settings', headers=auth_headers, json={'reporting_currency': 'USD'})
+    # Старый ETag недействителен: валюта отчетов входит в ключ
+    second = client.get('/api/subscriptions/upcoming', query_string={'days': 3650},
+                        headers={**auth_headers, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_json()['reporting']['total_amount'] == '2.11'
+    
+    summary = client.get('/api/subscriptions/summary', headers=auth_headers, query_string={'year': 2030, 'month': 1}).get_json()
+    assert summary['by_periodicity']['monthly']['reporting_amount'] == '2.11'
+
+def test_rates_are_validated(app, client):
+    app.config['ADMIN_TOKEN'] = 'admin-secret'
+    
+    assert client.put('/api/admin/fx-rates', headers=ADMIN, json={'rates': {'XXX': '1'}}).status_code == 400
+    assert client.put('/api/admin/fx-rates', headers=ADMIN, json={'base': 'USD', 'rates': {'EUR': '1.1'}}).status_code == 400
+    assert client.put('/api/admin/fx-rates', headers=ADMIN, json={'rates': {'USD': '-1'}}).status_code == 400
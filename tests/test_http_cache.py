@@ -0,0 +1,40 @@
+from conftest import subscription_payload
+from app.http_cache import response_cache
+
+def test_conditional_get_returns_304_until_data_changes(client, auth_headers):
+    first = client.get('/api/subscriptions', headers=auth_headers)
+    etag = first.headers['ETag']
+    
+    repeat = client.get('/api/subscriptions', headers={**auth_headers, 'If-None-Match': etag})
+    assert repeat.status_code == 304
+    
+    client.post('/api/subscriptions', headers=auth_headers, json={
+        'name': 'Netflix', 'amount': '9.99', 'periodicity': 'monthly', 'start_date': '2030-01-15'
+    })
+    
+    changed = client.get('/api/subscriptions', headers={**auth_headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(changed.get_json()['subscriptions']) == 1
+
+def test_response_cache_serves_repeat_reads(app, client, auth_headers):
+    app.config['RESPONSE_CACHE_ENABLED'] = True
+    
+    first = client.get('/api/subscriptions/upcoming', headers=auth_headers)
+    second = client.get('/api/subscriptions/upcoming', headers=auth_headers)
+    
+    assert response_cache.hits == 1
+    assert second.get_data() == first.get_data()
+    assert second.headers['ETag'] == first.headers['ETag']
+
+def test_next_payment_update_invalidates_etag(client, auth_headers):
+    from app.database import update_subscription_next_payment
+    
+    created = client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload())
+    etag = client.get('/api/subscriptions', headers=auth_headers).headers['ETag']
+    
+    subscription, error = update_subscription_next_payment(created.get_json()['subscription']['id'])
+    assert error is None
+    
+    changed = client.get('/api/subscriptions', headers={**auth_headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
@@ -0,0 +1,76 @@
+import threading
+import time
+import pytest
+from conftest import subscription_payload
+from app import db
+from app import idempotency
+from app.idempotency import idempotency_cache, request_fingerprint
+from app.models import AuditLog, IdempotencyKey, Subscription, User
+
+@pytest.fixture
+def app_config(tmp_path):
+    # Файловая база: параллельный запрос в тесте работает через свое соединение
+    return {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'idempotency.db'}",
+        'IDEMPOTENCY_WAIT_TIMEOUT': 5
+    }
+
+def test_retry_returns_stored_response_without_side_effects(client, auth_headers):
+    headers = {**auth_headers, 'Idempotency-Key': 'create-1'}
+    
+    first = client.post('/api/subscriptions', headers=headers, json=subscription_payload())
+    idempotency_cache.clear()  # повтор из другого воркера: ответ берется из таблицы
+    second = client.post('/api/subscriptions', headers=headers, json=subscription_payload())
+    third = client.post('/api/subscriptions', headers=headers, json=subscription_payload())
+    
+    assert first.status_code == second.status_code == third.status_code == 201
+    assert second.get_json() == first.get_json()
+    assert third.headers['Idempotent-Replayed'] == 'true'
+    assert Subscription.query.count() == 1
+    assert AuditLog.query.count() == 1
+
+def test_key_reused_for_different_request_is_rejected(client, auth_headers):
+    headers = {**auth_headers, 'Idempotency-Key': 'create-2'}
+    client.post('/api/subscriptions', headers=headers, json=subscription_payload())
+    
+    response = client.post('/api/subscriptions', headers=headers, json=subscription_payload(amount='19.99'))
+    
+    assert response.status_code == 422
+    assert Subscription.query.count() == 1
+
+def test_concurrent_duplicate_waits_for_in_flight_request(app, client, auth_headers):
+    headers = {**auth_headers, 'Idempotency-Key': 'slow'}
+    user_id = User.query.one().id
+    
+    # Первый запрос "выполняется" в другом процессе
+    with app.test_request_context('/api/subscriptions', method='POST', json=subscription_payload()):
+        request_hash = request_fingerprint()
+    db.session.add(IdempotencyKey(user_id=user_id, key='slow', request_hash=request_hash))
+    db.session.commit()
+    
+    def finish():
+        time.sleep(0.3)
+        with app.app_context():
+            row = db.session.get(IdempotencyKey, (user_id, 'slow'))
+            row.status_code = 201
+            row.response_body = '{"subscription": {"id": 42}}'
+            db.session.commit()
+    
+    worker = threading.Thread(target=finish)
+    worker.start()
+    response = client.post('/api/subscriptions', headers=headers, json=subscription_payload())
+    worker.join()
+    
+    assert response.status_code == 201
+    assert response.get_json() == {'subscription': {'id': 42}}
+    assert Subscription.query.count() == 0
+
+def test_vanishing_row_does_not_spin_past_deadline(app, monkeypatch):
+    # Ключ занят, но строка каждый раз исчезает до чтения
+    monkeypatch.setattr(idempotency, '_claim', lambda *args: False)
+    monkeypatch.setattr(idempotency, '_load', lambda *args: None)
+    app.config['IDEMPOTENCY_WAIT_TIMEOUT'] = 0.2
+    
+    started = time.monotonic()
+    assert idempotency._acquire(1, 'gone', 'hash') == 'in_progress'
+    assert time.monotonic() - started >= 0.2
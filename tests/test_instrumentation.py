@@ -0,0 +1,86 @@
+import logging
+import threading
+import pytest
+from app import db
+
+@pytest.fixture
+def app_config(request, tmp_path):
+    return {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'SQL_INSTRUMENTATION_ENABLED': True,
+        'SQL_N_PLUS_ONE_THRESHOLD': 2,
+        'ADMIN_TOKEN': 'admin-secret',
+        # Дополнительные настройки теста: parametrize('app_config', ..., indirect=True)
+        **getattr(request, 'param', {})
+    }
+
+def test_server_timing_and_endpoint_histograms(client, auth_headers):
+    response = client.get('/api/subscriptions', headers=auth_headers)
+    
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('db;dur=')
+    assert 'pool;dur=' in timing and 'total;dur=' in timing
+    
+    assert client.get('/api/admin/metrics').status_code == 403
+    metrics = client.get('/api/admin/metrics', headers={'X-Admin-Token': 'admin-secret'}).get_json()
+    
+    listed = metrics['endpoints']['api.get_subscriptions']
+    assert listed['duration_ms']['count'] == 1
+    assert listed['queries']['count'] == 1
+    assert listed['queries']['avg'] >= 1
+
+def test_repeated_statement_is_reported(app, client, caplog):
+    from app.models import User
+    
+    @app.route('/n-plus-one')
+    def n_plus_one():
+        for user_id in range(5):
+            db.session.get(User, user_id + 100)
+        return 'ok'
+    
+    with caplog.at_level(logging.WARNING, logger='app.instrumentation'):
+        client.get('/n-plus-one')
+    
+    assert any('Possible N+1' in record.getMessage() for record in caplog.records)
+
+def test_failed_statement_and_new_connections_are_measured(app, client):
+    @app.route('/failing-query')
+    def failing_query():
+        # Новое соединение из пула после сброса и запрос с ошибкой
+        db.engine.dispose()
+        try:
+            db.session.execute(db.text('SELECT missing_column FROM users'))
+        except Exception:
+            db.session.rollback()
+        db.session.execute(db.text('SELECT 1'))
+        return 'ok'
+    
+    timing = client.get('/failing-query').headers['Server-Timing']
+    assert '"1 queries"' in timing
+    assert float(timing.split('pool;dur=')[1].split(',')[0]) > 0
+
+@pytest.mark.parametrize('app_config', [
+    {'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 5}}
+], indirect=True)
+def test_pool_wait_is_measured_when_pool_is_exhausted(app, client):
+    @app.route('/pool-wait')
+    def pool_wait():
+        db.session.execute(db.text('SELECT 1'))
+        return 'ok'
+    
+    # Единственное соединение пула занято другим потоком на 0.2 с
+    engine = db.engine
+    checked_out = threading.Event()
+    
+    def hold_connection():
+        with engine.connect():
+            checked_out.set()
+            threading.Event().wait(0.2)
+    
+    worker = threading.Thread(target=hold_connection)
+    worker.start()
+    checked_out.wait()
+    timing = client.get('/pool-wait').headers['Server-Timing']
+    worker.join()
+    
+    assert float(timing.split('pool;dur=')[1].split(',')[0]) >= 150
@@ -0,0 +1,46 @@
+from decimal import Decimal
+from conftest import subscription_payload
+from app.money import parse_amount, to_minor, from_minor, currency_totals
+
+def test_minor_units_round_trip():
+    assert to_minor(Decimal('9.99'), 'RUB') == 999
+    assert to_minor(Decimal('1500'), 'JPY') == 1500
+    assert from_minor(1234, 'KWD') == Decimal('1.234')
+    assert parse_amount('10.500', 'RUB') == (Decimal('10.500'), None)
+    assert parse_amount('10.5', 'JPY')[1] == 'Amount has too many decimal places for JPY'
+    assert currency_totals([('USD', 5), ('RUB', 10), ('USD', 7)]) == {'RUB': Decimal('0.10'), 'USD': Decimal('0.12')}
+
+def test_totals_are_exact(client, auth_headers):
+    client.post('/api/subscriptions/bulk', headers=auth_headers, json={
+        'subscriptions': [subscription_payload(name=f'Sub {i}', amount='0.10') for i in range(3)]
+    })
+    
+    body = client.get('/api/subscriptions/upcoming', headers=auth_headers, query_string={'days': 3650}).get_json()
+    assert body['total_amount'] == '0.30'
+    assert body['upcoming_payments'][0]['amount'] == '0.10'
+
+def test_mixed_currencies_have_no_single_total(client, auth_headers):
+    client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(amount='0.10'))
+    client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(amount='500', currency='JPY'))
+    rejected = client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(currency='XXX'))
+    
+    body = client.get('/api/subscriptions/upcoming', headers=auth_headers, query_string={'days': 3650}).get_json()
+    assert rejected.status_code == 400
+    assert body['total_amount'] is None
+    assert body['totals'] == {'JPY': '500', 'RUB': '0.10'}
+
+def test_forecast_sums_exactly_per_currency(client, auth_headers):
+    client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(amount='0.10', start_date='2031-01-15'))
+    client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(
+        amount='0.20', periodicity='weekly', start_date='2031-01-01'
+    ))
+    
+    body = client.get('/api/subscriptions/forecast', headers=auth_headers, query_string={'months': 60}).get_json()
+    january = next(month for month in body['months'] if month['month'] == '2031-01')
+    assert january['payments_count'] == 6
+    assert january['total_amount'] == '1.10'
+    
+    expanded = client.get('/api/subscriptions/upcoming', headers=auth_headers,
+                          query_string={'days': 3650, 'expand': 'true', 'limit': 1}).get_json()
+    assert expanded['totals'] == {'RUB': expanded['total_amount']}
+    assert expanded['upcoming_payments'][0]['currency'] == 'RUB'
@@ -0,0 +1,21 @@
+import os
+import pytest
+from app import create_app, db
+from app.explain import collect_plans
+
+DATABASE_URLS = ['sqlite://']
+if os.environ.get('DATABASE_URL', '').startswith('postgresql'):
+    DATABASE_URLS.append(os.environ['DATABASE_URL'])
+
+@pytest.mark.parametrize('database_url', DATABASE_URLS)
+def test_hot_queries_use_indexes(database_url):
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': database_url})
+    with app.app_context():
+        db.create_all()
+        try:
+            plans = collect_plans()
+        finally:
+            db.session.remove()
+            db.drop_all()
+    
+    assert {name: info['sequential_scans'] for name, info in plans.items() if info['sequential_scans']} == {}
@@ -0,0 +1,46 @@
+import pytest
+from app.ratelimit import SQLiteBackend
+
+@pytest.fixture
+def app_config():
+    return {
+        'RATE_LIMIT_ENABLED': True,
+        'RATE_LIMIT_BACKEND': 'memory',
+        'RATE_LIMITS': {'api.register': (2, 60), 'api.create_subscription': (1, 60)}
+    }
+
+def test_auth_endpoints_limited_by_ip(client):
+    statuses = [
+        client.post('/api/auth/register', json={'email': f'u{i}@example.com', 'username': f'user{i}'}).status_code
+        for i in range(3)
+    ]
+    
+    assert statuses == [201, 201, 429]
+
+def test_limit_is_per_user_with_retry_after(client):
+    tokens = [
+        client.post('/api/auth/register', json={'email': f'u{i}@example.com', 'username': f'user{i}'}).get_json()['token']
+        for i in range(2)
+    ]
+    payload = {'name': 'Netflix', 'amount': '9.99', 'periodicity': 'monthly', 'start_date': '2030-01-15'}
+    
+    first = client.post('/api/subscriptions', json=payload, headers={'Authorization': f'Bearer {tokens[0]}'})
+    limited = client.post('/api/subscriptions', json=payload, headers={'Authorization': f'Bearer {tokens[0]}'})
+    other = client.post('/api/subscriptions', json=payload, headers={'Authorization': f'Bearer {tokens[1]}'})
+    
+    assert first.status_code == 201
+    assert limited.status_code == 429
+    assert 1 <= int(limited.headers['Retry-After']) <= 60
+    assert other.status_code == 201
+
+def test_sqlite_backend_shares_buckets_between_instances(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = SQLiteBackend(path), SQLiteBackend(path)
+    
+    assert first.consume('key', rate=1.0, capacity=2, now=100.0)[0]
+    assert second.consume('key', rate=1.0, capacity=2, now=100.0)[0]
+    allowed, _, retry_after = first.consume('key', rate=1.0, capacity=2, now=100.5)
+    
+    assert not allowed
+    assert retry_after == pytest.approx(0.5)
+    assert second.consume('key', rate=1.0, capacity=2, now=101.5)[0]
@@ -0,0 +1,72 @@
+import json
+from datetime import date
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import ReminderOutbox, Subscription, User, Periodicity
+from app.reminders import schedule_reminders, dispatch_reminders, FileSender
+
+class FlakySender:
+    """Первая отправка каждого сообщения падает"""
+
+    def __init__(self):
+        self.seen = set()
+        self.delivered = []
+
+    def send(self, message):
+        if message['idempotency_key'] not in self.seen:
+            self.seen.add(message['idempotency_key'])
+            raise ConnectionError('temporary failure')
+        self.delivered.append(message)
+
+def seed(users=3, per_user=4):
+    db.session.execute(insert(User), [
+        {'username': f'u{i}', 'email': f'u{i}@example.com'} for i in range(users)
+    ])
+    db.session.execute(insert(Subscription), [{
+        'user_id': user_id,
+        'name': f'Sub {i}',
+        'amount_minor': 999,
+        'currency': 'RUB',
+        'periodicity': Periodicity.MONTHLY,
+        'start_date': date(2030, 1, 1),
+        # Платежи 10-13 января; 13 января за горизонтом
+        'next_payment_date': date(2030, 1, 10 + i),
+        'is_active': True
+    } for user_id in range(1, users + 1) for i in range(per_user)])
+    db.session.commit()
+
+def test_schedule_is_one_scan_and_deduplicated(app):
+    seed()
+    
+    first = schedule_reminders(days_ahead=2, as_of=date(2030, 1, 10), batch_size=4)
+    second = schedule_reminders(days_ahead=2, as_of=date(2030, 1, 10), batch_size=4)
+    
+    assert first['scanned'] == 9 and first['created'] == 9
+    assert second['created'] == 0
+    assert ReminderOutbox.query.count() == 9
+
+def test_dispatch_retries_and_delivers_once(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'reminders.db'}",
+        'REMINDER_RETRY_BACKOFF': 0,
+        'REMINDER_MAX_ATTEMPTS': 3
+    })
+    with app.app_context():
+        db.create_all()
+        seed()
+        schedule_reminders(days_ahead=2, as_of=date(2030, 1, 10))
+        
+        flaky = FlakySender()
+        stats = dispatch_reminders(workers=3, batch_size=2, sender=flaky)
+        assert stats['sent'] == 9 and stats['retried'] == 9 and stats['failed'] == 0
+        assert len({m['idempotency_key'] for m in flaky.delivered}) == 9
+        
+        output = tmp_path / 'out.ndjson'
+        db.session.execute(db.update(ReminderOutbox).values(status='pending'))
+        db.session.commit()
+        dispatch_reminders(workers=2, sender=FileSender(str(output)))
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert len(lines) == 9
+        assert lines[0]['amount'] == '9.99'
+        db.session.remove()
@@ -0,0 +1,108 @@
+import shutil
+import time
+import pytest
+from conftest import subscription_payload
+from datetime import date
+from sqlalchemy import func, select
+from app import create_app, db
+from app.models import Subscription, User, Periodicity
+from app.replicas import replica_router
+
+@pytest.fixture(autouse=True)
+def forget_replica_bind():
+    # db общий для приложений всех тестов: метаданные bind'а реплики не должны
+    # попасть в create_all()/drop_all() следующих тестов
+    yield
+    db.metadatas.pop('replica_0', None)
+
+def make_app(primary, replica):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'SQLALCHEMY_BINDS': {'replica_0': f'sqlite:///{replica}'},
+        'RATE_LIMIT_ENABLED': False,
+        'ADMIN_TOKEN': 'admin-secret'
+    })
+
+def test_get_reads_replica_and_writes_go_to_primary(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = make_app(primary, replica)
+    client = app.test_client()
+    with app.app_context():
+        db.create_all(bind_key=None)
+
+    token = client.post('/api/auth/register', json={'email': 'user@example.com', 'username': 'user'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    # "Репликация": копия основной базы до создания подписки
+    shutil.copy(primary, replica)
+
+    created = client.post('/api/subscriptions', json=subscription_payload(), headers=headers)
+    assert created.status_code == 201
+    subscription_id = created.get_json()['subscription']['id']
+
+    # Реплика отстает: GET ее еще не видит, изменение идет в основную базу
+    assert client.get('/api/subscriptions', headers=headers).get_json()['subscriptions'] == []
+    updated = client.put(f'/api/subscriptions/{subscription_id}', json={'name': 'Netflix HD'}, headers=headers)
+    assert updated.status_code == 200
+
+    shutil.copy(primary, replica)
+    names = [item['name'] for item in client.get('/api/subscriptions', headers=headers).get_json()['subscriptions']]
+    assert names == ['Netflix HD']
+
+def test_request_reads_primary_after_its_own_write(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = make_app(primary, replica)
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(User(username='user', email='user@example.com'))
+        db.session.commit()
+    shutil.copy(primary, replica)
+
+    with app.test_request_context('/api/subscriptions', method='GET'):
+        app.preprocess_request()
+        count = select(func.count()).select_from(Subscription)
+        assert db.session.get_bind() is db.engines['replica_0']
+        assert db.session.execute(count).scalar() == 0
+
+        db.session.add(Subscription(
+            user_id=1, name='Netflix', amount_minor=999, periodicity=Periodicity.MONTHLY,
+            start_date=date(2030, 1, 1), next_payment_date=date(2030, 1, 1)
+        ))
+        db.session.flush()
+
+        assert db.session.execute(count).scalar() == 1
+        assert db.session.get_bind() is db.engines[None]
+        db.session.rollback()
+
+def test_unavailable_replica_falls_back_to_primary(tmp_path):
+    app = make_app(tmp_path / 'primary.db', tmp_path / 'missing' / 'replica.db')
+    client = app.test_client()
+    with app.app_context():
+        db.create_all(bind_key=None)
+
+    token = client.post('/api/auth/register', json={'email': 'user@example.com', 'username': 'user'}).get_json()['token']
+    # Реплика считается проверенной: отказ обнаруживается при подключении в запросе
+    replica_router._checked_at['replica_0'] = time.monotonic()
+    response = client.get('/api/subscriptions', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert replica_router.status()['replica_0']['healthy'] is False
+    metrics = client.get('/api/admin/metrics', headers={'X-Admin-Token': 'admin-secret'}).get_json()
+    assert metrics['replicas']['replica_0']['healthy'] is False
+
+@pytest.mark.parametrize('principal_cache', [True, False])
+def test_new_user_is_found_on_primary_while_replica_lags(tmp_path, principal_cache):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = make_app(primary, replica)
+    app.config['PRINCIPAL_CACHE_ENABLED'] = principal_cache
+    client = app.test_client()
+    with app.app_context():
+        db.create_all(bind_key=None)
+    # Реплика получила схему, но еще не пользователя
+    shutil.copy(primary, replica)
+
+    token = client.post('/api/auth/register', json={'email': 'user@example.com', 'username': 'user'}).get_json()['token']
+    response = client.get('/api/subscriptions', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.get_json()['subscriptions'] == []
@@ -0,0 +1,35 @@
+from conftest import subscription_payload
+from app.rollup import check_rollups, rebuild_rollups
+from app.models import SpendRollup
+
+def test_rollup_follows_create_update_delete(client, auth_headers):
+    client.post('/api/subscriptions/bulk', headers=auth_headers, json={'subscriptions': [
+        subscription_payload(amount='10.50'),
+        subscription_payload(periodicity='yearly', amount='100', start_date='2030-03-01')
+    ]})
+    created = client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(start_date='2030-02-10'))
+    subscription_id = created.get_json()['subscription']['id']
+    client.put(f'/api/subscriptions/{subscription_id}', headers=auth_headers, json={'amount': '20', 'periodicity': 'weekly'})
+    
+    summary = client.get('/api/subscriptions/summary', headers=auth_headers,
+                         query_string={'year': 2030, 'month': 2}).get_json()
+    assert summary['total_subscriptions'] == 2
+    assert summary['total_monthly_amount'] == '30.50'
+    assert summary['totals'] == {'RUB': '30.50'}
+    assert summary['by_periodicity'] == {
+        'monthly': {'subscriptions': 1, 'amount': '10.50', 'totals': {'RUB': '10.50'}, 'reporting_amount': '10.50'},
+        'weekly': {'subscriptions': 1, 'amount': '20.00', 'totals': {'RUB': '20.00'}, 'reporting_amount': '20.00'}
+    }
+    
+    client.delete(f'/api/subscriptions/{subscription_id}', headers=auth_headers)
+    client.delete(f'/api/subscriptions/{subscription_id}', headers=auth_headers)
+    
+    assert check_rollups() == []
+
+def test_rebuild_restores_rollups(client, auth_headers):
+    client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload())
+    SpendRollup.query.delete()
+    
+    assert len(check_rollups()) == 1
+    assert rebuild_rollups() == 1
+    assert check_rollups() == []
@@ -0,0 +1,73 @@
+from conftest import subscription_payload
+from app.models import AuditLog, Subscription
+
+def test_bulk_create_inserts_batch_with_audit(client, auth_headers):
+    response = client.post('/api/subscriptions/bulk', headers=auth_headers, json={
+        'subscriptions': [subscription_payload(name=f'Sub {i}') for i in range(25)]
+    })
+    
+    assert response.status_code == 201
+    created = response.get_json()['created']
+    assert [item['index'] for item in created] == list(range(25))
+    assert Subscription.query.count() == 25
+    assert AuditLog.query.filter_by(action='CREATE').count() == 25
+
+def test_bulk_create_atomic_rejects_whole_batch(client, auth_headers):
+    response = client.post('/api/subscriptions/bulk', headers=auth_headers, json={
+        'subscriptions': [subscription_payload(), subscription_payload(amount='-1')]
+    })
+    
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'index': 1, 'errors': {'amount': 'Amount must be greater than 0'}}]
+    assert Subscription.query.count() == 0
+
+def test_bulk_create_partial_reports_item_errors(client, auth_headers):
+    response = client.post('/api/subscriptions/bulk', headers=auth_headers, json={
+        'mode': 'partial',
+        'subscriptions': [subscription_payload(), {'name': 'No amount'}, subscription_payload(name='Spotify')]
+    })
+    
+    body = response.get_json()
+    assert response.status_code == 207
+    assert [item['index'] for item in body['created']] == [0, 2]
+    assert body['errors'][0]['index'] == 1
+    assert Subscription.query.count() == 2
+
+def test_subscriptions_are_paginated_by_cursor(client, auth_headers):
+    client.post('/api/subscriptions/bulk', headers=auth_headers, json={
+        'subscriptions': [subscription_payload(name=f'Sub {i}', start_date=f'2030-01-{i + 1:02d}') for i in range(5)]
+    })
+    
+    names = []
+    cursor = None
+    while True:
+        query = {'limit': 2}
+        if cursor:
+            query['cursor'] = cursor
+        body = client.get('/api/subscriptions', headers=auth_headers, query_string=query).get_json()
+        names.extend(sub['name'] for sub in body['subscriptions'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    
+    assert names == [f'Sub {i}' for i in range(5)]
+
+def test_invalid_cursor_is_rejected(client, auth_headers):
+    response = client.get('/api/subscriptions', headers=auth_headers, query_string={'cursor': 'garbage'})
+    
+    assert response.status_code == 400
+
+def test_forecast_groups_payments_by_month(client, auth_headers):
+    from datetime import date
+    from app.schedule import add_period
+    # Первый платеж - 1-го числа следующего месяца: в текущем месяце платежей нет в любой день
+    start = add_period(date.today().replace(day=1), 'monthly')
+    client.post('/api/subscriptions', headers=auth_headers, json=subscription_payload(
+        amount='10', periodicity='monthly', start_date=start.isoformat()
+    ))
+    
+    response = client.get('/api/subscriptions/forecast', headers=auth_headers, query_string={'months': 3})
+    
+    months = response.get_json()['months']
+    assert response.status_code == 200
+    assert [m['payments_count'] for m in months] == [0, 1, 1]
@@ -0,0 +1,32 @@
+import random
+from datetime import date
+from app.schedule import add_period, expand_schedule
+
+def test_add_period_keeps_anchor_day_across_short_months():
+    assert add_period(date(2024, 1, 31), 'monthly', anchor_day=31) == date(2024, 2, 29)
+    assert add_period(date(2024, 2, 29), 'monthly', anchor_day=31) == date(2024, 3, 31)
+    assert add_period(date(2023, 1, 31), 'monthly', anchor_day=31) == date(2023, 2, 28)
+    assert add_period(date(2024, 11, 30), 'quarterly', anchor_day=30) == date(2025, 2, 28)
+    assert add_period(date(2024, 2, 29), 'yearly', anchor_day=29) == date(2025, 2, 28)
+
+def test_expand_schedule_matches_scalar_iteration():
+    rng = random.Random(42)
+    periodicities = ['daily', 'weekly', 'monthly', 'quarterly', 'yearly']
+    subs = []
+    for _ in range(300):
+        next_date = date(2024, rng.randint(1, 12), rng.randint(1, 28))
+        subs.append((next_date, rng.choice([28, 29, 30, 31, next_date.day]), rng.choice(periodicities)))
+    start, end = date(2024, 6, 1), date(2025, 6, 30)
+    
+    expected = []
+    for i, (next_date, anchor, periodicity) in enumerate(subs):
+        current = next_date
+        while current <= end:
+            if current >= start:
+                expected.append((current, i))
+            current = add_period(current, periodicity, anchor_day=anchor)
+    
+    schedule = expand_schedule(*zip(*subs), start, end)
+    actual = [(d.item(), i) for i, d in zip(schedule.index.tolist(), schedule.dates)]
+    
+    assert actual == sorted(expected)
@@ -0,0 +1,52 @@
+from datetime import date
+from decimal import Decimal
+from app.models import Periodicity
+from app.schemas import SUBSCRIPTION_SCHEMA, SUBSCRIPTION_UPDATE_SCHEMA, USER_SCHEMA
+
+def payload(**overrides):
+    data = {'name': ' <b>Netflix</b> ', 'amount': '9.99', 'periodicity': 'monthly', 'start_date': '2030-01-15'}
+    data.update(overrides)
+    return data
+
+def test_returns_parsed_values():
+    values, errors = SUBSCRIPTION_SCHEMA.validate(payload(amount=12))
+    
+    assert errors == {}
+    assert values == {
+        'name': '&lt;b&gt;Netflix&lt;/b&gt;',
+        'amount': Decimal(12),
+        'currency': 'RUB',
+        'periodicity': Periodicity.MONTHLY,
+        'start_date': date(2030, 1, 15)
+    }
+
+def test_batch_reports_errors_by_index():
+    items = [payload(), payload(amount='1.5', currency='JPY'), 'oops', {'name': ''}, payload(start_date='2030-1-5')]
+    accepted, errors = SUBSCRIPTION_SCHEMA.validate_many(items * 1000)
+    
+    assert len(accepted) == 1000
+    assert errors[:4] == [
+        {'index': 1, 'errors': {'amount': 'Amount has too many decimal places for JPY'}},
+        {'index': 2, 'errors': {'item': 'Subscription must be an object'}},
+        {'index': 3, 'errors': {
+            'name': 'name is required', 'amount': 'amount is required',
+            'periodicity': 'periodicity is required', 'start_date': 'start_date is required'
+        }},
+        {'index': 4, 'errors': {'start_date': 'Invalid date format. Use YYYY-MM-DD'}},
+    ]
+
+def test_update_schema_is_partial_but_rejects_blank_required_fields():
+    assert SUBSCRIPTION_UPDATE_SCHEMA.validate({'amount': '5'}) == ({'amount': Decimal(5)}, {})
+    assert SUBSCRIPTION_UPDATE_SCHEMA.validate({'name': '  '})[1] == {'name': 'Name is required'}
+    assert SUBSCRIPTION_UPDATE_SCHEMA.validate({'next_payment_date': '2000-01-01'})[1] == {
+        'next_payment_date': 'Next payment date cannot be in the past'
+    }
+
+def test_register_validates_user(client):
+    response = client.post('/api/auth/register', json={'email': 'not-an-email', 'username': 'ab'})
+    
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == {
+        'email': 'Invalid email format',
+        'username': 'Username must be at least 3 characters'
+    }
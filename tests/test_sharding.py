@@ -0,0 +1,153 @@
+import pytest
+from conftest import subscription_payload
+from sqlalchemy import select
+from app import create_app, db
+from app.models import User, Subscription, AuditLog, FxRate
+from app.sharding import (
+    shard_map, shard_engine, init_id_sequences, plan_rebalance, move_buckets, SHARD_ID_STRIDE
+)
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'shard0.db'}",
+        'SQLALCHEMY_BINDS': {'shard_1': f"sqlite:///{tmp_path / 'shard1.db'}"},
+        'SHARD_BUCKETS': 8,
+        'SHARD_MAP_FILE': str(tmp_path / 'shard_map.json'),
+        'SHARD_MAP_RELOAD': 0,
+        'RATE_LIMIT_ENABLED': False,
+        'ADMIN_TOKEN': 'admin-secret'
+    })
+    with app.app_context():
+        for shard in range(2):
+            db.metadata.create_all(shard_engine(shard))
+        init_id_sequences()
+        # Новая установка: пустые бакеты распределяются между шардами сразу
+        move_buckets(plan_rebalance(), wait=0)
+    yield app
+    # db общий для приложений всех тестов: метаданные bind'а шарда не должны
+    # попасть в create_all()/drop_all() следующих тестов
+    db.metadatas.pop('shard_1', None)
+
+def email_on_shard(shard, prefix):
+    for i in range(100):
+        email = f'{prefix}{i}@example.com'
+        if shard_map.assignment[shard_map.bucket_for_email(email)] == shard:
+            return email
+
+def register(client, email, username):
+    response = client.post('/api/auth/register', json={'email': email, 'username': username})
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    return body['user_id'], {'Authorization': f"Bearer {body['token']}"}
+
+def rows_on(shard, model, **filters):
+    with shard_engine(shard).connect() as connection:
+        return connection.execute(select(model.__table__).filter_by(**filters)).all()
+
+def test_users_and_their_data_live_on_their_shard(app):
+    client = app.test_client()
+    users = {}
+    for shard in range(2):
+        user_id, headers = register(client, email_on_shard(shard, f's{shard}-'), f'user{shard}')
+        assert shard_map.shard_of(user_id) == shard
+        client.post('/api/subscriptions', json=subscription_payload(), headers=headers)
+        client.post('/api/subscriptions/bulk', json={'subscriptions': [subscription_payload(), subscription_payload()]}, headers=headers)
+        users[shard] = (user_id, headers)
+
+    for shard, (user_id, headers) in users.items():
+        listed = client.get('/api/subscriptions', headers=headers).get_json()['subscriptions']
+        assert len(listed) == 3
+        # Id выданы шардом пользователя и не пересекаются с другим шардом
+        assert {item['id'] % SHARD_ID_STRIDE for item in listed} == {shard}
+        assert len(rows_on(shard, Subscription, user_id=user_id)) == 3
+        assert len(rows_on(shard, AuditLog, user_id=user_id)) == 3
+        assert rows_on(1 - shard, User, id=user_id) == []
+
+    # Уникальность email и username проверяется на всех шардах
+    email = email_on_shard(1, 's1-')
+    assert client.post('/api/auth/register', json={'email': email, 'username': 'other'}).status_code == 400
+    duplicate = client.post('/api/auth/register', json={'email': email_on_shard(1, 'new-'), 'username': 'user0'})
+    assert duplicate.get_json()['error'] == 'Username already exists'
+    assert client.post('/api/auth/login', json={'email': email}).status_code == 200
+
+    # Курсы валют копируются на все шарды
+    rates = client.put('/api/admin/fx-rates', json={'base': 'RUB', 'rates': {'USD': '90'}},
+                       headers={'X-Admin-Token': 'admin-secret'})
+    assert rates.status_code == 200
+    assert all(len(rows_on(shard, FxRate)) == 1 for shard in range(2))
+
+def test_move_bucket_keeps_ids_and_serves_from_new_shard(app):
+    client = app.test_client()
+    user_id, headers = register(client, email_on_shard(0, 'move-'), 'mover')
+    subscription_id = client.post('/api/subscriptions', json=subscription_payload(), headers=headers).get_json()['subscription']['id']
+    bucket = shard_map.bucket_of(user_id)
+
+    # Во время переноса запись запрещена, чтение работает
+    shard_map.save(shard_map.assignment, {bucket})
+    assert client.post('/api/subscriptions', json=subscription_payload(), headers=headers).status_code == 503
+    assert client.get('/api/subscriptions', headers=headers).status_code == 200
+    shard_map.save(shard_map.assignment)
+
+    with app.app_context():
+        stats = move_buckets({bucket: 1}, wait=0)
+    assert stats[0]['rows']['subscriptions'] == 1
+
+    assert rows_on(0, User, id=user_id) == []
+    listed = client.get('/api/subscriptions', headers=headers).get_json()['subscriptions']
+    assert [item['id'] for item in listed] == [subscription_id]
+    updated = client.put(f'/api/subscriptions/{subscription_id}', json={'name': 'Netflix HD'}, headers=headers)
+    assert updated.status_code == 200
+    assert rows_on(1, Subscription, id=subscription_id)[0].name == 'Netflix HD'
+
+def test_batch_commands_fan_out_to_all_shards(app):
+    client = app.test_client()
+    for shard in range(2):
+        _, headers = register(client, email_on_shard(shard, f'batch{shard}-'), f'batch{shard}')
+        client.post('/api/subscriptions', json=subscription_payload(), headers=headers)
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['rollup', 'rebuild'])
+    assert result.output.strip() == 'rebuilt 2 rollup rows'
+    result = runner.invoke(args=['shards', 'status'])
+    assert result.output.splitlines() == ['shard 0: 4 buckets, 1 users', 'shard 1: 4 buckets, 1 users']
+
+def test_move_buckets_rejects_invalid_moves(app):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            move_buckets({8: 0}, wait=0)
+        with pytest.raises(ValueError):
+            move_buckets({0: 2}, wait=0)
+
+def test_rates_are_committed_only_after_all_shards_are_written(app):
+    # Запись на шард 1 падает: шард 0 не должен получить курсы
+    with shard_engine(1).begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TRIGGER fx_rates_down BEFORE INSERT ON fx_rates BEGIN SELECT RAISE(ABORT, 'shard is down'); END"
+        )
+    response = app.test_client().put('/api/admin/fx-rates', json={'base': 'RUB', 'rates': {'USD': '90'}},
+                                     headers={'X-Admin-Token': 'admin-secret'})
+    assert response.status_code == 500
+    assert rows_on(0, FxRate) == []
+
+def test_failed_copy_restores_map_and_cleans_target(app, monkeypatch):
+    from app import sharding
+    client = app.test_client()
+    user_id, headers = register(client, email_on_shard(0, 'fail-'), 'failing')
+    bucket = shard_map.bucket_of(user_id)
+    copy_bucket = sharding.copy_bucket
+    
+    def broken_copy(bucket, source, target, chunk_size=500):
+        # Строки уже скопированы, затем соединение оборвалось
+        copy_bucket(bucket, source, target, chunk_size)
+        raise ConnectionError('connection lost')
+    
+    monkeypatch.setattr(sharding, 'copy_bucket', broken_copy)
+    with app.app_context(), pytest.raises(ConnectionError):
+        move_buckets({bucket: 1}, wait=0)
+    
+    assert shard_map.assignment[bucket] == 0
+    assert not shard_map.is_readonly(user_id)
+    assert rows_on(1, User, id=user_id) == []
+    assert client.post('/api/subscriptions', json=subscription_payload(), headers=headers).status_code == 201
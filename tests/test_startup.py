@@ -0,0 +1,30 @@
+from app import create_app, db
+from app.startup import prepare_schema, stamp_fingerprint
+
+def make_app(tmp_path, **config):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'startup.db'}",
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        **config
+    }, serving=True)
+
+def test_schema_ddl_runs_only_when_fingerprint_changes(tmp_path):
+    app = make_app(tmp_path, SCHEMA_AUTO_CREATE=True)
+    
+    assert prepare_schema(app) == 'created'
+    assert prepare_schema(app) == 'current'
+    
+    with app.app_context():
+        stamp_fingerprint('outdated-fingerprint')
+    app.config['SCHEMA_AUTO_CREATE'] = False
+    assert prepare_schema(app) == 'outdated'
+    
+    with app.app_context():
+        db.engine.dispose()
+
+def test_serving_app_skips_migrate_and_cli(tmp_path):
+    app = make_app(tmp_path)
+    
+    assert 'migrate' not in app.extensions
+    assert 'rollup' not in app.cli.commands
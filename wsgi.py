@@ -0,0 +1,4 @@
+from app import create_app
+
+# Точка входа для gunicorn: приложение создается один раз в мастере (preload_app)
+app = create_app(serving=True)